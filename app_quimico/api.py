@@ -0,0 +1,393 @@
+import hashlib
+import json
+from typing import Callable, NamedTuple
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views import View
+from app_quimico.models import (
+    ElementoQuimico, DetalleElemento, CompuestoQuimico, ElementoCompuesto, CompuestoAplicacion,
+    Aplicacion, Industria
+)
+from app_quimico.forms import ElementoFilterForm, CompuestoFilterForm
+from app_quimico.consultas import compuestos_visibles, es_gestor_global, filtrar_compuestos, filtrar_elementos
+from app_quimico.paginacion import PaginadorKeyset
+from app_quimico.utils import CalculadoraPM, formula_hill
+from app_quimico import versiones
+
+
+# ============================================ #
+# CAMPOS PUBLICABLES (Lectura + Plan de Carga) #
+# ============================================ #
+
+class Campo(NamedTuple):
+    """
+    Un campo de la respuesta: cómo leerlo del objeto y qué exige su lectura
+    (columnas para .only(), relaciones para select_related y prefetch). Así cada
+    consulta carga solo lo que piden los campos seleccionados con ?campos=.
+    """
+    leer: Callable
+    columnas: tuple = ()
+    relacionados: tuple = ()
+    prefetch: tuple = ()
+
+
+def _atributo(columna):
+    return Campo(lambda objeto: getattr(objeto, columna), (columna,))
+
+
+def _detalle(columna):
+    def leer(elemento):
+        try:
+            return getattr(elemento.detalleelemento, columna)
+        except DetalleElemento.DoesNotExist:
+            return None
+    return Campo(leer, (f'detalleelemento__{columna}',), ('detalleelemento',))
+
+
+def _industria(objeto):
+    return {'id': objeto.id_industria_id, 'nombre': objeto.id_industria.nombre_industria}
+
+
+CAMPO_INDUSTRIA = Campo(_industria, ('id_industria', 'id_industria__nombre_industria'), ('id_industria',))
+
+CAMPOS_ELEMENTO = {
+    'id': Campo(lambda e: e.pk),
+    'numero_atomico': _atributo('numero_atomico_elemento'),
+    'simbolo': _atributo('simbolo_elemento'),
+    'nombre': _atributo('nombre_elemento'),
+    'peso_atomico': _atributo('peso_atomico_elemento'),
+    'grupo': _detalle('grupo_elemento'),
+    'periodo': _detalle('periodo_elemento'),
+    'categoria': _detalle('categoria_elemento'),
+    'electronegatividad': _detalle('electronegatividad'),
+    'afinidad_electronica': _detalle('afinidad_electronica'),
+    'energia_de_ionizacion': _detalle('energia_de_ionizacion'),
+    'radio_covalente': _detalle('radio_covalente'),
+    'descripcion': _detalle('descripcion_elemento'),
+}
+
+PREFETCH_COMPOSICION = Prefetch(
+    'elementocompuesto_set',
+    queryset=ElementoCompuesto.objects.select_related('id_elemento')
+    .only('id_compuesto', 'cantidad_elem_en_comp', 'id_elemento__simbolo_elemento', 'id_elemento__numero_atomico_elemento')
+    .order_by('id_elemento__numero_atomico_elemento'),
+    to_attr='composicion_api',
+)
+PREFETCH_APLICACIONES = Prefetch(
+    'compuestoaplicacion_set',
+    queryset=CompuestoAplicacion.objects.select_related('id_aplicacion__id_industria').order_by('id'),
+    to_attr='aplicaciones_api',
+)
+
+CAMPOS_COMPUESTO = {
+    'id': Campo(lambda c: c.pk),
+    'nombre': _atributo('nombre_compuesto'),
+    'formula': _atributo('formula_compuesto'),
+    'formula_canonica': _atributo('formula_canonica'),
+    'peso_molecular': _atributo('peso_molecular_compuesto'),
+    'fecha_registro': _atributo('fecha_registro_compuesto'),
+    'industria': CAMPO_INDUSTRIA,
+    'usuario': Campo(
+        lambda c: c.usuario.username if c.usuario_id else None, ('usuario', 'usuario__username'), ('usuario',)
+    ),
+    'composicion': Campo(
+        lambda c: [
+            {'simbolo': ec.id_elemento.simbolo_elemento, 'cantidad': ec.cantidad_elem_en_comp}
+            for ec in c.composicion_api
+        ],
+        prefetch=(PREFETCH_COMPOSICION,),
+    ),
+    'aplicaciones': Campo(
+        lambda c: [
+            {
+                'id': ca.id_aplicacion_id,
+                'nombre': ca.id_aplicacion.nombre_uso,
+                'industria': ca.id_aplicacion.id_industria.nombre_industria,
+                'concentracion_minima': ca.concentracion_minima,
+                'tipo_concentracion': ca.tipo_concentracion,
+            }
+            for ca in c.aplicaciones_api
+        ],
+        prefetch=(PREFETCH_APLICACIONES,),
+    ),
+}
+
+CAMPOS_APLICACION = {
+    'id': Campo(lambda a: a.pk),
+    'nombre': _atributo('nombre_uso'),
+    'industria': CAMPO_INDUSTRIA,
+}
+
+CAMPOS_INDUSTRIA = {
+    'id': Campo(lambda i: i.pk),
+    'nombre': _atributo('nombre_industria'),
+}
+
+
+# ===================================================== #
+# VISTA BASE (Selección de Campos, Cursor y ETag → 304) #
+# ===================================================== #
+
+def respuesta_error(mensaje, estado, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=estado, json_dumps_params={'ensure_ascii': False})
+
+
+class VistaApi(View):
+    """
+    Endpoint JSON de solo lectura. Con 'pk' en la URL devuelve un objeto; sin él, una
+    página por cursor (?despues= / ?antes=, ?limite=). ?campos=a,b limita la respuesta
+    y, con ella, las columnas y relaciones consultadas.
+
+    La ETag (fuerte) se deriva de las versiones de datos de las que depende el
+    recurso, del alcance del usuario y de la URL completa: un If-None-Match vigente se
+    responde con 304 sin consultar la tabla del recurso.
+    """
+    http_method_names = ['get', 'head', 'options']
+    modelo = None
+    campos = {}
+    campos_orden = ('id',)
+    claves_version = ()
+    requiere_login = True
+    formulario_filtros = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.requiere_login and not request.user.is_authenticated:
+            return respuesta_error("Autenticación requerida.", 401)
+        return super().dispatch(request, *args, **kwargs)
+
+    # --- Puntos de extensión por recurso ---
+
+    def get_queryset(self):
+        return self.modelo.objects.all()
+
+    def filtrar(self, queryset, datos):
+        """Aplica los filtros GET ya validados por formulario_filtros."""
+        return queryset
+
+    def alcance(self):
+        """Parte de la ETag que depende del usuario (respuestas distintas por alcance)."""
+        return ''
+
+    # --- Mecánica común ---
+
+    def campos_solicitados(self):
+        texto = self.request.GET.get('campos', '').strip()
+        if not texto:
+            return list(self.campos)
+        nombres = [nombre.strip() for nombre in texto.split(',') if nombre.strip()]
+        desconocidos = [nombre for nombre in nombres if nombre not in self.campos]
+        if desconocidos:
+            raise ValueError(
+                f"Campo(s) desconocido(s): {', '.join(desconocidos)}. Disponibles: {', '.join(self.campos)}."
+            )
+        return list(dict.fromkeys(nombres))
+
+    def planificar(self, queryset, nombres):
+        """only() + select_related() + prefetch_related() estrictamente necesarios para 'nombres'."""
+        columnas = {'id', *self.campos_orden}
+        relacionados, prefetch = [], []
+        for nombre in nombres:
+            campo = self.campos[nombre]
+            columnas.update(campo.columnas)
+            relacionados.extend(r for r in campo.relacionados if r not in relacionados)
+            prefetch.extend(p for p in campo.prefetch if p not in prefetch)
+        if relacionados:
+            queryset = queryset.select_related(*relacionados)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*columnas)
+
+    def serializar(self, objeto, nombres):
+        return {nombre: self.campos[nombre].leer(objeto) for nombre in nombres}
+
+    def calcular_etag(self):
+        partes = [self.request.get_full_path(), self.alcance()]
+        partes.extend(f'{clave}={versiones.version_actual(clave)}' for clave in self.claves_version)
+        return quote_etag(hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest())
+
+    def limite(self):
+        por_defecto = getattr(settings, 'GESTOR_QUIMICO_API_TAMANO_PAGINA', 50)
+        maximo = getattr(settings, 'GESTOR_QUIMICO_API_TAMANO_MAXIMO', 500)
+        texto = self.request.GET.get('limite')
+        if not texto:
+            return por_defecto
+        if not texto.isdigit() or not 1 <= int(texto) <= maximo:
+            raise ValueError(f"'limite' debe ser un entero entre 1 y {maximo}.")
+        return int(texto)
+
+    def _url_cursor(self, parametro, cursor):
+        if cursor is None:
+            return None
+        parametros = self.request.GET.copy()
+        parametros.pop('despues', None)
+        parametros.pop('antes', None)
+        parametros[parametro] = cursor
+        return self.request.build_absolute_uri(f'{self.request.path}?{parametros.urlencode()}')
+
+    def listar(self, nombres):
+        queryset = self.get_queryset()
+        if self.formulario_filtros is not None:
+            formulario = self.formulario_filtros(self.request.GET)
+            if not formulario.is_valid():
+                return respuesta_error("Filtros no válidos.", 400, detalles=formulario.errors.get_json_data())
+            queryset = self.filtrar(queryset, formulario.cleaned_data)
+
+        paginador = PaginadorKeyset(self.planificar(queryset, nombres), self.campos_orden, self.limite())
+        pagina = paginador.pagina(despues=self.request.GET.get('despues'), antes=self.request.GET.get('antes'))
+        return {
+            'resultados': [self.serializar(objeto, nombres) for objeto in pagina],
+            'siguiente': self._url_cursor('despues', pagina.cursor_siguiente),
+            'anterior': self._url_cursor('antes', pagina.cursor_anterior),
+        }
+
+    def detallar(self, nombres, pk):
+        objeto = self.planificar(self.get_queryset(), nombres).filter(pk=pk).first()
+        if objeto is None:
+            return respuesta_error("Recurso no encontrado.", 404)
+        return self.serializar(objeto, nombres)
+
+    def get(self, request, pk=None):
+        try:
+            nombres = self.campos_solicitados()
+            etag = self.calcular_etag()
+            respuesta = get_conditional_response(request, etag=etag)  # 304 si If-None-Match coincide
+            if respuesta is None:
+                contenido = self.listar(nombres) if pk is None else self.detallar(nombres, pk)
+                respuesta = contenido if isinstance(contenido, JsonResponse) else JsonResponse(
+                    contenido, json_dumps_params={'ensure_ascii': False}
+                )
+        except ValueError as e:
+            return respuesta_error(str(e), 400)
+
+        if respuesta.status_code in (200, 304):
+            respuesta['ETag'] = etag
+        # Los clientes pueden guardar la respuesta, pero deben revalidarla (barato gracias al 304)
+        patch_cache_control(respuesta, private=True, no_cache=True)
+        patch_vary_headers(respuesta, ('Cookie',))
+        return respuesta
+
+
+# ======================= #
+# RECURSOS DE LA API JSON #
+# ======================= #
+
+class ElementoApiView(VistaApi):
+    # Abierta a todos, como la lista HTML de elementos
+    requiere_login = False
+    modelo = ElementoQuimico
+    campos = CAMPOS_ELEMENTO
+    campos_orden = ('numero_atomico_elemento',)
+    claves_version = (versiones.VERSION_ELEMENTOS,)
+    formulario_filtros = ElementoFilterForm
+
+    def filtrar(self, queryset, datos):
+        return filtrar_elementos(queryset, datos)
+
+
+class CompuestoApiView(VistaApi):
+    modelo = CompuestoQuimico
+    campos = CAMPOS_COMPUESTO
+    claves_version = (
+        versiones.VERSION_COMPUESTOS, versiones.VERSION_ELEMENTOS,
+        versiones.VERSION_APLICACIONES, versiones.VERSION_INDUSTRIAS,
+    )
+    formulario_filtros = CompuestoFilterForm
+
+    def get_queryset(self):
+        # Mismo alcance que la lista HTML y las exportaciones
+        return compuestos_visibles(self.request.user)
+
+    def filtrar(self, queryset, datos):
+        return filtrar_compuestos(queryset, datos)
+
+    def alcance(self):
+        return 'global' if es_gestor_global(self.request.user) else f'usuario:{self.request.user.pk}'
+
+
+class AplicacionApiView(VistaApi):
+    modelo = Aplicacion
+    campos = CAMPOS_APLICACION
+    campos_orden = ('nombre_uso',)
+    claves_version = (versiones.VERSION_APLICACIONES, versiones.VERSION_INDUSTRIAS)
+
+
+class IndustriaApiView(VistaApi):
+    modelo = Industria
+    campos = CAMPOS_INDUSTRIA
+    campos_orden = ('nombre_industria',)
+    claves_version = (versiones.VERSION_INDUSTRIAS,)
+
+
+# ======================================================== #
+# CÁLCULO DE PM SIN ESTADO (Sin Sesión, Auth ni Escritura) #
+# ======================================================== #
+
+def _resultado_pm(resultado):
+    if not resultado.es_valido:
+        return {'formula': resultado.formula, 'error': resultado.error}
+    return {
+        'formula': resultado.formula,
+        'peso_molecular': resultado.peso,
+        'conteo': resultado.conteo,
+        'formula_canonica': formula_hill(resultado.conteo),
+    }
+
+
+def _validar_formula(formula):
+    largo_maximo = getattr(settings, 'GESTOR_QUIMICO_API_PM_LARGO_MAXIMO', 255)
+    if not isinstance(formula, str) or not formula.strip():
+        return "Se requiere una fórmula no vacía."
+    if len(formula) > largo_maximo:
+        return f"La fórmula admite como máximo {largo_maximo} caracteres."
+    return None
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def calcular_pm(request):
+    """
+    GET  /api/pm?formula=Fe2(SO4)3           -> PM, conteo y fórmula canónica de una fórmula.
+    POST /api/pm  {"formulas": ["H2O", ...]}  -> un resultado por fórmula, en el mismo orden.
+
+    Camino caliente: tabla de pesos compartida del proceso (una lectura de versión por TTL)
+    y caché LRU de fórmulas. No se accede a request.user ni a request.session, por lo que
+    los middlewares de sesión y autenticación (perezosos) no consultan la BD, y la vista
+    no escribe nada: cualquier worker puede atenderla.
+    """
+    calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+    if request.method == 'GET':
+        formula = request.GET.get('formula', '').strip()
+        error = _validar_formula(formula)
+        if error:
+            return respuesta_error(error, 400)
+        resultado = calculadora.analizar_lote([formula])[formula]
+        return JsonResponse(_resultado_pm(resultado), status=200 if resultado.es_valido else 400,
+                            json_dumps_params={'ensure_ascii': False})
+
+    # POST: lote en JSON (las fórmulas repetidas se calculan una sola vez)
+    try:
+        cuerpo = json.loads(request.body)
+    except ValueError:
+        return respuesta_error("El cuerpo debe ser JSON válido.", 400)
+    formulas = cuerpo.get('formulas') if isinstance(cuerpo, dict) else cuerpo
+    if not isinstance(formulas, list) or not formulas:
+        return respuesta_error("Envíe {\"formulas\": [...]} con al menos una fórmula.", 400)
+    lote_maximo = getattr(settings, 'GESTOR_QUIMICO_API_PM_LOTE_MAXIMO', 1000)
+    if len(formulas) > lote_maximo:
+        return respuesta_error(f"El lote admite como máximo {lote_maximo} fórmulas.", 400)
+
+    errores = {i: _validar_formula(formula) for i, formula in enumerate(formulas)}
+    validas = [formula.strip() for i, formula in enumerate(formulas) if not errores[i]]
+    resultados = calculadora.analizar_lote(validas)
+    return JsonResponse({
+        'resultados': [
+            {'formula': formula if isinstance(formula, str) else None, 'error': errores[i]} if errores[i]
+            else _resultado_pm(resultados[formula.strip()])
+            for i, formula in enumerate(formulas)
+        ],
+    }, json_dumps_params={'ensure_ascii': False})
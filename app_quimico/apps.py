@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppQuimicoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_quimico'
+
+    def ready(self):
+        # Registro de señales (invalidación de cachés compartidas)
+        from . import signals  # noqa: F401
@@ -0,0 +1,599 @@
+import asyncio
+import io
+import json
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from wsgiref.util import setup_testing_defaults
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from app_quimico.models import ElementoQuimico, CompuestoQuimico, Industria, Aplicacion
+from app_quimico.utils import CalculadoraPM, descomponer_formula, formula_canonica, _descomponer_sin_cache
+from app_quimico.importacion import ImportadorCompuestos
+from app_quimico.tabla_periodica import cargar_tabla_periodica
+
+
+# ==================================================== #
+# BENCHMARKS DEL MOTOR QUÍMICO (Medición Reproducible) #
+# ==================================================== #
+
+# Fórmulas de referencia: simples, con agrupadores anidados y polímeros grandes
+# (donde la acumulación en float se aleja del valor de 4 decimales de la BD).
+FORMULAS_REFERENCIA = [
+    'H2O', 'NaCl', 'CO2', 'C6H12O6',
+    'Ca(OH)2', 'Fe2(SO4)3', 'K4[Fe(CN)6]', '[Co(NH3)6]Cl3',
+    '(C2H4)5000', '(C8H8)12000', 'C60000H120002', '(C6H10O5)25000',
+]
+
+# Monómeros para el barrido de exactitud: (monómero)k con k = 1..N
+MONOMEROS_EXACTITUD = ['C2H4', 'C8H8', 'C6H10O5', 'C3H6O', 'C5H8']
+
+
+def _formulas_disponibles(formulas):
+    """Filtra las fórmulas cuyos símbolos existen en la tabla periódica cargada."""
+    simbolos_bd = set(ElementoQuimico.objects.values_list('simbolo_elemento', flat=True))
+    return [f for f in formulas if set(descomponer_formula(f)[0]) <= simbolos_bd]
+
+
+def _peso_referencia(conteo, pesos_bd):
+    """PM exacto calculado con Decimal puro (referencia de exactitud)."""
+    return sum((pesos_bd[s] * n for s, n in conteo.items()), Decimal(0))
+
+
+def _cronometrar(funcion, formulas, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for formula in formulas:
+            funcion(formula)
+    segundos = time.perf_counter() - inicio
+    operaciones = repeticiones * len(formulas)
+    return {'segundos': segundos, 'operaciones_por_segundo': operaciones / segundos if segundos else None}
+
+
+def benchmark_calculadora(repeticiones=2000, formulas=None, barrido_exactitud=2000):
+    """
+    Compara velocidad y exactitud de los modos FLOTANTE y EXACTO de CalculadoraPM.
+    El modo flotante incluye la conversión Decimal(str(pm)).quantize(...) que las
+    vistas necesitaban para almacenar el PM, para comparar el camino completo.
+    La exactitud se verifica sobre las fórmulas de referencia y sobre un barrido de
+    polímeros contra una suma Decimal pura.
+    """
+    formulas = _formulas_disponibles(formulas or FORMULAS_REFERENCIA)
+    muestras = _formulas_disponibles(
+        [f'({m}){k}' for m in MONOMEROS_EXACTITUD for k in range(1, barrido_exactitud + 1)]
+    )
+    if not formulas:
+        raise ValueError("No hay fórmulas de referencia compatibles con los elementos cargados en la BD.")
+
+    pesos_bd = dict(ElementoQuimico.objects.values_list('simbolo_elemento', 'peso_atomico_elemento'))
+    flotante = CalculadoraPM(modo=CalculadoraPM.MODO_FLOTANTE)
+    exacta = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+
+    def camino_flotante(formula):
+        pm, conteo = flotante.analizar_formula(formula)
+        return Decimal(str(pm)).quantize(Decimal('0.0001')), conteo
+
+    def camino_exacto(formula):
+        return exacta.analizar_formula(formula)
+
+    resultados = {'formulas': len(formulas), 'repeticiones': repeticiones, 'muestras_exactitud': len(formulas) + len(muestras)}
+    for nombre, funcion in (('flotante', camino_flotante), ('exacto', camino_exacto)):
+        funcion(formulas[0])  # Calentamiento (tabla de pesos y caché de fórmulas)
+        medicion = _cronometrar(funcion, formulas, repeticiones)
+
+        discrepancias = []
+        for formula in formulas + muestras:
+            pm, conteo = funcion(formula)
+            referencia = _peso_referencia(conteo, pesos_bd)
+            if pm != referencia:
+                discrepancias.append({'formula': formula, 'obtenido': str(pm), 'referencia': str(referencia)})
+
+        medicion['discrepancias'] = discrepancias
+        resultados[nombre] = medicion
+
+    return resultados
+
+
+# =================================================== #
+# ENDPOINT /api/pm (Pila WSGI Completa, Un Solo Hilo) #
+# =================================================== #
+
+# Peticiones por segundo que un worker debe sostener en /api/pm (GET de una fórmula)
+OBJETIVO_PM_PETICIONES_POR_SEGUNDO = 1000
+TAMANO_LOTE_PM = 100
+
+
+def _host_permitido():
+    """Un host de ALLOWED_HOSTS utilizable en HTTP_HOST (sin comodines)."""
+    return next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+
+
+def _entorno_wsgi(metodo, ruta, consulta='', cuerpo=b''):
+    entorno = {}
+    setup_testing_defaults(entorno)
+    entorno.update({
+        'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, 'QUERY_STRING': consulta,
+        'HTTP_HOST': _host_permitido(), 'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(cuerpo)), 'wsgi.input': io.BytesIO(cuerpo),
+    })
+    return entorno
+
+
+def _medir_peticiones(manejador, entornos):
+    """Atiende cada entorno con el manejador WSGI; devuelve métricas de rendimiento y latencia."""
+    estados, latencias = [], []
+
+    def iniciar_respuesta(estado, cabeceras, exc_info=None):
+        estados.append(int(estado.split()[0]))
+
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        for entorno in entornos:
+            antes = time.perf_counter()
+            respuesta = manejador(entorno, iniciar_respuesta)
+            b''.join(respuesta)
+            respuesta.close()
+            latencias.append(time.perf_counter() - antes)
+        segundos = time.perf_counter() - inicio
+
+    return dict(
+        _resumen_latencias(latencias, segundos),
+        respuestas_no_200=sum(1 for estado in estados if estado != 200),
+        consultas_bd=len(consultas),
+    )
+
+
+def _resumen_latencias(latencias, segundos):
+    percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+    return {
+        'peticiones': len(latencias),
+        'segundos': segundos,
+        'peticiones_por_segundo': len(latencias) / segundos if segundos else None,
+        'latencia_p50_ms': percentiles[49] * 1000,
+        'latencia_p99_ms': percentiles[98] * 1000,
+    }
+
+
+def benchmark_api_pm(repeticiones=2000, formulas=None):
+    """
+    Mide /api/pm a través de la pila WSGI completa (todos los middlewares), sin servidor
+    HTTP ni cliente de pruebas: GET de una fórmula y POST de lotes de TAMANO_LOTE_PM.
+    'consultas_bd' debe ser ~0: ni sesión ni autenticación se evalúan en el camino caliente.
+    """
+    formulas = _formulas_disponibles(formulas or FORMULAS_REFERENCIA)
+    if not formulas:
+        raise ValueError("No hay fórmulas de referencia compatibles con los elementos cargados en la BD.")
+
+    manejador = WSGIHandler()
+    ruta = reverse('api_pm')
+    consultas = [f'formula={formula}' for formula in formulas]
+    manejador(_entorno_wsgi('GET', ruta, consultas[0]), lambda *a: None)  # Calentamiento
+
+    peticiones_get = [_entorno_wsgi('GET', ruta, consultas[i % len(consultas)]) for i in range(repeticiones)]
+    lote = json.dumps({'formulas': [formulas[i % len(formulas)] for i in range(TAMANO_LOTE_PM)]}).encode('utf-8')
+    peticiones_post = [_entorno_wsgi('POST', ruta, cuerpo=lote) for _ in range(max(1, repeticiones // 20))]
+
+    resultado_get = _medir_peticiones(manejador, peticiones_get)
+    resultado_post = _medir_peticiones(manejador, peticiones_post)
+    if resultado_post['peticiones_por_segundo']:
+        resultado_post['formulas_por_segundo'] = resultado_post['peticiones_por_segundo'] * TAMANO_LOTE_PM
+    return {
+        'formulas': len(formulas),
+        'objetivo_peticiones_por_segundo': OBJETIVO_PM_PETICIONES_POR_SEGUNDO,
+        'cumple_objetivo': (resultado_get['peticiones_por_segundo'] or 0) >= OBJETIVO_PM_PETICIONES_POR_SEGUNDO,
+        'get': resultado_get,
+        'post_lote': resultado_post,
+    }
+
+
+# ======================================================== #
+# ANÁLISIS DE FÓRMULAS POR COMPLEJIDAD (Con y Sin Memoria) #
+# ======================================================== #
+
+def _formula_profunda(profundidad):
+    """Agrupadores anidados 'profundidad' niveles, alternando (), [] y {}: C(H[O{N}2]2)2..."""
+    formula = 'N'
+    for nivel in range(profundidad):
+        apertura, cierre = ('()', '[]', '{}')[nivel % 3]
+        formula = f'C{apertura}H{formula}{cierre}2'
+    return formula
+
+
+FORMULAS_POR_COMPLEJIDAD = {
+    'simples': ['H2O', 'NaCl', 'CO2', 'CH4', 'NH3', 'H2SO4', 'C2H5OH', 'C6H12O6'],
+    'anidadas': ['Ca(OH)2', 'Fe2(SO4)3', 'Al2(SO4)3', 'Ca3(PO4)2', '(NH4)2SO4', 'Cu(NO3)2', 'K4[Fe(CN)6]', '[Co(NH3)6]Cl3'],
+    'profundas': [_formula_profunda(profundidad) for profundidad in (4, 8, 12, 16)],
+}
+
+
+def benchmark_analisis(repeticiones=2000, formulas=None):
+    """
+    Rendimiento de analizar_formula (modo exacto) por complejidad de la fórmula: el camino
+    habitual, con la descomposición memoizada, y el analizador de pila sin caché (el coste
+    de la primera vez que se ve cada fórmula).
+    """
+    grupos = formulas or FORMULAS_POR_COMPLEJIDAD
+    calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+    resultados = {'repeticiones': repeticiones}
+    for complejidad, lista in grupos.items():
+        lista = _formulas_disponibles(lista)
+        if not lista:
+            raise ValueError(f"No hay fórmulas '{complejidad}' compatibles con los elementos cargados en la BD.")
+        for formula in lista:
+            calculadora.analizar_formula(formula)  # Calentamiento (tabla de pesos y caché de fórmulas)
+        resultados[complejidad] = {
+            'formulas': len(lista),
+            'memoizado': _cronometrar(calculadora.analizar_formula, lista, repeticiones),
+            'sin_cache': _cronometrar(_descomponer_sin_cache, lista, repeticiones),
+        }
+    return resultados
+
+
+# ==================================================== #
+# DATOS SINTÉTICOS (Catálogo Reproducible con Semilla) #
+# ==================================================== #
+
+INDUSTRIAS_SINTETICAS = ('Farmacéutica', 'Alimentaria', 'Cosmética', 'Agrícola', 'Minera', 'Textil', 'Petroquímica', 'Metalúrgica')
+APLICACIONES_POR_INDUSTRIA = 4
+METALES = ('Na', 'K', 'Mg', 'Ca', 'Al', 'Fe', 'Cu', 'Zn', 'Mn', 'Co', 'Ni')
+ANIONES = ('OH', 'SO4', 'PO4', 'NO3', 'CO3', 'ClO4', 'CN')
+MONOMEROS = ('C2H4', 'C8H8', 'C6H10O5', 'C3H6O', 'C5H8', 'C2H3Cl')
+
+
+def _formula_sintetica(aleatorio):
+    """Fórmula con la mezcla habitual del catálogo: orgánicas, sales, complejos y polímeros."""
+    tipo = aleatorio.random()
+    if tipo < 0.45:
+        c = aleatorio.randint(1, 40)
+        formula = f'C{c}H{aleatorio.randint(1, 2 * c + 2)}'
+        for simbolo in ('N', 'O', 'S', 'P', 'Cl'):
+            if aleatorio.random() < 0.4:
+                formula += f'{simbolo}{aleatorio.randint(1, 6)}'
+        return formula
+    if tipo < 0.75:
+        return f'{aleatorio.choice(METALES)}{aleatorio.randint(1, 4)}({aleatorio.choice(ANIONES)}){aleatorio.randint(2, 6)}'
+    if tipo < 0.9:
+        return (
+            f'{aleatorio.choice(METALES)}{aleatorio.randint(1, 4)}'
+            f'[{aleatorio.choice(METALES)}({aleatorio.choice(ANIONES)}){aleatorio.randint(2, 6)}(H2O){aleatorio.randint(1, 6)}]'
+        )
+    return f'({aleatorio.choice(MONOMEROS)}){aleatorio.randint(10, 5000)}'
+
+
+class CatalogoSintetico:
+    """
+    Usuarios (gestor global y químicos), industrias, aplicaciones y compuestos sintéticos.
+    Se escribe con el ImportadorCompuestos (mismo camino que una carga real: PM, máscaras,
+    composición, índice de búsqueda y versiones). crecer() añade compuestos hasta el total pedido.
+    """
+
+    def __init__(self, semilla=2024, quimicos=4):
+        self.aleatorio = random.Random(semilla)
+        cargar_tabla_periodica()
+        permisos = Permission.objects.filter(content_type__app_label='app_quimico')
+        administradores, _ = Group.objects.get_or_create(name='Administradores')
+        administradores.permissions.set(permisos)
+        grupo_quimicos, _ = Group.objects.get_or_create(name='Quimicos')
+        grupo_quimicos.permissions.set(permisos.filter(content_type__model='compuestoquimico'))
+
+        self.gestor = User.objects.create_user('benchmark_gestor')
+        self.gestor.groups.add(administradores)
+        self.quimicos = []
+        for numero in range(quimicos):
+            quimico = User.objects.create_user(f'benchmark_quimico_{numero}')
+            quimico.groups.add(grupo_quimicos)
+            self.quimicos.append(quimico)
+
+        self.aplicaciones = []
+        for industria in Industria.objects.bulk_create([Industria(nombre_industria=n) for n in INDUSTRIAS_SINTETICAS]):
+            self.aplicaciones += Aplicacion.objects.bulk_create([
+                Aplicacion(id_industria=industria, nombre_uso=f'{industria.nombre_industria} {numero}')
+                for numero in range(1, APLICACIONES_POR_INDUSTRIA + 1)
+            ])
+        self.canonicas = {quimico.pk: set() for quimico in self.quimicos}
+        self.total = 0
+
+    def formula_nueva(self, usuario):
+        """Fórmula sintética cuya forma canónica el usuario aún no tiene registrada."""
+        while True:
+            formula = _formula_sintetica(self.aleatorio)
+            canonica = formula_canonica(formula)
+            if canonica and canonica not in self.canonicas.setdefault(usuario.pk, set()):
+                self.canonicas[usuario.pk].add(canonica)
+                return formula
+
+    def crecer(self, total):
+        por_usuario = {quimico.pk: [] for quimico in self.quimicos}
+        for posicion in range(self.total, total):
+            quimico = self.quimicos[posicion % len(self.quimicos)]
+            por_usuario[quimico.pk].append((posicion, {
+                'nombre': f'Compuesto sintético {posicion:06d}',
+                'formula': self.formula_nueva(quimico),
+                'aplicacion': self.aleatorio.choice(self.aplicaciones).nombre_uso,
+                'concentracion': str(self.aleatorio.randint(1, 9999)),
+            }, None))
+        for quimico in self.quimicos:
+            ImportadorCompuestos(quimico).importar(por_usuario[quimico.pk])
+        self.total = max(self.total, total)
+
+
+@contextmanager
+def base_datos_temporal():
+    """
+    BD de prueba (la misma que crea 'manage.py test') y caché local propia: los datos
+    sintéticos y los fragmentos renderizados nunca tocan la BD ni la caché reales.
+    """
+    nombre_original = connection.settings_dict['NAME']
+    cache_local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+    with override_settings(CACHES=cache_local, GESTOR_QUIMICO_CACHE_FRAGMENTOS='default'):
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+# ======================================================== #
+# VISTAS CALIENTES (Latencia y Consultas por Tamaño de BD) #
+# ======================================================== #
+
+TAMANOS_VISTAS = (100, 1000)
+PETICIONES_POR_VISTA = 20
+
+
+def _medir_cliente(peticiones):
+    """
+    Ejecuta cada petición (callable que usa el Client) y mide latencia y consultas.
+    La primera se reporta aparte ('fria'): suele ser un fallo de caché.
+    """
+    estados, latencias, consultas = [], [], []
+    inicio = time.perf_counter()
+    for peticion in peticiones:
+        with CaptureQueriesContext(connection) as capturadas:
+            antes = time.perf_counter()
+            respuesta = peticion()
+            latencias.append(time.perf_counter() - antes)
+        estados.append(respuesta.status_code)
+        consultas.append(len(capturadas))
+    segundos = time.perf_counter() - inicio
+    return dict(
+        _resumen_latencias(latencias, segundos),
+        fria_ms=latencias[0] * 1000,
+        consultas_fria=consultas[0],
+        consultas_max=max(consultas[1:] or consultas),
+        respuestas_con_error=sum(1 for estado in estados if estado >= 400),
+    )
+
+
+def _medir_tamano(catalogo, peticiones):
+    """Vistas de lectura y escritura del catálogo con el tamaño actual de la BD."""
+    gestor, quimico = Client(HTTP_HOST=_host_permitido()), Client(HTTP_HOST=_host_permitido())
+    gestor.force_login(catalogo.gestor)
+    propietario = catalogo.quimicos[0]
+    quimico.force_login(propietario)
+
+    todos = list(CompuestoQuimico.objects.values_list('id', flat=True))
+    ids = catalogo.aleatorio.sample(todos, min(peticiones, len(todos)))
+    aplicacion = catalogo.aplicaciones[0]
+    formulario = {
+        'tipo_industria': aplicacion.id_industria_id, 'id_aplicacion': aplicacion.pk,
+        'concentracion_minima': '1.00', 'tipo_concentracion': '%p/p',
+    }
+    editable = CompuestoQuimico.objects.filter(usuario=propietario).order_by('id').first()
+    formulas_edicion = (editable.formula_compuesto, catalogo.formula_nueva(propietario))
+
+    def crear(numero):
+        datos = dict(formulario, nombre_compuesto=f'Compuesto creado {numero}', formula_compuesto=catalogo.formula_nueva(propietario))
+        return quimico.post(reverse('compuesto_crear'), datos)
+
+    def actualizar(numero):
+        # Alterna la fórmula: cada POST recalcula el PM y sincroniza la composición
+        datos = dict(formulario, nombre_compuesto=editable.nombre_compuesto, formula_compuesto=formulas_edicion[numero % 2])
+        return quimico.post(reverse('compuesto_actualizar', args=[editable.pk]), datos)
+
+    lista, elementos = reverse('compuesto_lista'), reverse('elemento_lista')
+    return {
+        'compuesto_lista': _medir_cliente([lambda: gestor.get(lista)] * peticiones),
+        'compuesto_lista_quimico': _medir_cliente([lambda: quimico.get(lista)] * peticiones),
+        'compuesto_detalle': _medir_cliente([
+            lambda pk=pk: gestor.get(reverse('compuesto_detalle', args=[pk])) for pk in ids
+        ]),
+        'elemento_lista': _medir_cliente([lambda: gestor.get(elementos)] * peticiones),
+        'compuesto_crear_post': _medir_cliente([lambda n=n: crear(n) for n in range(peticiones)]),
+        'compuesto_actualizar_post': _medir_cliente([lambda n=n: actualizar(n) for n in range(1, peticiones + 1)]),
+    }
+
+
+def benchmark_vistas(repeticiones=2000, tamanos=TAMANOS_VISTAS, peticiones=PETICIONES_POR_VISTA, semilla=2024):
+    """
+    Latencia y consultas por petición de las vistas más usadas (lista, detalle, tabla
+    periódica y los POST de alta y edición) a través del Client y todos los middlewares,
+    sobre un catálogo sintético que crece por cada tamaño pedido. Se ejecuta en una BD
+    temporal. 'repeticiones' no aplica (se acepta por uniformidad con las demás suites).
+    """
+    resultados = {'peticiones': peticiones, 'semilla': semilla, 'motor_bd': connection.vendor, 'tamanos': {}}
+    with base_datos_temporal():
+        catalogo = CatalogoSintetico(semilla=semilla)
+        for tamano in sorted(tamanos):
+            inicio = time.perf_counter()
+            catalogo.crecer(tamano)
+            resultados['tamanos'][str(tamano)] = dict(
+                _medir_tamano(catalogo, peticiones),
+                compuestos=CompuestoQuimico.objects.count(),
+                siembra_segundos=time.perf_counter() - inicio,
+            )
+    return resultados
+
+
+# ====================================================== #
+# CARGA CONCURRENTE BAJO ASGI (Vistas Síncronas y Async) #
+# ====================================================== #
+
+CLIENTES_ASGI = 100
+PETICIONES_POR_CLIENTE = 5
+TAMANO_ASGI = 1000
+
+# Página -> (vista síncrona, vista asíncrona)
+VISTAS_ASGI = {
+    'elemento_lista': ('elemento_lista', 'elemento_lista_async'),
+    'elemento_detalle': ('elemento_detalle', 'elemento_detalle_async'),
+    'compuesto_detalle': ('compuesto_detalle', 'compuesto_detalle_async'),
+}
+
+
+async def _peticion_asgi(manejador, ruta, cookie):
+    """Una petición GET por la pila ASGI completa (como la entrega un servidor); devuelve el estado."""
+    host = _host_permitido()
+    alcance = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': ruta, 'raw_path': ruta.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': (host, 80),
+    }
+    terminada = asyncio.Event()
+    mensajes = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    estado = []
+
+    async def recibir():
+        if mensajes:
+            return mensajes.pop()
+        await terminada.wait()  # El cliente no se desconecta antes de la respuesta
+        return {'type': 'http.disconnect'}
+
+    async def enviar(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado.append(mensaje['status'])
+        elif mensaje['type'] == 'http.response.body' and not mensaje.get('more_body'):
+            terminada.set()
+
+    await manejador(alcance, recibir, enviar)
+    terminada.set()
+    return estado[0]
+
+
+async def _carga_asgi(manejador, rutas_por_cliente, cookie):
+    """Todos los clientes a la vez; cada uno encadena sus peticiones. Devuelve latencias y estados."""
+    latencias, estados = [], []
+
+    async def cliente(rutas):
+        for ruta in rutas:
+            antes = time.perf_counter()
+            estados.append(await _peticion_asgi(manejador, ruta, cookie))
+            latencias.append(time.perf_counter() - antes)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(rutas) for rutas in rutas_por_cliente))
+    return latencias, estados, time.perf_counter() - inicio
+
+
+def _medir_carga_asgi(manejador, rutas_por_cliente, cookie):
+    # Calentamiento: caché de fragmentos, versiones y plantillas compiladas
+    asyncio.run(_peticion_asgi(manejador, rutas_por_cliente[0][0], cookie))
+    latencias, estados, segundos = asyncio.run(_carga_asgi(manejador, rutas_por_cliente, cookie))
+    return dict(
+        _resumen_latencias(latencias, segundos),
+        respuestas_no_200=sum(1 for estado in estados if estado != 200),
+    )
+
+
+def benchmark_asgi(repeticiones=2000, clientes=CLIENTES_ASGI, peticiones=PETICIONES_POR_CLIENTE, tamano=TAMANO_ASGI, semilla=2024):
+    """
+    Tabla periódica, detalle de elemento y detalle de compuesto en su versión síncrona y
+    asíncrona, con 'clientes' concurrentes (sesión de un gestor global) contra el ASGIHandler
+    de Django en proceso, sin servidor ni red: mide la pila ASGI, los middlewares y la BD.
+    Catálogo sintético de 'tamano' compuestos en una BD temporal. 'repeticiones' no aplica.
+    """
+    if clientes < 1 or peticiones < 1:
+        raise ValueError("Se necesita al menos un cliente y una petición por cliente.")
+    resultados = {
+        'clientes': clientes, 'peticiones_por_cliente': peticiones, 'semilla': semilla,
+        'motor_bd': connection.vendor, 'vistas': {},
+    }
+    with base_datos_temporal():
+        catalogo = CatalogoSintetico(semilla=semilla)
+        catalogo.crecer(tamano)
+        resultados['compuestos'] = CompuestoQuimico.objects.count()
+        sesion = Client(HTTP_HOST=_host_permitido())
+        sesion.force_login(catalogo.gestor)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={sesion.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        # Mismos objetos para ambas versiones: cada cliente recorre su propia muestra
+        elementos = list(ElementoQuimico.objects.values_list('id', flat=True))
+        compuestos = list(CompuestoQuimico.objects.values_list('id', flat=True))
+        muestras = {
+            'elemento_lista': [[()] * peticiones for _ in range(clientes)],
+            'elemento_detalle': [[(catalogo.aleatorio.choice(elementos),) for _ in range(peticiones)] for _ in range(clientes)],
+            'compuesto_detalle': [[(catalogo.aleatorio.choice(compuestos),) for _ in range(peticiones)] for _ in range(clientes)],
+        }
+
+        manejador = ASGIHandler()
+        for pagina, (sincrona, asincrona) in VISTAS_ASGI.items():
+            medidas = {
+                version: _medir_carga_asgi(
+                    manejador, [[reverse(vista, args=args) for args in rutas] for rutas in muestras[pagina]], cookie
+                )
+                for version, vista in (('sincrona', sincrona), ('asincrona', asincrona))
+            }
+            sincronas, asincronas = medidas['sincrona']['peticiones_por_segundo'], medidas['asincrona']['peticiones_por_segundo']
+            medidas['aceleracion'] = asincronas / sincronas if sincronas else None
+            resultados['vistas'][pagina] = medidas
+    return resultados
+
+
+# ================================================ #
+# COMPARACIÓN CON UNA EJECUCIÓN BASE (Regresiones) #
+# ================================================ #
+
+def _aplanar(datos, prefijo=''):
+    for clave, valor in datos.items():
+        ruta = f'{prefijo}.{clave}' if prefijo else str(clave)
+        if isinstance(valor, dict):
+            yield from _aplanar(valor, ruta)
+        else:
+            yield ruta, clave, valor
+
+
+def comparar_resultados(base, actual, umbral=0.2):
+    """
+    Regresiones de 'actual' frente a 'base' (JSON de ejecuciones previas), en las rutas
+    presentes en ambos: rendimiento (*_por_segundo) que cae más del umbral, latencias
+    (*_ms) que suben más del umbral, consultas que aumentan (son deterministas) y
+    discrepancias de exactitud nuevas. Devuelve una lista de mensajes.
+    """
+    anteriores = {ruta: valor for ruta, _, valor in _aplanar(base)}
+    regresiones = []
+    for ruta, clave, valor in _aplanar(actual):
+        previo = anteriores.get(ruta)
+        if previo is None or valor is None:
+            continue
+        if clave == 'discrepancias':
+            if len(valor) > len(previo):
+                regresiones.append(f'{ruta}: {len(previo)} -> {len(valor)}')
+        elif clave.startswith('consultas'):
+            if valor > previo:
+                regresiones.append(f'{ruta}: {previo} -> {valor} consultas')
+        elif clave.endswith('_por_segundo'):
+            if valor < previo * (1 - umbral):
+                regresiones.append(f'{ruta}: {previo:.1f} -> {valor:.1f} (-{(1 - valor / previo):.0%})')
+        elif clave.endswith('_ms'):
+            if previo and valor > previo * (1 + umbral):
+                regresiones.append(f'{ruta}: {previo:.2f} -> {valor:.2f} ms (+{(valor / previo - 1):.0%})')
+    return regresiones
+
+
+# Registro de suites disponibles para el comando 'benchmark'
+SUITES = {
+    'calculadora': benchmark_calculadora,
+    'analisis': benchmark_analisis,
+    'api_pm': benchmark_api_pm,
+    'vistas': benchmark_vistas,
+    'asgi': benchmark_asgi,
+}
@@ -0,0 +1,255 @@
+import re
+import unicodedata
+from django.db.models import Case, When, Value, IntegerField, Max, Sum, Q, OuterRef, Subquery
+from app_quimico.models import TerminoBusqueda, CompuestoQuimico, ElementoQuimico
+from app_quimico.utils import PATRON_TOKENS, AGRUPADORES_APERTURA, AGRUPADORES_CIERRE
+
+
+# ================================================= #
+# ÍNDICE DE BÚSQUEDA (Términos de Nombre y Fórmula) #
+# ================================================= #
+
+LARGO_MAXIMO_TERMINO = 64
+# Máximo de grupos (símbolo + subíndice) por fragmento de fórmula indexado: acota el índice
+MAX_GRUPOS_FRAGMENTO = 4
+
+# Pesos para el ranking (se suman por cada término coincidente)
+PESO_NOMBRE = 2
+PESO_FRAGMENTO_FORMULA = 3
+PESO_FORMULA_COMPLETA = 5
+
+PATRON_FORMULA = re.compile(r'^(?:[A-Z][a-z]?\d*|[()\[\]{}]\d*)+$')
+PATRON_PALABRAS = re.compile(r'[a-z0-9]+')
+# Todos los términos usan solo [0-9a-z]: el orden es el mismo en cualquier collation
+# (dígitos < letras), lo que permite expresar los prefijos como rangos indexables.
+RELLENO_SIMBOLO = '0'
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes: 'Ácido Sulfúrico' -> 'acido sulfurico'."""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _palabras(texto: str):
+    return PATRON_PALABRAS.findall(normalizar(texto))
+
+
+def codificar_grupo(simbolo: str, subindice: str = '') -> str:
+    """
+    Codifica 'Símbolo+subíndice' en minúsculas sin perder la distinción Co/CO:
+    cada símbolo ocupa exactamente 2 caracteres ('C' -> 'c0', 'Co' -> 'co').
+    Así, en collations que ignoran mayúsculas, 'Co3' ('co3') y 'CO3' ('c0o03') no colisionan.
+    """
+    return simbolo.lower().ljust(2, RELLENO_SIMBOLO) + subindice
+
+
+def _grupos_formula(formula: str):
+    """Divide la fórmula en segmentos de grupos codificados; cada agrupador corta el segmento."""
+    segmentos, actual = [], []
+    for token in PATRON_TOKENS.findall(formula):
+        if token in AGRUPADORES_APERTURA or token in AGRUPADORES_CIERRE:
+            segmentos.append(actual)
+            actual = []
+        elif token.isdigit():
+            if actual:
+                actual[-1] += token
+        else:
+            actual.append(codificar_grupo(token))
+    segmentos.append(actual)
+    return segmentos
+
+
+def _fragmentos_formula(formula: str):
+    """
+    Subsecuencias contiguas (acotadas) de cada segmento de la fórmula.
+    Ej: 'Fe2(SO4)3' -> Fe2, S, O4, SO4. Así "SO4" encuentra todos los sulfatos.
+    """
+    fragmentos = set()
+    for grupos in _grupos_formula(formula):
+        for inicio in range(len(grupos)):
+            for fin in range(inicio + 1, min(inicio + MAX_GRUPOS_FRAGMENTO, len(grupos)) + 1):
+                fragmentos.add(''.join(grupos[inicio:fin]))
+    return fragmentos
+
+
+def _agregar(terminos: dict, campo: str, termino: str, peso: int):
+    if termino and len(termino) <= LARGO_MAXIMO_TERMINO:
+        clave = (campo, termino)
+        terminos[clave] = max(peso, terminos.get(clave, 0))
+
+
+def terminos_compuesto(nombre: str, formula: str) -> dict:
+    """Términos {(campo, termino): peso} de un compuesto (función pura, usable desde migraciones)."""
+    terminos = {}
+    for palabra in _palabras(nombre):
+        _agregar(terminos, TerminoBusqueda.CAMPO_NOMBRE, palabra, PESO_NOMBRE)
+    for fragmento in _fragmentos_formula(formula):
+        _agregar(terminos, TerminoBusqueda.CAMPO_FORMULA, fragmento, PESO_FRAGMENTO_FORMULA)
+    # La fórmula completa (sin agrupadores) puntúa más que sus fragmentos
+    completa = ''.join(g for grupos in _grupos_formula(formula) for g in grupos)
+    _agregar(terminos, TerminoBusqueda.CAMPO_FORMULA, completa, PESO_FORMULA_COMPLETA)
+    return terminos
+
+
+def terminos_elemento(nombre: str, simbolo: str) -> dict:
+    """Términos {(campo, termino): peso} de un elemento: palabras del nombre y el símbolo."""
+    terminos = {}
+    for palabra in _palabras(nombre):
+        _agregar(terminos, TerminoBusqueda.CAMPO_NOMBRE, palabra, PESO_NOMBRE)
+    _agregar(terminos, TerminoBusqueda.CAMPO_NOMBRE, normalizar(simbolo), PESO_NOMBRE)
+    _agregar(terminos, TerminoBusqueda.CAMPO_FORMULA, codificar_grupo(simbolo), PESO_FORMULA_COMPLETA)
+    return terminos
+
+
+# ================================= #
+# SINCRONIZACIÓN (Alta/Cambio/Baja) #
+# ================================= #
+
+def _filas(tipo, id_objeto, terminos):
+    return [
+        TerminoBusqueda(tipo_objeto=tipo, id_objeto=id_objeto, campo=campo, termino=termino, peso=peso)
+        for (campo, termino), peso in terminos.items()
+    ]
+
+
+def indexar_compuestos(compuestos, nuevos=False):
+    """Reemplaza los términos de los compuestos dados (nuevos=True: no hay términos previos que borrar)."""
+    compuestos = [c for c in compuestos if c.pk is not None]
+    if not nuevos:
+        desindexar(TerminoBusqueda.TIPO_COMPUESTO, [c.pk for c in compuestos])
+    filas = []
+    for c in compuestos:
+        filas.extend(_filas(TerminoBusqueda.TIPO_COMPUESTO, c.pk, terminos_compuesto(c.nombre_compuesto, c.formula_compuesto)))
+    TerminoBusqueda.objects.bulk_create(filas, batch_size=2000)
+
+
+def indexar_elementos(elementos):
+    """Reemplaza los términos de los elementos dados (acepta instancias con pk)."""
+    elementos = [e for e in elementos if e.pk is not None]
+    desindexar(TerminoBusqueda.TIPO_ELEMENTO, [e.pk for e in elementos])
+    filas = []
+    for e in elementos:
+        filas.extend(_filas(TerminoBusqueda.TIPO_ELEMENTO, e.pk, terminos_elemento(e.nombre_elemento, e.simbolo_elemento)))
+    TerminoBusqueda.objects.bulk_create(filas, batch_size=2000)
+
+
+def desindexar(tipo, ids):
+    TerminoBusqueda.objects.filter(tipo_objeto=tipo, id_objeto__in=list(ids)).delete()
+
+
+def reconstruir_indice(tipo, tamano_lote=2000):
+    """Reconstruye desde cero el índice de un tipo de objeto. Devuelve los objetos indexados."""
+    if tipo == TerminoBusqueda.TIPO_COMPUESTO:
+        objetos = CompuestoQuimico.objects.only('id', 'nombre_compuesto', 'formula_compuesto')
+        indexar = indexar_compuestos
+    else:
+        objetos = ElementoQuimico.objects.only('id', 'nombre_elemento', 'simbolo_elemento')
+        indexar = indexar_elementos
+
+    TerminoBusqueda.objects.filter(tipo_objeto=tipo).delete()
+    total, lote = 0, []
+    for objeto in objetos.order_by('id').iterator(chunk_size=tamano_lote):
+        lote.append(objeto)
+        if len(lote) >= tamano_lote:
+            indexar(lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        indexar(lote)
+        total += len(lote)
+    return total
+
+
+# ============================= #
+# CONSULTA (Prefijos + Ranking) #
+# ============================= #
+
+def _siguiente_prefijo(prefijo: str):
+    """Menor cadena mayor que todas las que empiezan por 'prefijo' (alfabeto [0-9a-z])."""
+    base = prefijo.rstrip('z')
+    if not base:
+        return None
+    ultimo = base[-1]
+    return base[:-1] + ('a' if ultimo == '9' else chr(ord(ultimo) + 1))
+
+
+def _rango_prefijo(campo: str, prefijo: str) -> Q:
+    """termino LIKE 'prefijo%' expresado como rango: usa el índice en cualquier motor."""
+    condicion = Q(campo=campo, termino__gte=prefijo)
+    limite = _siguiente_prefijo(prefijo)
+    if limite is not None:
+        condicion &= Q(termino__lt=limite)
+    return condicion
+
+
+def _condiciones_consulta(texto: str):
+    """
+    Una condición por palabra buscada. Una palabra simple coincide por nombre o por fórmula
+    ('Co' -> Cobre o CoCO3); una fórmula con agrupadores ('K4[Fe(CN)6]') solo como prefijo de la
+    fórmula completa, y el resto de palabras compuestas ('ácido-sulfúrico') exige cada parte.
+    """
+    condiciones = []
+    for palabra in texto.split():
+        normalizadas = _palabras(palabra)
+        formula = None
+        if PATRON_FORMULA.match(palabra):
+            codificada = ''.join(''.join(grupos) for grupos in _grupos_formula(palabra))
+            formula = _rango_prefijo(TerminoBusqueda.CAMPO_FORMULA, codificada)
+
+        if len(normalizadas) == 1:
+            condicion = _rango_prefijo(TerminoBusqueda.CAMPO_NOMBRE, normalizadas[0])
+            condiciones.append(condicion | formula if formula else condicion)
+        elif formula:
+            condiciones.append(formula)
+        else:
+            condiciones.extend(_rango_prefijo(TerminoBusqueda.CAMPO_NOMBRE, n) for n in normalizadas)
+    return condiciones
+
+
+def coincidencias(tipo, texto):
+    """
+    Queryset de {'id_objeto', 'relevancia'} con los objetos que coinciden con TODAS las
+    palabras del texto (por prefijo). None si el texto no contiene términos buscables.
+    """
+    condiciones = _condiciones_consulta(texto)
+    if not condiciones:
+        return None
+
+    union = Q()
+    for condicion in condiciones:
+        union |= condicion
+    marcas = {
+        f'palabra_{i}': Max(Case(When(condicion, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, condicion in enumerate(condiciones)
+    }
+    return (
+        TerminoBusqueda.objects
+        .filter(union, tipo_objeto=tipo)
+        .values('id_objeto')
+        .annotate(relevancia=Sum('peso'), **marcas)
+        .filter(**{marca: 1 for marca in marcas})
+    )
+
+
+def _buscar(tipo, texto, queryset, ordenar_por_relevancia):
+    resultados = coincidencias(tipo, texto)
+    if resultados is None:
+        return queryset
+    queryset = queryset.filter(pk__in=resultados.values('id_objeto'))
+    if ordenar_por_relevancia:
+        relevancia = resultados.filter(id_objeto=OuterRef('pk')).values('relevancia')[:1]
+        queryset = queryset.annotate(relevancia=Subquery(relevancia)).order_by('-relevancia', 'pk')
+    return queryset
+
+
+def buscar_compuestos(texto, queryset=None, ordenar_por_relevancia=False):
+    """Filtra (y opcionalmente ordena por relevancia) compuestos por nombre o fragmento de fórmula."""
+    queryset = CompuestoQuimico.objects.all() if queryset is None else queryset
+    return _buscar(TerminoBusqueda.TIPO_COMPUESTO, texto, queryset, ordenar_por_relevancia)
+
+
+def buscar_elementos(texto, queryset=None, ordenar_por_relevancia=False):
+    """Filtra (y opcionalmente ordena por relevancia) elementos por nombre o símbolo."""
+    queryset = ElementoQuimico.objects.all() if queryset is None else queryset
+    return _buscar(TerminoBusqueda.TIPO_ELEMENTO, texto, queryset, ordenar_por_relevancia)
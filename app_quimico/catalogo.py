@@ -0,0 +1,65 @@
+from typing import NamedTuple
+from app_quimico import versiones
+from app_quimico.consultas import es_gestor_global
+from app_quimico.fragmentos import cache_fragmentos, ttl_fragmentos, registrar_fragmento
+
+
+# ======================================================= #
+# CACHÉ DEL CATÁLOGO DE COMPUESTOS (Por Usuario y Filtro) #
+# ======================================================= #
+
+# Datos globales que muestran las tarjetas (aplicación e industria) y el filtro de industria
+VERSIONES_COMUNES = (versiones.VERSION_APLICACIONES, versiones.VERSION_INDUSTRIAS)
+
+# Página renderizada (filtros, tarjetas y paginación): la variante incluye sus versiones
+fragmento_catalogo = registrar_fragmento('catalogo_compuestos')
+
+
+class EstadoCatalogo(NamedTuple):
+    usuario_id: int
+    es_global: bool
+    versiones: dict  # clave -> versión vigente de los datos que afectan a la página
+
+
+def estado_catalogo(usuario) -> EstadoCatalogo:
+    """
+    Versiones vigentes (una sola consulta) y rol global del usuario.
+    El rol se guarda en caché bajo la versión del catálogo del usuario (cambia con sus
+    grupos) y la versión 'grupos' (renombrar o borrar un grupo): un acierto no consulta la BD.
+    """
+    propia = versiones.version_catalogo(usuario.pk)
+    vigentes = versiones.versiones_vigentes(
+        [propia, versiones.VERSION_GRUPOS, versiones.VERSION_COMPUESTOS, *VERSIONES_COMUNES]
+    )
+
+    cache = cache_fragmentos()
+    clave_rol = f'catalogo:gestor_global:{usuario.pk}:v{vigentes[propia]}:g{vigentes[versiones.VERSION_GRUPOS]}'
+    es_global = cache.get(clave_rol)
+    if es_global is None:
+        es_global = es_gestor_global(usuario)
+        cache.set(clave_rol, es_global, ttl_fragmentos())
+
+    # Gestores globales: caché compartida, la invalida cualquier escritura de compuestos.
+    # Químicos: solo su propia versión (las escrituras de otros usuarios no la tocan).
+    alcance = versiones.VERSION_COMPUESTOS if es_global else propia
+    return EstadoCatalogo(
+        usuario.pk, es_global, {clave: vigentes[clave] for clave in (alcance, *VERSIONES_COMUNES)}
+    )
+
+
+def variante_pagina(estado, request, permisos_tarjeta, excluidos=('csrfmiddlewaretoken',)):
+    """
+    Variante de la página en caché: alcance y versiones, parámetros GET (filtros y cursor) y,
+    en el alcance global, los permisos de la tarjeta. Quien no tiene todos esos permisos ve
+    los botones según la autoría de cada compuesto, por lo que su variante incluye al usuario.
+    """
+    parametros = sorted(
+        (parametro, tuple(request.GET.getlist(parametro))) for parametro in request.GET if parametro not in excluidos
+    )
+    vigentes = sorted(estado.versiones.items())
+    if not estado.es_global:
+        return ('usuario', estado.usuario_id, vigentes, parametros)
+
+    permisos = [permiso for permiso in permisos_tarjeta if request.user.has_perm(permiso)]
+    identidad = None if len(permisos) == len(permisos_tarjeta) else estado.usuario_id
+    return ('global', identidad, permisos, vigentes, parametros)
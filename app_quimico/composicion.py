@@ -0,0 +1,313 @@
+import re
+from typing import NamedTuple, Optional
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from app_quimico.models import ElementoQuimico, CompuestoQuimico, ElementoCompuesto
+from app_quimico.resumen import refrescar_resumenes
+from app_quimico import versiones
+
+
+# ================================================ #
+# MÁSCARA DE PRESENCIA DE ELEMENTOS (Bitset por Z) #
+# ================================================ #
+
+# Dos enteros de 63 bits útiles (se evita el bit de signo de BIGINT):
+# bit (Z - 1) en 'bajos' para Z = 1..63 y bit (Z - 64) en 'altos' para Z = 64..126.
+BITS_POR_MASCARA = 63
+
+
+def bit_elemento(numero_atomico: int):
+    """Devuelve (campo, bit) del elemento de número atómico Z."""
+    if numero_atomico <= BITS_POR_MASCARA:
+        return 'mascara_elementos_bajos', 1 << (numero_atomico - 1)
+    return 'mascara_elementos_altos', 1 << (numero_atomico - 1 - BITS_POR_MASCARA)
+
+
+def calcular_mascaras(numeros_atomicos) -> dict:
+    """{'mascara_elementos_bajos': int, 'mascara_elementos_altos': int} para un conjunto de Z."""
+    mascaras = {'mascara_elementos_bajos': 0, 'mascara_elementos_altos': 0}
+    for numero in numeros_atomicos:
+        campo, bit = bit_elemento(numero)
+        mascaras[campo] |= bit
+    return mascaras
+
+
+def duenos_compuestos(ids_compuestos, tamano_lote):
+    """Usuarios dueños de los compuestos indicados (consultas por lotes de ids)."""
+    duenos = set()
+    for inicio in range(0, len(ids_compuestos), tamano_lote):
+        lote = ids_compuestos[inicio:inicio + tamano_lote]
+        duenos.update(CompuestoQuimico.objects.filter(id__in=lote).values_list('usuario_id', flat=True).distinct())
+    return duenos
+
+
+def recalcular_mascaras(elementos=None, ids_compuestos=None, tamano_lote=1000, chunk_size=20_000):
+    """
+    Recalcula la máscara de los compuestos que contienen los elementos indicados, de los
+    compuestos indicados por id (p. ej. los de un elemento ya borrado) o de todo el catálogo,
+    desde ElementoCompuesto, y escribe SOLO las filas que cambiaron.
+    Devuelve {'compuestos': analizados, 'actualizados': cambiados}.
+    """
+    composicion = ElementoCompuesto.objects.order_by('id_compuesto')
+    afectados = None
+    if elementos is not None:
+        afectados = ElementoCompuesto.objects.filter(id_elemento__in=elementos).values('id_compuesto')
+    elif ids_compuestos is not None:
+        afectados = list(ids_compuestos)
+    compuestos = CompuestoQuimico.objects.order_by('id')
+    if afectados is not None:
+        composicion = composicion.filter(id_compuesto__in=afectados)
+        compuestos = compuestos.filter(id__in=afectados)
+
+    numeros = {}
+    filas = composicion.values_list('id_compuesto', 'id_elemento__numero_atomico_elemento')
+    for id_compuesto, numero in filas.iterator(chunk_size=chunk_size):
+        numeros.setdefault(id_compuesto, []).append(numero)
+
+    cambiados = []
+    actuales = compuestos.values_list('id', 'mascara_elementos_bajos', 'mascara_elementos_altos')
+    for id_compuesto, bajos, altos in actuales.iterator(chunk_size=chunk_size):
+        mascaras = calcular_mascaras(numeros.get(id_compuesto, ()))
+        if (bajos, altos) != (mascaras['mascara_elementos_bajos'], mascaras['mascara_elementos_altos']):
+            cambiados.append(CompuestoQuimico(id=id_compuesto, **mascaras))
+
+    if cambiados:
+        with transaction.atomic():
+            CompuestoQuimico.objects.bulk_update(
+                cambiados, ['mascara_elementos_bajos', 'mascara_elementos_altos'], batch_size=tamano_lote
+            )
+            # bulk_update no dispara señales: mismas versiones que el recálculo del PM
+            versiones.invalidar(versiones.VERSION_COMPUESTOS)
+            versiones.invalidar_catalogos(duenos_compuestos([compuesto.id for compuesto in cambiados], tamano_lote))
+    return {'compuestos': len(numeros), 'actualizados': len(cambiados)}
+
+
+# ============================================================ #
+# SINCRONIZACIÓN DE LA COMPOSICIÓN (Diferencias Incrementales) #
+# ============================================================ #
+
+class CambiosComposicion(NamedTuple):
+    crear: list       # ElementoCompuesto nuevos
+    actualizar: list  # ElementoCompuesto existentes (pk) con su cantidad nueva
+    borrar: list      # pks de filas que ya no corresponden a la fórmula
+
+    def resumen(self) -> dict:
+        return {'creadas': len(self.crear), 'actualizadas': len(self.actualizar), 'borradas': len(self.borrar)}
+
+
+def diferencias_composicion(actuales, nuevas) -> CambiosComposicion:
+    """
+    Compara la composición almacenada con la nueva y devuelve el mínimo de cambios.
+    actuales: {(id_compuesto, id_elemento): (pk, cantidad)} (filas de la BD)
+    nuevas:   {(id_compuesto, id_elemento): cantidad}
+    """
+    crear, actualizar = [], []
+    for (id_compuesto, id_elemento), cantidad in nuevas.items():
+        actual = actuales.get((id_compuesto, id_elemento))
+        if actual is None:
+            crear.append(ElementoCompuesto(
+                id_compuesto_id=id_compuesto, id_elemento_id=id_elemento, cantidad_elem_en_comp=cantidad
+            ))
+        elif actual[1] != cantidad:
+            actualizar.append(ElementoCompuesto(pk=actual[0], cantidad_elem_en_comp=cantidad))
+    borrar = [pk for clave, (pk, _) in actuales.items() if clave not in nuevas]
+    return CambiosComposicion(crear, actualizar, borrar)
+
+
+def sincronizar_composicion(conteos, nuevos=False, simular=False, tamano_lote=1000):
+    """
+    Lleva ElementoCompuesto al estado de 'conteos' ({id_compuesto: {id_elemento: cantidad}})
+    con el mínimo de escrituras: INSERT de los elementos nuevos, bulk_update de las cantidades
+    que cambian y DELETE de los que desaparecen. Cambiar un subíndice es un único UPDATE.
+    nuevos=True (compuestos recién creados) omite la lectura de las filas actuales.
+    No abre transacción: el llamador agrupa la escritura del compuesto y su composición
+    (el total de elementos del resumen se actualiza en la misma).
+    Devuelve {'creadas', 'actualizadas', 'borradas', 'compuestos'} ('compuestos': ids modificados).
+    """
+    nuevas = {
+        (id_compuesto, id_elemento): cantidad
+        for id_compuesto, conteo in conteos.items()
+        for id_elemento, cantidad in conteo.items()
+    }
+
+    # 1. Filas actuales de los compuestos (una consulta por lote de ids)
+    actuales = {}
+    ids = [] if nuevos else list(conteos)
+    for inicio in range(0, len(ids), tamano_lote):
+        filas = ElementoCompuesto.objects.filter(id_compuesto__in=ids[inicio:inicio + tamano_lote]).values_list(
+            'id', 'id_compuesto', 'id_elemento', 'cantidad_elem_en_comp'
+        )
+        for pk, id_compuesto, id_elemento, cantidad in filas:
+            actuales[(id_compuesto, id_elemento)] = (pk, cantidad)
+
+    # 2. Diferencias y escritura mínima (primero bajas: liberan la clave única elemento-compuesto)
+    cambios = diferencias_composicion(actuales, nuevas)
+    if not simular:
+        for inicio in range(0, len(cambios.borrar), tamano_lote):
+            ElementoCompuesto.objects.filter(pk__in=cambios.borrar[inicio:inicio + tamano_lote]).delete()
+        if cambios.actualizar:
+            ElementoCompuesto.objects.bulk_update(cambios.actualizar, ['cantidad_elem_en_comp'], batch_size=tamano_lote)
+        if cambios.crear:
+            ElementoCompuesto.objects.bulk_create(cambios.crear, batch_size=tamano_lote)
+
+    borradas = set(cambios.borrar)
+    pks_modificados = {fila.pk for fila in cambios.actualizar} | borradas
+    con_altas_o_bajas = (
+        {fila.id_compuesto_id for fila in cambios.crear}
+        | {clave[0] for clave, (pk, _) in actuales.items() if pk in borradas}
+    )
+    resumen = cambios.resumen()
+    resumen['compuestos'] = con_altas_o_bajas | {
+        clave[0] for clave, (pk, _) in actuales.items() if pk in pks_modificados
+    }
+
+    # 3. Elementos distintos del resumen denormalizado (solo cambia con altas o bajas)
+    if not simular:
+        ids_resumen = sorted(con_altas_o_bajas)
+        for inicio in range(0, len(ids_resumen), tamano_lote):
+            refrescar_resumenes(
+                ids_resumen[inicio:inicio + tamano_lote], campos=CompuestoQuimico.CAMPOS_RESUMEN_COMPOSICION
+            )
+    return resumen
+
+
+# ============================================ #
+# RESTRICCIONES DE COMPOSICIÓN (Mini-Sintaxis) #
+# ============================================ #
+
+# Un término por elemento, separados por espacios o comas:
+#   Fe       -> contiene Fe (cualquier cantidad)
+#   Cl>=2    -> al menos 2 átomos de Cl (también >, <=, <, =)
+#   N:1-3    -> entre 1 y 3 átomos de N (N:2 equivale a N=2)
+#   !Na      -> no contiene Na
+# Todo elemento mencionado (salvo con '!') debe estar presente.
+PATRON_RESTRICCION = re.compile(
+    r'^(?P<negado>!)?(?P<simbolo>[A-Z][a-z]?)'
+    r'(?:(?P<operador>>=|<=|>|<|=|:)(?P<desde>\d+)(?:-(?P<hasta>\d+))?)?$'
+)
+
+
+class Restriccion(NamedTuple):
+    simbolo: str
+    minimo: int
+    maximo: Optional[int]  # None = sin límite superior; 0 = elemento excluido
+
+    @property
+    def es_exclusion(self):
+        return self.maximo == 0
+
+    @property
+    def solo_presencia(self):
+        return self.minimo == 1 and self.maximo is None
+
+
+def _restriccion(termino: str) -> Restriccion:
+    coincidencia = PATRON_RESTRICCION.match(termino)
+    if not coincidencia:
+        raise ValueError(f"Restricción no válida: '{termino}'. Use por ejemplo 'Fe', 'Cl>=2', 'N:1-3' o '!Na'.")
+
+    simbolo, operador = coincidencia['simbolo'], coincidencia['operador']
+    desde = int(coincidencia['desde']) if coincidencia['desde'] else None
+    hasta = int(coincidencia['hasta']) if coincidencia['hasta'] else None
+
+    if coincidencia['negado']:
+        if operador:
+            raise ValueError(f"'{termino}': una exclusión ('!') no admite cantidades.")
+        return Restriccion(simbolo, 0, 0)
+    if hasta is not None and operador != ':':
+        raise ValueError(f"'{termino}': los rangos se escriben con ':' (ej. {simbolo}:1-3).")
+
+    if operador is None:
+        minimo, maximo = 1, None
+    elif operador == '>=':
+        minimo, maximo = desde, None
+    elif operador == '>':
+        minimo, maximo = desde + 1, None
+    elif operador == '<=':
+        minimo, maximo = 1, desde
+    elif operador == '<':
+        minimo, maximo = 1, desde - 1
+    elif operador == '=' or hasta is None:
+        minimo, maximo = desde, desde
+    else:
+        minimo, maximo = desde, hasta
+
+    minimo = max(minimo, 1)
+    if maximo is not None and maximo < minimo:
+        raise ValueError(f"'{termino}': el rango de cantidades está vacío.")
+    return Restriccion(simbolo, minimo, maximo)
+
+
+def parsear_restricciones(texto: str):
+    """Convierte 'Fe O Cl>=2 N:1-3 !Na' en una lista de Restriccion (una por elemento)."""
+    restricciones = {}
+    for termino in re.split(r'[\s,;]+', texto.strip()):
+        if not termino:
+            continue
+        restriccion = _restriccion(termino)
+        if restriccion.simbolo in restricciones:
+            raise ValueError(f"El elemento '{restriccion.simbolo}' aparece más de una vez.")
+        restricciones[restriccion.simbolo] = restriccion
+    return list(restricciones.values())
+
+
+# =============================================== #
+# FILTRO POR COMPOSICIÓN (Máscara + Subconsultas) #
+# =============================================== #
+
+def _usar_mascara():
+    return getattr(settings, 'GESTOR_QUIMICO_MASCARA_COMPOSICION', True)
+
+
+def filtrar_por_composicion(queryset, restricciones):
+    """
+    Filtra un queryset de CompuestoQuimico por elementos y rangos de cantidad.
+    La presencia/ausencia se resuelve con la máscara de bits de cada fila (sin JOIN);
+    los rangos de cantidad con una subconsulta por elemento sobre el índice compuesto
+    (id_elemento, cantidad_elem_en_comp, id_compuesto) de ElementoCompuesto.
+    Como la composición se guarda agregada, Fe2(SO4)3 y Fe2S3O12 son equivalentes.
+    """
+    if not restricciones:
+        return queryset
+
+    simbolos = {r.simbolo for r in restricciones}
+    elementos = {
+        simbolo: (id_elemento, numero)
+        for simbolo, id_elemento, numero in ElementoQuimico.objects.filter(simbolo_elemento__in=simbolos)
+        .values_list('simbolo_elemento', 'id', 'numero_atomico_elemento')
+    }
+    desconocidos = simbolos - elementos.keys()
+    if desconocidos:
+        raise ValueError(f"Símbolo(s) no reconocido(s): {', '.join(sorted(desconocidos))}.")
+
+    usar_mascara = _usar_mascara()
+    if usar_mascara:
+        requeridos = calcular_mascaras(elementos[r.simbolo][1] for r in restricciones if not r.es_exclusion)
+        excluidos = calcular_mascaras(elementos[r.simbolo][1] for r in restricciones if r.es_exclusion)
+        for campo, mascara in requeridos.items():
+            if mascara:
+                queryset = queryset.alias(**{f'{campo}_req': F(campo).bitand(mascara)}).filter(**{f'{campo}_req': mascara})
+        for campo, mascara in excluidos.items():
+            if mascara:
+                queryset = queryset.alias(**{f'{campo}_exc': F(campo).bitand(mascara)}).filter(**{f'{campo}_exc': 0})
+
+    for restriccion in restricciones:
+        id_elemento = elementos[restriccion.simbolo][0]
+        if usar_mascara and (restriccion.es_exclusion or restriccion.solo_presencia):
+            continue  # Resuelto por la máscara
+        filas = ElementoCompuesto.objects.filter(id_elemento=id_elemento)
+        if restriccion.es_exclusion:
+            queryset = queryset.exclude(pk__in=filas.values('id_compuesto'))
+            continue
+        filas = filas.filter(cantidad_elem_en_comp__gte=restriccion.minimo)
+        if restriccion.maximo is not None:
+            filas = filas.filter(cantidad_elem_en_comp__lte=restriccion.maximo)
+        queryset = queryset.filter(pk__in=filas.values('id_compuesto'))
+    return queryset
+
+
+def buscar_por_composicion(texto, queryset=None):
+    """Atajo: parsea el texto de restricciones y filtra (todos los compuestos por defecto)."""
+    queryset = CompuestoQuimico.objects.all() if queryset is None else queryset
+    return filtrar_por_composicion(queryset, parsear_restricciones(texto))
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db.models import Q
+from app_quimico.models import CompuestoQuimico, CompuestoAplicacion
+from app_quimico.busqueda import buscar_compuestos, buscar_elementos
+from app_quimico.composicion import filtrar_por_composicion
+from app_quimico.roles import roles_de
+
+
+# ========================================================== #
+# ALCANCE Y FILTROS DEL CATÁLOGO DE COMPUESTOS (Compartidos) #
+# ========================================================== #
+
+def es_gestor_global(usuario) -> bool:
+    """
+    True si el usuario pertenece a un grupo con visión global del catálogo
+    (roles.GRUPOS_GESTION_GLOBAL). Usa los roles ya resueltos en la petición, sin consulta extra.
+    """
+    if usuario is None or not usuario.is_authenticated:
+        return False
+    return roles_de(usuario).es_gestor_global
+
+
+def compuestos_visibles(usuario, queryset=None, es_global=None):
+    """
+    Restringe el queryset a los compuestos que el usuario puede ver. La lista, las
+    exportaciones y la API deben pasar por aquí para aplicar el mismo alcance.
+    usuario=None significa sin restricción (procesos internos como comandos).
+    es_global permite reutilizar un rol ya resuelto (p. ej. el guardado en caché del catálogo).
+    """
+    queryset = CompuestoQuimico.objects.all() if queryset is None else queryset
+    if usuario is None or not usuario.is_authenticated:
+        return queryset
+    if es_global is None:
+        es_global = es_gestor_global(usuario)
+    if not es_global:
+        queryset = queryset.filter(usuario=usuario)
+    return queryset
+
+
+def busqueda_por_subcadena() -> bool:
+    """
+    True = los filtros de texto del HTML conservan la semántica histórica (icontains, LIKE '%...%').
+    Por defecto se usa el índice de términos, que coincide por PREFIJO de palabra o de fragmento
+    de fórmula: 'sulf' encuentra 'Ácido Sulfúrico', pero 'fúrico' ya no.
+    """
+    return getattr(settings, 'GESTOR_QUIMICO_BUSQUEDA_SUBCADENA', False)
+
+
+def filtrar_compuestos(queryset, datos):
+    """Aplica los filtros ya validados de CompuestoFilterForm (cleaned_data)."""
+    # A. Búsqueda por Nombre/Fórmula (índice de términos por prefijo, sin LIKE '%...%')
+    if datos.get('busqueda_compuesto'):
+        texto = datos['busqueda_compuesto']
+        if busqueda_por_subcadena():
+            queryset = queryset.filter(Q(nombre_compuesto__icontains=texto) | Q(formula_compuesto__icontains=texto))
+        else:
+            queryset = buscar_compuestos(texto, queryset)
+
+    # B. Composición: elementos y rangos de cantidad (ej. "Fe O Cl>=2")
+    if datos.get('composicion'):
+        queryset = filtrar_por_composicion(queryset, datos['composicion'])
+
+    # C. Peso Molecular Mínimo (usando __gte)
+    if datos.get('min_peso_molecular'):
+        queryset = queryset.filter(peso_molecular_compuesto__gte=datos['min_peso_molecular'])
+
+    # D. Filtro por Industria (Clave foránea indirecta, a través de sus aplicaciones)
+    if datos.get('industria'):
+        # CRÍTICO: Usamos .pk para obtener el ID del objeto Industria seleccionado.
+        # Se consulta la industria actual de cada aplicación (id_industria del compuesto no se
+        # resincroniza al mover una aplicación). IN (subconsulta) en lugar de JOIN + DISTINCT:
+        # no duplica filas y se resuelve con el índice (aplicación, compuesto).
+        industria_id = datos['industria'].pk
+        queryset = queryset.filter(pk__in=CompuestoAplicacion.objects.filter(
+            id_aplicacion__id_industria=industria_id
+        ).values('id_compuesto'))
+    return queryset
+
+
+def filtrar_elementos(queryset, datos):
+    """Aplica los filtros ya validados de ElementoFilterForm (cleaned_data)."""
+    if datos.get('busqueda_nombre'):
+        texto = datos['busqueda_nombre']
+        if busqueda_por_subcadena():
+            queryset = queryset.filter(Q(nombre_elemento__icontains=texto) | Q(simbolo_elemento__icontains=texto))
+        else:
+            queryset = buscar_elementos(texto, queryset)
+    if datos.get('categoria'):
+        queryset = queryset.filter(detalleelemento__categoria_elemento__exact=datos['categoria'])
+    if datos.get('min_peso_atomico'):
+        queryset = queryset.filter(peso_atomico_elemento__gte=datos['min_peso_atomico'])
+    return queryset
@@ -0,0 +1,142 @@
+import csv
+import json
+import tempfile
+from django.db.models import Prefetch
+from app_quimico.models import CompuestoAplicacion, ElementoCompuesto
+
+
+# ===================================================== #
+# EXPORTACIÓN DEL CATÁLOGO (Streaming, Memoria Acotada) #
+# ===================================================== #
+
+FORMATOS_EXPORTACION = ('csv', 'jsonl', 'xlsx')
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+COLUMNAS_EXPORTACION = [
+    'id', 'nombre', 'formula', 'formula_canonica', 'peso_molecular', 'industria',
+    'usuario', 'fecha_registro', 'composicion', 'aplicaciones',
+]
+
+
+def _preparar(queryset):
+    """Columnas y relaciones necesarias para una fila de exportación."""
+    return (
+        queryset
+        .select_related('id_industria', 'usuario')
+        .prefetch_related(
+            Prefetch(
+                'elementocompuesto_set',
+                queryset=ElementoCompuesto.objects.select_related('id_elemento').order_by('id_elemento__numero_atomico_elemento'),
+                to_attr='composicion_exportada',
+            ),
+            Prefetch(
+                'compuestoaplicacion_set',
+                queryset=CompuestoAplicacion.objects.select_related('id_aplicacion__id_industria'),
+                to_attr='aplicaciones_exportadas',
+            ),
+        )
+    )
+
+
+def iterar_compuestos(queryset, tamano_lote=2000):
+    """
+    Recorre el queryset por lotes con paginación keyset sobre el id. Solo un lote (y sus
+    prefetch) está en memoria a la vez. No se usa OFFSET ni un único cursor: con MySQL
+    el cliente almacena el resultado completo aunque se use .iterator().
+    """
+    queryset = _preparar(queryset).order_by('pk')
+    ultimo = None
+    while True:
+        lote = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+        lote = list(lote[:tamano_lote])
+        if not lote:
+            return
+        yield from lote
+        ultimo = lote[-1].pk
+
+
+def fila_compuesto(compuesto) -> dict:
+    """Representación plana de un compuesto (misma estructura en los tres formatos)."""
+    return {
+        'id': compuesto.pk,
+        'nombre': compuesto.nombre_compuesto,
+        'formula': compuesto.formula_compuesto,
+        'formula_canonica': compuesto.formula_canonica or '',
+        'peso_molecular': str(compuesto.peso_molecular_compuesto) if compuesto.peso_molecular_compuesto is not None else '',
+        'industria': compuesto.id_industria.nombre_industria,
+        'usuario': compuesto.usuario.username if compuesto.usuario else '',
+        'fecha_registro': compuesto.fecha_registro_compuesto.isoformat(),
+        'composicion': ';'.join(
+            f'{ec.id_elemento.simbolo_elemento}:{ec.cantidad_elem_en_comp}' for ec in compuesto.composicion_exportada
+        ),
+        'aplicaciones': ' | '.join(
+            f'{ca.id_aplicacion.nombre_uso} ({ca.id_aplicacion.id_industria.nombre_industria}) '
+            f'{ca.concentracion_minima} {ca.tipo_concentracion}'
+            for ca in compuesto.aplicaciones_exportadas
+        ),
+    }
+
+
+# Una celda de texto que empieza con estos caracteres se evalúa como fórmula en Excel,
+# LibreOffice o Google Sheets (inyección de fórmulas, p. ej. =HYPERLINK(...)).
+PREFIJOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def celda_segura(valor):
+    """Antepone un apóstrofo a los textos que una hoja de cálculo interpretaría como fórmula."""
+    if isinstance(valor, str) and valor.startswith(PREFIJOS_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def fila_hoja_de_calculo(compuesto) -> list:
+    """Fila de fila_compuesto en el orden de COLUMNAS_EXPORTACION, con el texto escapado (CSV y XLSX)."""
+    fila = fila_compuesto(compuesto)
+    return [celda_segura(fila[columna]) for columna in COLUMNAS_EXPORTACION]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de almacenarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(queryset, tamano_lote=2000):
+    """Genera el CSV línea a línea (apto para StreamingHttpResponse)."""
+    escritor = csv.writer(_Eco(), lineterminator='\n')
+    yield '\ufeff' + escritor.writerow(COLUMNAS_EXPORTACION)  # BOM: Excel detecta UTF-8
+    for compuesto in iterar_compuestos(queryset, tamano_lote):
+        yield escritor.writerow(fila_hoja_de_calculo(compuesto))
+
+
+def generar_jsonl(queryset, tamano_lote=2000):
+    """Genera un objeto JSON por línea (apto para StreamingHttpResponse). Sin escape: no es una hoja de cálculo."""
+    for compuesto in iterar_compuestos(queryset, tamano_lote):
+        yield json.dumps(fila_compuesto(compuesto), ensure_ascii=False) + '\n'
+
+
+def escribir_xlsx(queryset, destino, tamano_lote=2000):
+    """
+    Escribe el libro XLSX en 'destino' (ruta o archivo binario). openpyxl en modo
+    write_only vuelca cada fila a disco, por lo que la memoria no crece con el catálogo.
+    """
+    from openpyxl import Workbook  # Importación diferida: solo la exportación XLSX la necesita
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Compuestos')
+    hoja.append(COLUMNAS_EXPORTACION)
+    for compuesto in iterar_compuestos(queryset, tamano_lote):
+        hoja.append(fila_hoja_de_calculo(compuesto))
+    libro.save(destino)
+
+
+def xlsx_temporal(queryset, tamano_lote=2000):
+    """Genera el XLSX en un archivo temporal (se borra al cerrarse) listo para FileResponse."""
+    temporal = tempfile.TemporaryFile()
+    escribir_xlsx(queryset, temporal, tamano_lote)
+    temporal.seek(0)
+    return temporal
@@ -10,6 +10,9 @@ from .models import (
     CATEGORIA_CHOICES
 )
 from decimal import Decimal
+from .composicion import parsear_restricciones
+from .importacion import COLUMNAS_IMPORTACION
+from .utils import tabla_pesos
 
 
 # ================ #
@@ -233,7 +236,15 @@ class CompuestoFilterForm(forms.Form):
         widget=forms.TextInput(attrs={'placeholder': 'Ej: Ácido, Sal, H2O', 'class': 'form-control'})
     )
     
-    # 2. Peso Molecular Mínimo (≥) (usando __gte)
+    # 2. Composición: elementos y rangos de cantidad (ver composicion.parsear_restricciones)
+    composicion = forms.CharField(
+        required=False,
+        label="Composición",
+        help_text="Ej: Fe O Cl>=2 N:1-3 !Na",
+        widget=forms.TextInput(attrs={'placeholder': 'Ej: Fe O Cl>=2', 'class': 'form-control'})
+    )
+
+    # 3. Peso Molecular Mínimo (≥) (usando __gte)
     min_peso_molecular = forms.DecimalField(
         required=False, 
         label="PM Mínimo (≥)",
@@ -241,7 +252,7 @@ class CompuestoFilterForm(forms.Form):
         widget=forms.NumberInput(attrs={'placeholder': 'Ej: 50.00', 'class': 'form-control', 'step': '0.01'})
     )
     
-    # 3. Filtro por Industria (Selección por FK)
+    # 4. Filtro por Industria (Selección por FK)
     industria = forms.ModelChoiceField(
         queryset=Industria.objects.all().order_by('nombre_industria'),
         required=False, 
@@ -256,13 +267,50 @@ class CompuestoFilterForm(forms.Form):
         self.helper.form_method = 'get'
         self.helper.layout = Layout(
             Row(
-                Column('busqueda_compuesto', css_class='form-group col-md-4 mb-0'),
-                Column('min_peso_molecular', css_class='form-group col-md-4 mb-0'),
-                Column('industria', css_class='form-group col-md-4 mb-0'),
+                Column('busqueda_compuesto', css_class='form-group col-md-3 mb-0'),
+                Column('composicion', css_class='form-group col-md-3 mb-0'),
+                Column('min_peso_molecular', css_class='form-group col-md-3 mb-0'),
+                Column('industria', css_class='form-group col-md-3 mb-0'),
                 css_class='form-row'
             )
         )
 
+    def clean_composicion(self):
+        """Devuelve la lista de restricciones (vacía si no se indicó composición)."""
+        texto = self.cleaned_data['composicion']
+        try:
+            restricciones = parsear_restricciones(texto)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+        if not restricciones:
+            return restricciones
+        # Los símbolos se validan contra la tabla de pesos en memoria (sin consulta extra)
+        desconocidos = sorted({r.simbolo for r in restricciones} - tabla_pesos.obtener().keys())
+        if desconocidos:
+            raise forms.ValidationError(f"Símbolo(s) no reconocido(s): {', '.join(desconocidos)}.")
+        return restricciones
+
+
+# ======================================= #
+# FORMULARIO DE IMPORTACIÓN DE COMPUESTOS #
+# ======================================= #
+
+class ImportacionCompuestosForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV o JSON Lines",
+        help_text="Columnas: " + ", ".join(COLUMNAS_IMPORTACION) + ". Solo 'nombre', 'formula' y 'aplicacion' son obligatorias.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.json'})
+    )
+    formato = forms.ChoiceField(
+        label="Formato",
+        choices=[('csv', 'CSV (con encabezado)'), ('jsonl', 'JSON Lines (un objeto por línea)')],
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper()
+
 
 # ====================== #
 # FORMULARIO DE REGISTRO #
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
+from app_quimico import versiones
+
+
+# ============================================ #
+# CACHÉ DE FRAGMENTOS HTML (Clave por Versión) #
+# ============================================ #
+
+def cache_fragmentos():
+    """Backend de caché configurado para los fragmentos (y datos derivados del catálogo)."""
+    return caches[getattr(settings, 'GESTOR_QUIMICO_CACHE_FRAGMENTOS', 'default')]
+
+
+def ttl_fragmentos():
+    return getattr(settings, 'GESTOR_QUIMICO_CACHE_FRAGMENTOS_TTL', 86400)
+
+
+class CacheFragmentos:
+    """
+    Fragmentos HTML renderizados, guardados en la caché de Django (local o en archivos)
+    bajo la clave nombre + versión de datos + variante (filtros, permisos...).
+    No se borra nada al cambiar los datos: las señales incrementan la versión y las
+    entradas antiguas dejan de consultarse hasta expirar.
+    Los contadores de aciertos y fallos son por proceso (como los de la tabla de pesos).
+    Con clave_version=None la variante debe incluir ella misma las versiones que la afectan.
+    """
+
+    def __init__(self, nombre: str, clave_version: str = None):
+        self.nombre = nombre
+        self.clave_version = clave_version
+        self._lock = threading.Lock()
+        self._estadisticas = {'aciertos': 0, 'fallos': 0}
+
+    def _cache(self):
+        return cache_fragmentos()
+
+    def clave(self, variante) -> str:
+        """Clave corta y segura para cualquier backend (memcached limita largo y caracteres)."""
+        resumen = hashlib.sha1(repr(variante).encode('utf-8')).hexdigest()
+        if self.clave_version is None:
+            return f'fragmento:{self.nombre}:{resumen}'
+        return f'fragmento:{self.nombre}:v{versiones.version_actual(self.clave_version)}:{resumen}'
+
+    def obtener_o_generar(self, variante, generar):
+        """Devuelve (html, acierto). En un fallo llama a generar() y guarda el resultado."""
+        clave = self.clave(variante)
+        cache = self._cache()
+        html = cache.get(clave)
+        acierto = html is not None
+        with self._lock:
+            self._estadisticas['aciertos' if acierto else 'fallos'] += 1
+        if not acierto:
+            html = generar()
+            cache.set(clave, str(html), ttl_fragmentos())
+        return mark_safe(html), acierto
+
+    async def aobtener_o_generar(self, variante, generar):
+        """Versión para vistas asíncronas: generar es una corrutina y la caché se consulta con aget/aset."""
+        clave = await sync_to_async(self.clave)(variante)  # La versión puede leerse de la BD
+        cache = self._cache()
+        html = await cache.aget(clave)
+        acierto = html is not None
+        with self._lock:
+            self._estadisticas['aciertos' if acierto else 'fallos'] += 1
+        if not acierto:
+            html = await generar()
+            await cache.aset(clave, str(html), ttl_fragmentos())
+        return mark_safe(html), acierto
+
+    def estadisticas(self) -> dict:
+        """Aciertos, fallos y tasa de aciertos de este proceso."""
+        with self._lock:
+            datos = dict(self._estadisticas)
+        consultas = datos['aciertos'] + datos['fallos']
+        datos['tasa_aciertos'] = datos['aciertos'] / consultas if consultas else 0.0
+        return datos
+
+
+# Fragmentos registrados (para reportar sus estadísticas en conjunto)
+FRAGMENTOS = {}
+
+
+def registrar_fragmento(nombre: str, clave_version: str = None) -> CacheFragmentos:
+    FRAGMENTOS[nombre] = CacheFragmentos(nombre, clave_version)
+    return FRAGMENTOS[nombre]
+
+
+def estadisticas_fragmentos() -> dict:
+    return {nombre: fragmento.estadisticas() for nombre, fragmento in FRAGMENTOS.items()}
+
+
+# Tarjetas y filtros de la tabla periódica (ElementoListView)
+fragmento_tabla_periodica = registrar_fragmento('tabla_periodica', versiones.VERSION_ELEMENTOS)
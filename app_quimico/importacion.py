@@ -0,0 +1,278 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import NamedTuple
+from django.db import connection, transaction, IntegrityError
+from app_quimico.models import (
+    ElementoQuimico, CompuestoQuimico, Aplicacion, CompuestoAplicacion,
+    CONCENTRACION_CHOICES
+)
+from app_quimico.utils import CalculadoraPM, formula_hill, LARGO_MAXIMO_CANONICA
+from app_quimico.composicion import calcular_mascaras, sincronizar_composicion
+from app_quimico.resumen import refrescar_resumenes
+from app_quimico import busqueda, versiones
+
+
+# ================================================= #
+# LECTURA DE ARCHIVOS DE IMPORTACIÓN (En Streaming) #
+# ================================================= #
+
+FORMATOS_IMPORTACION = ('csv', 'jsonl')
+# Columnas reconocidas (CSV con encabezado, o claves de cada objeto JSON)
+COLUMNAS_IMPORTACION = ('nombre', 'formula', 'aplicacion', 'concentracion', 'tipo_concentracion')
+TIPOS_CONCENTRACION = frozenset(clave for clave, _ in CONCENTRACION_CHOICES)
+TIPO_CONCENTRACION_POR_DEFECTO = '%p/p'
+CONCENTRACION_POR_DEFECTO = Decimal('1.00')
+LARGO_MAXIMO_TEXTO = 255
+
+
+def leer_filas(entrada, formato):
+    """
+    Genera (numero_linea, datos, error) a partir de un archivo de texto abierto, sin
+    cargarlo completo en memoria. 'datos' es un dict (o None si la línea no pudo leerse).
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(entrada)
+        for fila in lector:
+            datos = {clave.strip().lower(): (valor or '').strip() for clave, valor in fila.items() if clave}
+            yield lector.line_num, datos, None
+    elif formato == 'jsonl':
+        for numero, linea in enumerate(entrada, start=1):
+            if not linea.strip():
+                continue
+            try:
+                datos = json.loads(linea)
+            except ValueError as e:
+                yield numero, None, f"JSON inválido: {e}"
+                continue
+            if not isinstance(datos, dict):
+                yield numero, None, "Cada línea debe ser un objeto JSON."
+                continue
+            yield numero, {clave: str(valor).strip() for clave, valor in datos.items() if valor is not None}, None
+    else:
+        raise ValueError(f"Formato de importación no soportado: '{formato}'.")
+
+
+# ===================================== #
+# RESULTADO Y ERRORES DE LA IMPORTACIÓN #
+# ===================================== #
+
+class ErrorImportacion(NamedTuple):
+    """Fila rechazada: número de línea del archivo, fórmula (si se leyó) y motivo."""
+    linea: int
+    formula: str
+    mensaje: str
+
+
+class ResumenImportacion:
+    """Contadores de la importación. Los errores se entregan por callback (memoria constante)."""
+
+    def __init__(self):
+        self.leidas = 0
+        self.creadas = 0
+        self.rechazadas = 0
+        # Creadas cuya fórmula canónica (Hill) ya tenía el usuario: se aceptan (pueden ser isómeros)
+        self.equivalentes = 0
+
+    def como_dict(self):
+        return {
+            'leidas': self.leidas, 'creadas': self.creadas, 'rechazadas': self.rechazadas,
+            'equivalentes': self.equivalentes,
+        }
+
+
+# ============================================== #
+# IMPORTADOR DE COMPUESTOS (Lotes + bulk_create) #
+# ============================================== #
+
+class ImportadorCompuestos:
+    """
+    Importa compuestos para un usuario dueño. Las aplicaciones y los elementos se
+    resuelven desde mapas precargados una sola vez, el PM con la tabla de pesos
+    compartida (modo exacto), y cada lote se escribe con bulk_create en su propia
+    transacción: un error de BD solo descarta ese lote.
+    """
+
+    def __init__(self, usuario, tamano_lote=1000):
+        if usuario is None:
+            raise ValueError("La importación requiere un usuario dueño de los compuestos.")
+        if tamano_lote < 1:
+            raise ValueError("El tamaño de lote debe ser mayor que cero.")
+        self.usuario = usuario
+        self.tamano_lote = tamano_lote
+        self.calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+        # 1. Mapas precargados (una consulta cada uno)
+        self.aplicaciones = {
+            nombre.casefold(): (id_aplicacion, id_industria)
+            for id_aplicacion, nombre, id_industria in Aplicacion.objects.values_list('id', 'nombre_uso', 'id_industria')
+        }
+        self.elementos = {
+            simbolo: (id_elemento, numero)
+            for simbolo, id_elemento, numero in ElementoQuimico.objects.values_list(
+                'simbolo_elemento', 'id', 'numero_atomico_elemento'
+            )
+        }
+
+    def importar(self, filas, reportar_error=None):
+        """
+        Procesa las filas de leer_filas() por lotes. reportar_error(ErrorImportacion) se
+        invoca por cada fila rechazada. Devuelve un ResumenImportacion.
+        """
+        resumen = ResumenImportacion()
+        reportar = reportar_error or (lambda error: None)
+        filas = iter(filas)
+        while True:
+            lote = list(islice(filas, self.tamano_lote))
+            if not lote:
+                break
+            resumen.leidas += len(lote)
+            self._importar_lote(lote, resumen, reportar)
+        return resumen
+
+    def _rechazar(self, resumen, reportar, linea, formula, mensaje):
+        resumen.rechazadas += 1
+        reportar(ErrorImportacion(linea, formula or '', mensaje))
+
+    def _validar_fila(self, datos):
+        """Devuelve (valores normalizados, None) o (None, mensaje de error)."""
+        nombre = datos.get('nombre', '')
+        formula = datos.get('formula', '')
+        if not nombre or not formula:
+            return None, "Las columnas 'nombre' y 'formula' son obligatorias."
+        if len(nombre) > LARGO_MAXIMO_TEXTO or len(formula) > LARGO_MAXIMO_TEXTO:
+            return None, f"El nombre y la fórmula admiten como máximo {LARGO_MAXIMO_TEXTO} caracteres."
+
+        aplicacion = self.aplicaciones.get(datos.get('aplicacion', '').casefold())
+        if aplicacion is None:
+            return None, f"Aplicación no registrada: '{datos.get('aplicacion', '')}'."
+
+        try:
+            concentracion = Decimal(datos['concentracion']) if datos.get('concentracion') else CONCENTRACION_POR_DEFECTO
+        except InvalidOperation:
+            return None, f"Concentración no numérica: '{datos['concentracion']}'."
+        if not concentracion.is_finite() or concentracion < Decimal('0.01') or concentracion >= Decimal('1e8'):
+            return None, "La concentración debe estar entre 0.01 y 99999999.99."
+
+        tipo = datos.get('tipo_concentracion') or TIPO_CONCENTRACION_POR_DEFECTO
+        if tipo not in TIPOS_CONCENTRACION:
+            return None, f"Tipo de concentración no válido: '{tipo}'."
+
+        return {
+            'nombre': nombre, 'formula': formula, 'aplicacion': aplicacion,
+            'concentracion': concentracion.quantize(Decimal('0.01')), 'tipo': tipo,
+        }, None
+
+    def _importar_lote(self, lote, resumen, reportar):
+        # 2. Validación de columnas y análisis de fórmulas (las repetidas se calculan una vez)
+        validas = []
+        for linea, datos, error in lote:
+            if error:
+                self._rechazar(resumen, reportar, linea, '', error)
+                continue
+            valores, error = self._validar_fila(datos)
+            if error:
+                self._rechazar(resumen, reportar, linea, datos.get('formula'), error)
+                continue
+            validas.append((linea, valores))
+
+        analisis = self.calculadora.analizar_lote(valores['formula'] for _, valores in validas)
+
+        # 3. Duplicados (misma fórmula) y equivalentes (misma clave de Hill): contra la BD (una
+        #    consulta por lote) y dentro del propio archivo
+        candidatas = []
+        for linea, valores in validas:
+            resultado = analisis[valores['formula']]
+            if not resultado.es_valido:
+                self._rechazar(resumen, reportar, linea, valores['formula'], resultado.error)
+                continue
+            if resultado.peso >= Decimal('1e6'):
+                self._rechazar(resumen, reportar, linea, valores['formula'], "El Peso Molecular excede el máximo almacenable.")
+                continue
+            canonica = formula_hill(resultado.conteo)
+            valores['canonica'] = canonica if len(canonica) <= LARGO_MAXIMO_CANONICA else None
+            valores['resultado'] = resultado
+            candidatas.append((linea, valores))
+
+        existentes = CompuestoQuimico.objects.filter(usuario=self.usuario).filter(
+            formula_canonica__in={v['canonica'] for _, v in candidatas if v['canonica']}
+        ).values_list('formula_canonica', flat=True)
+        existentes_formula = CompuestoQuimico.objects.filter(
+            usuario=self.usuario, formula_compuesto__in={v['formula'] for _, v in candidatas}
+        ).values_list('formula_compuesto', flat=True)
+        vistas_canonica, vistas_formula = set(existentes), set(existentes_formula)
+
+        aceptadas, equivalentes = [], 0
+        for linea, valores in candidatas:
+            if valores['formula'] in vistas_formula:
+                self._rechazar(resumen, reportar, linea, valores['formula'], "Compuesto duplicado (misma fórmula).")
+                continue
+            vistas_formula.add(valores['formula'])
+            if valores['canonica']:
+                # Misma fórmula de Hill con otra escritura: se acepta y solo se informa
+                if valores['canonica'] in vistas_canonica:
+                    equivalentes += 1
+                vistas_canonica.add(valores['canonica'])
+            aceptadas.append((linea, valores))
+
+        if not aceptadas:
+            return
+        try:
+            with transaction.atomic():
+                self._escribir(aceptadas)
+        except IntegrityError as e:
+            # Otro proceso registró alguno de estos compuestos entre la validación y la escritura
+            for linea, valores in aceptadas:
+                self._rechazar(resumen, reportar, linea, valores['formula'], f"Lote descartado por conflicto en la BD: {e}")
+            return
+        resumen.creadas += len(aceptadas)
+        resumen.equivalentes += equivalentes
+
+    def _escribir(self, aceptadas):
+        compuestos = []
+        for _, valores in aceptadas:
+            numeros = (self.elementos[s][1] for s in valores['resultado'].conteo if s in self.elementos)
+            compuestos.append(CompuestoQuimico(
+                nombre_compuesto=valores['nombre'],
+                formula_compuesto=valores['formula'],
+                formula_canonica=valores['canonica'],
+                id_industria_id=valores['aplicacion'][1],
+                usuario=self.usuario,
+                peso_molecular_compuesto=valores['resultado'].peso,
+                **calcular_mascaras(numeros),
+            ))
+        compuestos = CompuestoQuimico.objects.bulk_create(compuestos, batch_size=self.tamano_lote)
+
+        # 4. PKs: algunos motores (MySQL) no las devuelven desde bulk_create
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(
+                CompuestoQuimico.objects.filter(
+                    usuario=self.usuario, formula_compuesto__in=[c.formula_compuesto for c in compuestos]
+                ).values_list('formula_compuesto', 'id')
+            )
+            for compuesto in compuestos:
+                compuesto.pk = ids[compuesto.formula_compuesto]
+
+        relaciones, composicion = [], {}
+        for compuesto, (_, valores) in zip(compuestos, aceptadas):
+            relaciones.append(CompuestoAplicacion(
+                id_compuesto_id=compuesto.pk,
+                id_aplicacion_id=valores['aplicacion'][0],
+                concentracion_minima=valores['concentracion'],
+                tipo_concentracion=valores['tipo'],
+            ))
+            composicion[compuesto.pk] = {
+                self.elementos[simbolo][0]: cantidad
+                for simbolo, cantidad in valores['resultado'].conteo.items()
+                if simbolo in self.elementos
+            }
+        CompuestoAplicacion.objects.bulk_create(relaciones, batch_size=self.tamano_lote)
+        # Mismo motor de composición que la edición (compuestos nuevos: solo inserciones, sin lectura previa)
+        sincronizar_composicion(composicion, nuevos=True, tamano_lote=self.tamano_lote)
+
+        # 5. bulk_create no dispara señales: resumen de la tarjeta (la composición ya actualizó
+        # el total de elementos), índice de búsqueda y versión de datos se actualizan aquí
+        refrescar_resumenes([compuesto.pk for compuesto in compuestos], campos=CompuestoQuimico.CAMPOS_RESUMEN_APLICACION)
+        busqueda.indexar_compuestos(compuestos, nuevos=True)
+        versiones.invalidar(versiones.VERSION_COMPUESTOS)
+        versiones.invalidar_catalogos([self.usuario.pk])
@@ -0,0 +1,79 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.benchmarks import (
+    SUITES, TAMANOS_VISTAS, PETICIONES_POR_VISTA, CLIENTES_ASGI, PETICIONES_POR_CLIENTE, TAMANO_ASGI, comparar_resultados,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las suites de benchmark del motor químico y de las vistas y muestra los resultados en JSON. "
+        "Con --comparar falla si hay regresiones frente a una ejecución base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--suite', action='append', dest='suites', choices=sorted(SUITES),
+            help="Suite a ejecutar (repetible). Por defecto se ejecutan todas.",
+        )
+        parser.add_argument('--repeticiones', type=int, default=2000, help="Repeticiones por medición.")
+        parser.add_argument(
+            '--tamanos', type=int, nargs='+', default=list(TAMANOS_VISTAS), metavar='N',
+            help="Compuestos sintéticos con los que se miden las vistas (suite 'vistas').",
+        )
+        parser.add_argument(
+            '--peticiones', type=int, default=PETICIONES_POR_VISTA, help="Peticiones por vista y tamaño (suite 'vistas').",
+        )
+        parser.add_argument(
+            '--clientes', type=int, default=CLIENTES_ASGI, help="Clientes concurrentes (suite 'asgi').",
+        )
+        parser.add_argument(
+            '--peticiones-cliente', type=int, default=PETICIONES_POR_CLIENTE,
+            help="Peticiones que encadena cada cliente por vista (suite 'asgi').",
+        )
+        parser.add_argument(
+            '--tamano-asgi', type=int, default=TAMANO_ASGI, metavar='N', help="Compuestos sintéticos (suite 'asgi').",
+        )
+        parser.add_argument('--salida', metavar='ARCHIVO', help="Guarda los resultados en este archivo JSON.")
+        parser.add_argument('--comparar', metavar='ARCHIVO', help="JSON de una ejecución base con la que comparar.")
+        parser.add_argument(
+            '--umbral', type=float, default=getattr(settings, 'GESTOR_QUIMICO_BENCHMARK_UMBRAL', 0.2),
+            help="Variación relativa tolerada en rendimiento y latencia antes de considerarla regresión.",
+        )
+
+    def handle(self, *args, **options):
+        base = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la ejecución base '{options['comparar']}': {e}")
+
+        extra = {
+            'vistas': {'tamanos': options['tamanos'], 'peticiones': options['peticiones']},
+            'asgi': {
+                'clientes': options['clientes'], 'peticiones': options['peticiones_cliente'], 'tamano': options['tamano_asgi'],
+            },
+        }
+        resultados = {}
+        for nombre in options['suites'] or sorted(SUITES):
+            try:
+                resultados[nombre] = SUITES[nombre](repeticiones=options['repeticiones'], **extra.get(nombre, {}))
+            except ValueError as e:
+                raise CommandError(f"Suite '{nombre}': {e}")
+
+        salida = json.dumps(resultados, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida + '\n')
+        self.stdout.write(salida)
+
+        if base is not None:
+            regresiones = comparar_resultados(base, resultados, options['umbral'])
+            if regresiones:
+                raise CommandError(
+                    f"{len(regresiones)} regresiones (umbral {options['umbral']:.0%}):\n" + "\n".join(regresiones)
+                )
+            self.stderr.write(self.style.SUCCESS(f"Sin regresiones frente a '{options['comparar']}'."))
@@ -0,0 +1,71 @@
+import csv
+import json
+import sys
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.utils import CalculadoraPM
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula el Peso Molecular de fórmulas leídas línea a línea desde un archivo o stdin "
+        "y escribe los resultados en CSV o JSON Lines. Procesa por lotes (memoria constante)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default='-', help="Ruta del archivo de fórmulas ('-' = stdin).")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], default='csv', help="Formato de salida.")
+        parser.add_argument('--lote', type=int, default=1000, help="Fórmulas procesadas por lote.")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("El tamaño de lote debe ser mayor que cero.")
+
+        if options['archivo'] == '-':
+            entrada = sys.stdin
+        else:
+            try:
+                entrada = open(options['archivo'], encoding='utf-8')
+            except OSError as e:
+                raise CommandError(f"No se pudo abrir el archivo: {e}")
+
+        try:
+            self._procesar(entrada, options['formato'], options['lote'])
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+
+    def _procesar(self, entrada, formato, tamano_lote):
+        calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+        escritor = csv.writer(self.stdout, lineterminator='\n') if formato == 'csv' else None
+        if escritor:
+            escritor.writerow(['formula', 'peso_molecular', 'composicion', 'error'])
+
+        # Solo se mantiene en memoria un lote a la vez
+        formulas = (linea.strip() for linea in entrada)
+        formulas = (f for f in formulas if f)
+        errores = 0
+        while True:
+            lote = list(islice(formulas, tamano_lote))
+            if not lote:
+                break
+            resultados = calculadora.analizar_lote(lote)
+
+            # Una fila de salida por cada línea de entrada (las repetidas se calcularon una vez)
+            for formula in lote:
+                resultado = resultados[formula]
+                errores += not resultado.es_valido
+                peso = str(resultado.peso) if resultado.es_valido else None
+                if escritor:
+                    composicion = ';'.join(f"{s}:{n}" for s, n in resultado.conteo.items()) if resultado.conteo else ''
+                    escritor.writerow([formula, peso or '', composicion, resultado.error or ''])
+                else:
+                    self.stdout.write(json.dumps({
+                        'formula': formula,
+                        'peso_molecular': peso,
+                        'composicion': resultado.conteo,
+                        'error': resultado.error,
+                    }, ensure_ascii=False))
+
+        if errores:
+            self.stderr.write(f"{errores} fórmula(s) con error.")
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.tabla_periodica import cargar_tabla_periodica, ARCHIVO_TABLA_PERIODICA
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga o actualiza los 118 elementos (ElementoQuimico y DetalleElemento) desde el archivo "
+        "de datos incluido, con upsert masivo en una sola transacción. Repetirlo no escribe nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivo', default=str(ARCHIVO_TABLA_PERIODICA),
+            help="Archivo JSON con la tabla periódica (por defecto, el incluido en la aplicación).",
+        )
+        parser.add_argument('--simular', action='store_true', help="Informa los cambios sin escribirlos.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            resumen = cargar_tabla_periodica(options['archivo'], simular=options['simular'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        duracion = time.perf_counter() - inicio
+
+        if not (resumen['elementos_nuevos'] or resumen['elementos_actualizados'] or resumen['detalles_escritos']):
+            self.stdout.write(self.style.SUCCESS(f"Tabla periódica sin cambios ({duracion:.3f} s)."))
+            return
+
+        prefijo = "Cambios pendientes" if options['simular'] else "Tabla periódica cargada"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}: {resumen['elementos_nuevos']} elementos nuevos, "
+            f"{resumen['elementos_actualizados']} actualizados, {resumen['detalles_escritos']} detalles escritos. "
+            f"Compuestos recalculados: {resumen['compuestos_recalculados']} ({duracion:.3f} s)."
+        ))
@@ -0,0 +1,53 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.consultas import compuestos_visibles
+from app_quimico.exportacion import FORMATOS_EXPORTACION, generar_csv, generar_jsonl, escribir_xlsx
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo de compuestos (con composición y aplicaciones) en CSV, JSON Lines "
+        "o XLSX, recorriéndolo por lotes para mantener la memoria constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=FORMATOS_EXPORTACION, default='csv', help="Formato de salida.")
+        parser.add_argument('--salida', default='-', help="Archivo de salida ('-' = stdout; XLSX requiere un archivo).")
+        parser.add_argument(
+            '--usuario',
+            help="Exporta con el alcance de este usuario (un Químico solo ve sus compuestos). Por defecto, todo el catálogo.",
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Compuestos leídos por consulta.")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("El tamaño de lote debe ser mayor que cero.")
+
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"El usuario '{options['usuario']}' no existe.")
+        queryset = compuestos_visibles(usuario)
+
+        formato, salida = options['formato'], options['salida']
+        if formato == 'xlsx':
+            if salida == '-':
+                raise CommandError("La exportación XLSX requiere --salida con la ruta del archivo.")
+            escribir_xlsx(queryset, salida, options['lote'])
+            self.stderr.write(self.style.SUCCESS(f"Catálogo exportado en '{salida}'."))
+            return
+
+        generador = generar_csv if formato == 'csv' else generar_jsonl
+        try:
+            destino = sys.stdout if salida == '-' else open(salida, 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+        try:
+            for linea in generador(queryset, options['lote']):
+                destino.write(linea)
+        finally:
+            if destino is not sys.stdout:
+                destino.close()
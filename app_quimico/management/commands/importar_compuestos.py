@@ -0,0 +1,64 @@
+import csv
+import io
+import os
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.importacion import ImportadorCompuestos, leer_filas, FORMATOS_IMPORTACION, COLUMNAS_IMPORTACION
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa compuestos desde un archivo CSV o JSON Lines (columnas: "
+        + ", ".join(COLUMNAS_IMPORTACION)
+        + "). Escribe por lotes con bulk_create y genera un reporte de errores por fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo a importar ('-' = stdin).")
+        parser.add_argument('--usuario', required=True, help="Username del dueño de los compuestos importados.")
+        parser.add_argument(
+            '--formato', choices=FORMATOS_IMPORTACION,
+            help="Formato del archivo. Por defecto se deduce de la extensión (csv si no se reconoce).",
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Filas escritas por transacción.")
+        parser.add_argument('--errores', help="Archivo CSV para el reporte de errores (por defecto, stderr).")
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario '{options['usuario']}' no existe.")
+
+        formato = options['formato']
+        if formato is None:
+            extension = os.path.splitext(options['archivo'])[1].lstrip('.').lower()
+            formato = extension if extension in FORMATOS_IMPORTACION else 'csv'
+
+        try:
+            importador = ImportadorCompuestos(usuario, tamano_lote=options['lote'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        try:
+            if options['archivo'] == '-':
+                entrada = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+            else:
+                entrada = open(options['archivo'], encoding='utf-8-sig', newline='')
+            salida_errores = open(options['errores'], 'w', encoding='utf-8', newline='') if options['errores'] else None
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+
+        escritor = csv.writer(salida_errores or self.stderr, lineterminator='\n')
+        escritor.writerow(['linea', 'formula', 'error'])
+        try:
+            resumen = importador.importar(leer_filas(entrada, formato), reportar_error=escritor.writerow)
+        finally:
+            if options['archivo'] != '-':
+                entrada.close()
+            if salida_errores:
+                salida_errores.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas leídas: {resumen.leidas}. Compuestos creados: {resumen.creadas}. Rechazadas: {resumen.rechazadas}."
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from app_quimico.models import ElementoQuimico
+from app_quimico.recalculo import recalcular_pesos_moleculares, recomponer_compuestos
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el Peso Molecular almacenado de los compuestos a partir de su composición "
+        "(ElementoCompuesto) y de los pesos atómicos vigentes. Solo escribe las filas que cambian."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--elemento', action='append', dest='simbolos', metavar='SIMBOLO',
+            help="Limita el recálculo a compuestos que contienen este elemento (repetible).",
+        )
+        parser.add_argument(
+            '--composicion', action='store_true',
+            help="Antes del PM, vuelve a derivar la composición y la máscara desde cada fórmula (solo escribe diferencias).",
+        )
+        parser.add_argument('--simular', action='store_true', help="Informa los cambios sin escribirlos.")
+        parser.add_argument('--lote', type=int, default=1000, help="Filas por cada bulk_update.")
+
+    def handle(self, *args, **options):
+        if options['composicion']:
+            if options['simbolos']:
+                raise CommandError("--composicion recorre todo el catálogo: no se combina con --elemento.")
+            self._recomponer(options)
+            return
+
+        elementos = None
+        if options['simbolos']:
+            elementos = list(
+                ElementoQuimico.objects.filter(simbolo_elemento__in=options['simbolos']).values_list('id', flat=True)
+            )
+            if len(elementos) != len(set(options['simbolos'])):
+                raise CommandError("Uno o más símbolos no existen en la tabla periódica.")
+
+        resumen = recalcular_pesos_moleculares(elementos, simular=options['simular'], tamano_lote=options['lote'])
+
+        accion = "requieren actualización" if options['simular'] else "actualizados"
+        self.stdout.write(self.style.SUCCESS(
+            f"Compuestos analizados: {resumen['compuestos']}. {accion.capitalize()}: {resumen['actualizados']}."
+        ))
+        if resumen['omitidos']:
+            self.stdout.write(self.style.WARNING(
+                f"Compuestos omitidos (el PM excede el máximo almacenable): {resumen['omitidos']}."
+            ))
+
+    def _recomponer(self, options):
+        resumen = recomponer_compuestos(simular=options['simular'], tamano_lote=options['lote'])
+        accion = "requieren cambios" if options['simular'] else "recompuestos"
+        self.stdout.write(self.style.SUCCESS(
+            f"Compuestos analizados: {resumen['compuestos']}. {accion.capitalize()}: {resumen['recompuestos']} "
+            f"(filas nuevas: {resumen['creadas']}, actualizadas: {resumen['actualizadas']}, "
+            f"borradas: {resumen['borradas']})."
+        ))
+        if resumen['errores']:
+            self.stdout.write(self.style.WARNING(f"Fórmulas no válidas omitidas: {resumen['errores']}."))
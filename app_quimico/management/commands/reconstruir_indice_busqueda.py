@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from app_quimico.models import TerminoBusqueda
+from app_quimico.busqueda import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de búsqueda (TerminoBusqueda) de compuestos y/o elementos. "
+        "Útil tras cargas masivas que no disparan señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', choices=[tipo for tipo, _ in TerminoBusqueda.TIPO_CHOICES], action='append', dest='tipos',
+            help="Tipo de objeto a reindexar (repetible). Por defecto, todos.",
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Objetos indexados por lote.")
+
+    def handle(self, *args, **options):
+        tipos = options['tipos'] or [tipo for tipo, _ in TerminoBusqueda.TIPO_CHOICES]
+        for tipo in tipos:
+            with transaction.atomic():
+                total = reconstruir_indice(tipo, tamano_lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(f"Índice de '{tipo}' reconstruido: {total} objetos."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from app_quimico.resumen import reparar_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el resumen denormalizado de los compuestos (totales de aplicaciones y elementos, "
+        "aplicación, industria y concentración principales) y reescribe solo los que difieren."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help="Informa los compuestos desfasados sin corregirlos.")
+        parser.add_argument('--lote', type=int, default=1000, help="Compuestos comparados por consulta.")
+
+    def handle(self, *args, **options):
+        resumen = reparar_resumenes(simular=options['simular'], tamano_lote=options['lote'])
+
+        accion = "desfasados" if options['simular'] else "reparados"
+        self.stdout.write(self.style.SUCCESS(
+            f"Compuestos analizados: {resumen['compuestos']}. {accion.capitalize()}: {resumen['reparados']}."
+        ))
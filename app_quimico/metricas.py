@@ -0,0 +1,325 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from app_quimico.fragmentos import estadisticas_fragmentos
+from app_quimico.utils import estadisticas_cache_analisis, tabla_pesos
+
+logger = logging.getLogger(__name__)
+
+
+# ====================================================== #
+# MÉTRICAS POR VISTA (Consultas, Tiempos y Presupuestos) #
+# ====================================================== #
+
+def metricas_activas() -> bool:
+    return getattr(settings, 'GESTOR_QUIMICO_METRICAS', False)
+
+
+def presupuestos() -> dict:
+    """{nombre_url: {'consultas': n, 'ms': n}}; cualquiera de los dos límites es opcional."""
+    return getattr(settings, 'GESTOR_QUIMICO_METRICAS_PRESUPUESTOS', {})
+
+
+# Límites superiores de los buckets (Prometheus añade +Inf)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Nombre de la métrica -> (ayuda, buckets)
+HISTOGRAMAS = {
+    'gestor_quimico_peticion_segundos': ("Tiempo total de la petición por vista.", BUCKETS_SEGUNDOS),
+    'gestor_quimico_bd_segundos': ("Tiempo en la base de datos por petición y vista.", BUCKETS_SEGUNDOS),
+    'gestor_quimico_plantilla_segundos': ("Tiempo de render de la TemplateResponse por vista.", BUCKETS_SEGUNDOS),
+    'gestor_quimico_consultas': ("Consultas SQL por petición y vista.", BUCKETS_CONSULTAS),
+}
+
+
+class Histograma:
+    """Conteos acumulables por bucket, suma y total (sin dependencias externas)."""
+
+    __slots__ = ('limites', 'conteos', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * len(limites)
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        posicion = bisect.bisect_left(self.limites, valor)
+        if posicion < len(self.conteos):
+            self.conteos[posicion] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        """Pares (límite, observaciones <= límite), como exige el formato de Prometheus."""
+        acumulado = 0
+        for limite, conteo in zip(self.limites, self.conteos):
+            acumulado += conteo
+            yield limite, acumulado
+
+
+class RegistroMetricas:
+    """
+    Histogramas por vista de este proceso (como las estadísticas de la tabla de pesos):
+    cada worker expone los suyos y Prometheus los agrega.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {nombre: {} for nombre in HISTOGRAMAS}
+        self._excedidos = {}
+
+    def reiniciar(self):
+        with self._lock:
+            self._histogramas = {nombre: {} for nombre in HISTOGRAMAS}
+            self._excedidos = {}
+
+    def registrar(self, vista, medicion, excedidos=()):
+        with self._lock:
+            for nombre, valor in medicion.items():
+                por_vista = self._histogramas[nombre]
+                histograma = por_vista.get(vista)
+                if histograma is None:
+                    histograma = por_vista[vista] = Histograma(HISTOGRAMAS[nombre][1])
+                histograma.observar(valor)
+            for limite in excedidos:
+                self._excedidos[(vista, limite)] = self._excedidos.get((vista, limite), 0) + 1
+
+    def instantanea(self):
+        """Copia consistente de histogramas y contadores para exponerla sin bloquear las peticiones."""
+        with self._lock:
+            histogramas = {
+                nombre: {
+                    vista: (tuple(h.acumulados()), h.suma, h.total) for vista, h in sorted(por_vista.items())
+                }
+                for nombre, por_vista in self._histogramas.items()
+            }
+            return histogramas, dict(self._excedidos)
+
+
+# Instancia única del proceso
+registro = RegistroMetricas()
+
+
+# ================================================= #
+# MIDDLEWARE DE INSTRUMENTACIÓN (Por Nombre de URL) #
+# ================================================= #
+
+class MedicionPeticion:
+    """
+    Contadores de una petición: consultas y tiempo de BD y tiempo de plantilla.
+    Las consultas pueden llegar a la vez desde varios hilos (en_paralelo de las vistas asíncronas).
+    """
+
+    __slots__ = ('consultas', 'segundos_bd', 'inicio_plantilla', 'segundos_plantilla', '_lock')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_bd = 0.0
+        self.inicio_plantilla = None
+        self.segundos_plantilla = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            segundos = time.perf_counter() - inicio
+            with self._lock:
+                self.segundos_bd += segundos
+                self.consultas += 1
+
+
+# Medición de la petición en curso. sync_to_async copia el contexto al hilo que ejecuta
+# el código síncrono (también a los del pool de en_paralelo), así que sus consultas cuentan.
+_medicion_actual = ContextVar('medicion_metricas', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper permanente de cada conexión: mide solo dentro de una petición instrumentada."""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def instrumentar_conexion(conexion):
+    if _medir_consulta not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(_medir_consulta)
+
+
+@receiver(connection_created)
+def _instrumentar_conexion_nueva(sender, connection, **kwargs):
+    # Cada hilo abre sus propias conexiones (petición, pool de en_paralelo): todas quedan medidas
+    if metricas_activas():
+        instrumentar_conexion(connection)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición (total, BD, plantilla y número de consultas) y la agrega bajo el
+    nombre de la URL resuelta (compuesto_lista, elemento_detalle...). Registra en el log
+    las peticiones que superan el presupuesto de su vista (GESTOR_QUIMICO_METRICAS_PRESUPUESTOS).
+    Con GESTOR_QUIMICO_METRICAS = False Django descarta el middleware al arrancar (coste cero).
+    Debe ir el primero de MIDDLEWARE para que el tiempo total incluya a los demás.
+    Bajo ASGI se ejecuta como corrutina; las consultas de los hilos de en_paralelo también cuentan.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metricas_activas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Conexiones ya abiertas en este hilo antes de activar las métricas
+        for conexion in connections.all(initialized_only=True):
+            instrumentar_conexion(conexion)
+        medicion, inicio, token = self._iniciar(request)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        self._registrar(request, medicion, time.perf_counter() - inicio)
+        return respuesta
+
+    async def __acall__(self, request):
+        medicion, inicio, token = self._iniciar(request)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        self._registrar(request, medicion, time.perf_counter() - inicio)
+        return respuesta
+
+    @staticmethod
+    def _iniciar(request):
+        medicion = MedicionPeticion()
+        request._medicion_metricas = medicion
+        return medicion, time.perf_counter(), _medicion_actual.set(medicion)
+
+    def _registrar(self, request, medicion, total):
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia is not None else 'sin_ruta'
+        excedidos = self._excedidos(vista, medicion.consultas, total)
+        registro.registrar(vista, {
+            'gestor_quimico_peticion_segundos': total,
+            'gestor_quimico_bd_segundos': medicion.segundos_bd,
+            'gestor_quimico_plantilla_segundos': medicion.segundos_plantilla,
+            'gestor_quimico_consultas': medicion.consultas,
+        }, excedidos)
+        if excedidos:
+            logger.warning(
+                "Presupuesto excedido en %s (%s %s): %d consultas, %.1f ms (BD %.1f ms, plantilla %.1f ms). Límite: %s.",
+                vista, request.method, request.path, medicion.consultas, total * 1000,
+                medicion.segundos_bd * 1000, medicion.segundos_plantilla * 1000, presupuestos()[vista],
+            )
+
+    def process_template_response(self, request, response):
+        # Último en ejecutarse (primer middleware): el render empieza justo después
+        medicion = request._medicion_metricas
+        medicion.inicio_plantilla = time.perf_counter()
+        response.add_post_render_callback(lambda _: self._fin_plantilla(medicion))
+        return response
+
+    @staticmethod
+    def _fin_plantilla(medicion):
+        medicion.segundos_plantilla += time.perf_counter() - medicion.inicio_plantilla
+
+    @staticmethod
+    def _excedidos(vista, consultas, segundos):
+        presupuesto = presupuestos().get(vista)
+        if not presupuesto:
+            return ()
+        excedidos = []
+        if 'consultas' in presupuesto and consultas > presupuesto['consultas']:
+            excedidos.append('consultas')
+        if 'ms' in presupuesto and segundos * 1000 > presupuesto['ms']:
+            excedidos.append('ms')
+        return excedidos
+
+
+# ============================================ #
+# EXPOSICIÓN EN FORMATO DE TEXTO DE PROMETHEUS #
+# ============================================ #
+
+def _etiqueta(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus() -> str:
+    """Histogramas por vista, presupuestos excedidos y estadísticas de las cachés del proceso."""
+    histogramas, excedidos = registro.instantanea()
+    lineas = []
+    for nombre, (ayuda, _) in HISTOGRAMAS.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+        for vista, (acumulados, suma, total) in histogramas[nombre].items():
+            etiqueta = f'vista="{_etiqueta(vista)}"'
+            for limite, acumulado in acumulados:
+                lineas.append(f'{nombre}_bucket{{{etiqueta},le="{_numero(limite)}"}} {acumulado}')
+            lineas.append(f'{nombre}_bucket{{{etiqueta},le="+Inf"}} {total}')
+            lineas.append(f'{nombre}_sum{{{etiqueta}}} {_numero(suma)}')
+            lineas.append(f'{nombre}_count{{{etiqueta}}} {total}')
+
+    nombre = 'gestor_quimico_presupuesto_excedido_total'
+    lineas += [f'# HELP {nombre} Peticiones que superaron el presupuesto de su vista.', f'# TYPE {nombre} counter']
+    for (vista, limite), conteo in sorted(excedidos.items()):
+        lineas.append(f'{nombre}{{vista="{_etiqueta(vista)}",limite="{limite}"}} {conteo}')
+
+    # Cachés del proceso: fragmentos HTML, tabla de pesos y fórmulas analizadas
+    for sufijo in ('aciertos', 'fallos'):
+        nombre = f'gestor_quimico_fragmento_{sufijo}_total'
+        lineas += [f'# HELP {nombre} Consultas a la caché de fragmentos ({sufijo}).', f'# TYPE {nombre} counter']
+        for fragmento, datos in sorted(estadisticas_fragmentos().items()):
+            lineas.append(f'{nombre}{{fragmento="{_etiqueta(fragmento)}"}} {datos[sufijo]}')
+    en_memoria = {
+        'tabla_pesos': tabla_pesos.estadisticas(),
+        'formulas': estadisticas_cache_analisis(),
+    }
+    for sufijo in ('aciertos', 'fallos'):
+        nombre = f'gestor_quimico_cache_{sufijo}_total'
+        lineas += [f'# HELP {nombre} Consultas a las cachés en memoria ({sufijo}).', f'# TYPE {nombre} counter']
+        for cache, datos in en_memoria.items():
+            lineas.append(f'{nombre}{{cache="{cache}"}} {datos[sufijo]}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _autorizado(request) -> bool:
+    """Staff autenticado o 'Authorization: Bearer <GESTOR_QUIMICO_METRICAS_TOKEN>' (para el scraper)."""
+    token = getattr(settings, 'GESTOR_QUIMICO_METRICAS_TOKEN', '')
+    cabecera = request.headers.get('Authorization', '')
+    if token and cabecera.startswith('Bearer ') and hmac.compare_digest(cabecera[7:].encode(), token.encode()):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_GET
+def exponer_metricas(request):
+    if not metricas_activas():
+        raise Http404("Métricas desactivadas.")
+    if not _autorizado(request):
+        return HttpResponseForbidden("Acceso restringido.", content_type='text/plain; charset=utf-8')
+    return HttpResponse(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+def poblar_indice(apps, schema_editor):
+    """Indexa los compuestos y elementos existentes (las señales solo cubren cambios futuros)."""
+    from app_quimico.busqueda import terminos_compuesto, terminos_elemento
+
+    TerminoBusqueda = apps.get_model('app_quimico', 'TerminoBusqueda')
+    CompuestoQuimico = apps.get_model('app_quimico', 'CompuestoQuimico')
+    ElementoQuimico = apps.get_model('app_quimico', 'ElementoQuimico')
+
+    fuentes = (
+        ('compuesto', CompuestoQuimico.objects.values_list('id', 'nombre_compuesto', 'formula_compuesto'), terminos_compuesto),
+        ('elemento', ElementoQuimico.objects.values_list('id', 'nombre_elemento', 'simbolo_elemento'), terminos_elemento),
+    )
+    for tipo, filas, generar in fuentes:
+        lote = []
+        for id_objeto, nombre, formula in filas.iterator(chunk_size=2000):
+            lote.extend(
+                TerminoBusqueda(tipo_objeto=tipo, id_objeto=id_objeto, campo=campo, termino=termino, peso=peso)
+                for (campo, termino), peso in generar(nombre, formula).items()
+            )
+            if len(lote) >= 5000:
+                TerminoBusqueda.objects.bulk_create(lote)
+                lote = []
+        TerminoBusqueda.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_quimico', '0003_versiondatos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_objeto', models.CharField(choices=[('compuesto', 'Compuesto Químico'), ('elemento', 'Elemento Químico')], max_length=10, verbose_name='Tipo de Objeto')),
+                ('id_objeto', models.BigIntegerField(verbose_name='ID del Objeto')),
+                ('campo', models.CharField(choices=[('n', 'Nombre'), ('f', 'Fórmula / Símbolo')], max_length=1, verbose_name='Campo de Origen')),
+                ('termino', models.CharField(max_length=64, verbose_name='Término Indexado')),
+                ('peso', models.PositiveSmallIntegerField(default=1, verbose_name='Peso para el Ranking')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda',
+                'verbose_name_plural': 'Términos de Búsqueda',
+                'indexes': [models.Index(fields=['tipo_objeto', 'campo', 'termino', 'id_objeto'], name='busqueda_termino_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo_objeto', 'id_objeto', 'campo', 'termino'), name='unique_termino_por_objeto')],
+            },
+        ),
+        migrations.RunPython(poblar_indice, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+# Copia congelada de composicion.calcular_mascaras: la migración no debe cambiar si el
+# código de la aplicación evoluciona (bit Z - 1 en 'bajos' para Z <= 63, Z - 64 en 'altos').
+BITS_POR_MASCARA = 63
+
+
+def calcular_mascaras(numeros_atomicos):
+    mascaras = {'mascara_elementos_bajos': 0, 'mascara_elementos_altos': 0}
+    for numero in numeros_atomicos:
+        if numero <= BITS_POR_MASCARA:
+            mascaras['mascara_elementos_bajos'] |= 1 << (numero - 1)
+        else:
+            mascaras['mascara_elementos_altos'] |= 1 << (numero - 1 - BITS_POR_MASCARA)
+    return mascaras
+
+
+def poblar_mascaras(apps, schema_editor):
+    """Calcula la máscara de presencia de elementos de los compuestos existentes."""
+    CompuestoQuimico = apps.get_model('app_quimico', 'CompuestoQuimico')
+    ElementoCompuesto = apps.get_model('app_quimico', 'ElementoCompuesto')
+
+    numeros = {}
+    filas = ElementoCompuesto.objects.values_list('id_compuesto', 'id_elemento__numero_atomico_elemento')
+    for id_compuesto, numero in filas.iterator(chunk_size=20000):
+        numeros.setdefault(id_compuesto, []).append(numero)
+
+    cambiados = [
+        CompuestoQuimico(id=id_compuesto, **calcular_mascaras(lista))
+        for id_compuesto, lista in numeros.items()
+    ]
+    CompuestoQuimico.objects.bulk_update(
+        cambiados, ['mascara_elementos_bajos', 'mascara_elementos_altos'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_quimico', '0004_terminobusqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='mascara_elementos_altos',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Máscara de Elementos (Z 64-118)'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='mascara_elementos_bajos',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Máscara de Elementos (Z 1-63)'),
+        ),
+        migrations.AddIndex(
+            model_name='elementocompuesto',
+            index=models.Index(fields=['id_elemento', 'cantidad_elem_en_comp', 'id_compuesto'], name='elemcomp_cantidad_idx'),
+        ),
+        migrations.RunPython(poblar_mascaras, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:28
+
+import re
+
+from django.db import migrations, models
+
+
+# Copia congelada de utils.descomponer_formula / formula_hill / formula_canonica: la migración
+# no debe cambiar si el analizador de la aplicación evoluciona.
+PATRON_TOKENS = re.compile(r'([A-Z][a-z]?|\d+|[()\[\]\{\}])')
+AGRUPADORES_CIERRE = frozenset(')]}')
+AGRUPADORES_APERTURA = frozenset('([{')
+LARGO_MAXIMO_CANONICA = 255
+
+
+def descomponer_formula(formula):
+    """{símbolo: cantidad} de la fórmula (tokens de derecha a izquierda con pila), o ValueError."""
+    conteo = {}
+    multiplicadores_stack = [1]
+    factor_actual = 1
+    ultimo_subindice = 1
+
+    for token in reversed(PATRON_TOKENS.findall(formula)):
+        if token.isdigit():
+            ultimo_subindice = int(token)
+        elif token in AGRUPADORES_CIERRE:
+            factor_actual *= ultimo_subindice
+            multiplicadores_stack.append(factor_actual)
+            ultimo_subindice = 1
+        elif token in AGRUPADORES_APERTURA:
+            if len(multiplicadores_stack) == 1:
+                raise ValueError(token)
+            multiplicadores_stack.pop()
+            factor_actual = multiplicadores_stack[-1]
+            ultimo_subindice = 1
+        else:
+            cantidad_total = ultimo_subindice * factor_actual
+            if cantidad_total:
+                conteo[token] = conteo.get(token, 0) + cantidad_total
+            ultimo_subindice = 1
+
+    if len(multiplicadores_stack) > 1:
+        raise ValueError(formula)
+    return conteo
+
+
+def formula_canonica(formula):
+    """Clave de Hill (C, H y el resto alfabético; sin C, todo alfabético) o None."""
+    try:
+        conteo = descomponer_formula(formula)
+    except ValueError:
+        return None
+    if not conteo:
+        return None
+    if 'C' in conteo:
+        orden = ['C'] + (['H'] if 'H' in conteo else []) + sorted(s for s in conteo if s not in ('C', 'H'))
+    else:
+        orden = sorted(conteo)
+    canonica = ''.join(simbolo if conteo[simbolo] == 1 else f'{simbolo}{conteo[simbolo]}' for simbolo in orden)
+    return canonica if len(canonica) <= LARGO_MAXIMO_CANONICA else None
+
+
+def poblar_formula_canonica(apps, schema_editor):
+    """Calcula la clave de Hill de todos los compuestos existentes (los equivalentes comparten clave)."""
+    CompuestoQuimico = apps.get_model('app_quimico', 'CompuestoQuimico')
+    cambiados = []
+    filas = CompuestoQuimico.objects.order_by('id').values_list('id', 'formula_compuesto')
+    for id_compuesto, formula in filas.iterator(chunk_size=2000):
+        canonica = formula_canonica(formula)
+        if canonica is not None:
+            cambiados.append(CompuestoQuimico(id=id_compuesto, formula_canonica=canonica))
+    CompuestoQuimico.objects.bulk_update(cambiados, ['formula_canonica'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_quimico', '0005_composicion_mascaras'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='formula_canonica',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, null=True, verbose_name='Fórmula Canónica (Hill)'),
+        ),
+        migrations.RunPython(poblar_formula_canonica, migrations.RunPython.noop),
+    ]
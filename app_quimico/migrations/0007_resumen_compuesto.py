@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_resumen(apps, schema_editor):
+    """
+    Calcula el resumen de los compuestos existentes con las mismas subconsultas que
+    resumen.expresiones_resumen (sobre los modelos históricos), por tramos de ids.
+    """
+    CompuestoQuimico = apps.get_model('app_quimico', 'CompuestoQuimico')
+    CompuestoAplicacion = apps.get_model('app_quimico', 'CompuestoAplicacion')
+    ElementoCompuesto = apps.get_model('app_quimico', 'ElementoCompuesto')
+
+    def contar(queryset):
+        conteo = queryset.order_by().values('id_compuesto').annotate(total=Count('id')).values('total')
+        return Coalesce(Subquery(conteo, output_field=IntegerField()), Value(0))
+
+    principal = CompuestoAplicacion.objects.filter(id_compuesto=OuterRef('pk')).order_by('id')
+    expresiones = {
+        'total_aplicaciones': contar(CompuestoAplicacion.objects.filter(id_compuesto=OuterRef('pk'))),
+        'total_elementos': contar(ElementoCompuesto.objects.filter(id_compuesto=OuterRef('pk'))),
+        'aplicacion_principal': Coalesce(Subquery(principal.values('id_aplicacion__nombre_uso')[:1]), Value('')),
+        'industria_principal': Coalesce(
+            Subquery(principal.values('id_aplicacion__id_industria__nombre_industria')[:1]), Value('')
+        ),
+        'concentracion_principal': Subquery(principal.values('concentracion_minima')[:1]),
+        'tipo_concentracion_principal': Coalesce(Subquery(principal.values('tipo_concentracion')[:1]), Value('')),
+    }
+    ids = list(CompuestoQuimico.objects.order_by('id').values_list('id', flat=True))
+    for inicio in range(0, len(ids), 2000):
+        CompuestoQuimico.objects.filter(pk__in=ids[inicio:inicio + 2000]).update(**expresiones)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_quimico', '0006_formula_canonica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='aplicacion_principal',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Aplicación Principal'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='concentracion_principal',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True, verbose_name='Concentración de la Aplicación Principal'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='industria_principal',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='Industria Principal'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='tipo_concentracion_principal',
+            field=models.CharField(blank=True, choices=[('%p/p', '% Peso en Peso (p/p)'), ('%p/v', '% Peso en Volumen (p/v)'), ('ppm', 'Partes por Millón (ppm)'), ('[M]', 'Molaridad [M]'), ('[N]', 'Normalidad [N]'), ('otra', 'Otra Unidad')], default='', editable=False, max_length=5, verbose_name='Tipo de Concentración de la Aplicación Principal'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='total_aplicaciones',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Aplicaciones'),
+        ),
+        migrations.AddField(
+            model_name='compuestoquimico',
+            name='total_elementos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Elementos Distintos'),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
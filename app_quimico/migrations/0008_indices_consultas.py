@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_quimico', '0007_resumen_compuesto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compuestoquimico',
+            index=models.Index(fields=['usuario', 'nombre_compuesto', 'id'], name='compuesto_usuario_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compuestoquimico',
+            index=models.Index(fields=['nombre_compuesto', 'id'], name='compuesto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compuestoquimico',
+            index=models.Index(fields=['peso_molecular_compuesto'], name='compuesto_pm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compuestoaplicacion',
+            index=models.Index(fields=['id_aplicacion', 'id_compuesto'], name='compapl_aplicacion_comp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleelemento',
+            index=models.Index(fields=['categoria_elemento', 'id_elemento'], name='detalle_categoria_idx'),
+        ),
+    ]
@@ -145,6 +145,79 @@ class CompuestoQuimico(models.Model):
         default=timezone.now, 
         verbose_name="Fecha de Registro"
     )
+    # Fórmula en orden de Hill (utils.formula_hill): Ca(OH)2 y CaO2H2 comparten la misma clave.
+    # No identifica al compuesto (los isómeros la comparten): su índice solo resuelve
+    # equivalentes y "quién más lo registró" sin escanear.
+    formula_canonica = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Fórmula Canónica (Hill)"
+    )
+    # Máscara de presencia de elementos (bit Z-1; ver composicion.bit_elemento).
+    # Permite prefiltrar búsquedas por composición sin JOIN contra ElementoCompuesto.
+    mascara_elementos_bajos = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Máscara de Elementos (Z 1-63)"
+    )
+    mascara_elementos_altos = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Máscara de Elementos (Z 64-118)"
+    )
+    # Resumen denormalizado para la tarjeta del catálogo (lo escribe resumen.refrescar_resumenes
+    # en la misma transacción que la relación o la composición): la lista no necesita JOIN ni COUNT.
+    total_aplicaciones = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Total de Aplicaciones"
+    )
+    total_elementos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Total de Elementos Distintos"
+    )
+    aplicacion_principal = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Aplicación Principal"
+    )
+    industria_principal = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Industria Principal"
+    )
+    concentracion_principal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Concentración de la Aplicación Principal"
+    )
+    tipo_concentracion_principal = models.CharField(
+        max_length=5,
+        choices=CONCENTRACION_CHOICES,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Tipo de Concentración de la Aplicación Principal"
+    )
+
+    # Columnas del resumen según el dato del que dependen
+    CAMPOS_RESUMEN_APLICACION = (
+        'total_aplicaciones', 'aplicacion_principal', 'industria_principal',
+        'concentracion_principal', 'tipo_concentracion_principal',
+    )
+    CAMPOS_RESUMEN_COMPOSICION = ('total_elementos',)
+    CAMPOS_RESUMEN = CAMPOS_RESUMEN_APLICACION + CAMPOS_RESUMEN_COMPOSICION
 
     class Meta:
         verbose_name = "Compuesto Químico"
@@ -153,12 +226,40 @@ class CompuestoQuimico(models.Model):
             UniqueConstraint(
                 fields=['formula_compuesto', 'usuario'], 
                 name='unique_formula_per_user'
-            )
+            ),
+        ]
+        indexes = [
+            # Lista de un Químico: WHERE usuario = ? ORDER BY nombre, id (cursor keyset)
+            # se lee en orden del índice, sin ordenar en memoria.
+            models.Index(fields=['usuario', 'nombre_compuesto', 'id'], name='compuesto_usuario_nombre_idx'),
+            # Lista global (Administradores y Colaboradores): mismo orden sin filtro de dueño
+            models.Index(fields=['nombre_compuesto', 'id'], name='compuesto_nombre_idx'),
+            # Rango de PM sin industria (peso_molecular_compuesto__gte)
+            models.Index(fields=['peso_molecular_compuesto'], name='compuesto_pm_idx'),
         ]
 
     def __str__(self):
         return f"{self.formula_compuesto} ({self.nombre_compuesto})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Texto indexado tal como se leyó: el índice de búsqueda solo se rehace si cambia
+        # (signals.indexar_compuesto). Con alguno de los campos diferido no hay referencia.
+        if 'nombre_compuesto' in instancia.__dict__ and 'formula_compuesto' in instancia.__dict__:
+            instancia._texto_indexado = (instancia.nombre_compuesto, instancia.formula_compuesto)
+        return instancia
+
+    def save(self, *args, **kwargs):
+        # El resumen solo lo escribe resumen.refrescar_resumenes: el save() completo de una
+        # instancia ya cargada (vistas de edición) no debe pisarlo con los valores que leyó.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_RESUMEN
+            ]
+        super().save(*args, **kwargs)
+
 
 # =========================== #
 # TABLAS DEPENDIENTES / HIJAS #
@@ -272,6 +373,10 @@ class DetalleElemento(models.Model):
     class Meta:
         verbose_name = "Detalle del Elemento"
         verbose_name_plural = "Detalles de Elementos"
+        indexes = [
+            # Tabla periódica filtrada por categoría: el índice ya trae la clave del JOIN con el elemento
+            models.Index(fields=['categoria_elemento', 'id_elemento'], name='detalle_categoria_idx'),
+        ]
 
     def __str__(self):
         return f"Detalles de {self.id_elemento.simbolo_elemento}"
@@ -298,6 +403,11 @@ class ElementoCompuesto(models.Model):
         verbose_name = "Elemento en Compuesto"
         verbose_name_plural = "Elementos en Compuestos"
         unique_together = ('id_elemento', 'id_compuesto')
+        indexes = [
+            # Búsqueda por composición: "elemento X con cantidad en [a, b]" se resuelve
+            # con un rango sobre este índice sin leer la tabla (cubre id_compuesto).
+            models.Index(fields=['id_elemento', 'cantidad_elem_en_comp', 'id_compuesto'], name='elemcomp_cantidad_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id_elemento.simbolo_elemento} en {self.id_compuesto.formula_compuesto}"
@@ -361,6 +471,89 @@ class CompuestoAplicacion(models.Model):
         verbose_name = "Compuesto en Aplicación"
         verbose_name_plural = "Compuestos en Aplicaciones"
         unique_together = ('id_compuesto', 'id_aplicacion')
+        indexes = [
+            # Filtro por industria: aplicaciones de la industria -> sus compuestos, solo con el índice
+            # (la clave única empieza por id_compuesto y no sirve para este recorrido)
+            models.Index(fields=['id_aplicacion', 'id_compuesto'], name='compapl_aplicacion_comp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_compuesto.formula_compuesto} en Concentración"
+
+# =================================== #
+# TABLAS DE SOPORTE (Infraestructura) #
+# =================================== #
+
+# (9) Tabla versiones_datos (Contadores de invalidación compartidos entre procesos)
+class VersionDatos(models.Model):
+    clave = models.CharField(
+        max_length=100, 
+        unique=True, 
+        verbose_name="Clave del Conjunto de Datos"
+    )
+    version = models.BigIntegerField(
+        default=0, 
+        verbose_name="Versión"
+    )
+
+    class Meta:
+        verbose_name = "Versión de Datos"
+        verbose_name_plural = "Versiones de Datos"
+
+    def __str__(self):
+        return f"{self.clave} (v{self.version})"
+
+
+# (10) Tabla terminos_busqueda (Índice invertido de términos para búsquedas rápidas)
+class TerminoBusqueda(models.Model):
+    TIPO_COMPUESTO = 'compuesto'
+    TIPO_ELEMENTO = 'elemento'
+    TIPO_CHOICES = [
+        (TIPO_COMPUESTO, 'Compuesto Químico'),
+        (TIPO_ELEMENTO, 'Elemento Químico'),
+    ]
+    CAMPO_NOMBRE = 'n'
+    CAMPO_FORMULA = 'f'
+    CAMPO_CHOICES = [
+        (CAMPO_NOMBRE, 'Nombre'),
+        (CAMPO_FORMULA, 'Fórmula / Símbolo'),
+    ]
+
+    tipo_objeto = models.CharField(
+        max_length=10, 
+        choices=TIPO_CHOICES,
+        verbose_name="Tipo de Objeto"
+    )
+    id_objeto = models.BigIntegerField(
+        verbose_name="ID del Objeto"
+    )
+    campo = models.CharField(
+        max_length=1, 
+        choices=CAMPO_CHOICES,
+        verbose_name="Campo de Origen"
+    )
+    termino = models.CharField(
+        max_length=64, 
+        verbose_name="Término Indexado"
+    )
+    peso = models.PositiveSmallIntegerField(
+        default=1, 
+        verbose_name="Peso para el Ranking"
+    )
+
+    class Meta:
+        verbose_name = "Término de Búsqueda"
+        verbose_name_plural = "Términos de Búsqueda"
+        constraints = [
+            UniqueConstraint(
+                fields=['tipo_objeto', 'id_objeto', 'campo', 'termino'], 
+                name='unique_termino_por_objeto'
+            )
+        ]
+        indexes = [
+            # Búsqueda por prefijo: rango sobre (tipo_objeto, campo, termino) que devuelve id_objeto sin ir a la tabla
+            models.Index(fields=['tipo_objeto', 'campo', 'termino', 'id_objeto'], name='busqueda_termino_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.id_compuesto.formula_compuesto} en Concentración"
\ No newline at end of file
+        return f"{self.termino} → {self.tipo_objeto} #{self.id_objeto}"
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# ===================================== #
+# PAGINACIÓN POR CURSOR (Keyset / Seek) #
+# ===================================== #
+
+def codificar_cursor(valores) -> str:
+    """Codifica los valores de la clave de orden como un cursor opaco apto para URL."""
+    crudo = json.dumps(list(valores), ensure_ascii=False, default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str, campos):
+    """
+    Devuelve los valores del cursor convertidos al tipo de cada campo de orden (campos
+    del modelo), o None si el cursor es inválido: un cursor alterado vuelve a la primera página.
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        return None
+
+    convertidos = []
+    for campo, valor in zip(campos, valores):
+        # Solo texto o números: null, listas, objetos y booleanos no son valores de una clave de orden
+        if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+            return None
+        try:
+            # clean(): conversión al tipo del campo y sus validadores (rango del entero, largo máximo)
+            convertidos.append(campo.clean(valor, None))
+        except (ValidationError, OverflowError):
+            return None
+    return convertidos
+
+
+class PaginaKeyset:
+    """Una página de resultados con los cursores para navegar hacia adelante y atrás."""
+
+    def __init__(self, objetos, cursor_anterior=None, cursor_siguiente=None):
+        self.objetos = objetos
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+
+class PaginadorKeyset:
+    """
+    Pagina un queryset por una clave de orden única (ej. ('nombre_compuesto', 'id')).
+    En lugar de OFFSET, cada página filtra "después de la última fila vista", por lo que
+    el costo es O(tamaño de página) sin importar qué tan profundo se navegue.
+    """
+
+    def __init__(self, queryset, campos_orden, tamano_pagina):
+        self.queryset = queryset
+        self.campos_orden = tuple(campos_orden)
+        self.campos_modelo = [queryset.model._meta.get_field(campo) for campo in self.campos_orden]
+        self.tamano_pagina = tamano_pagina
+
+    def _filtro_posterior(self, valores, descendente=False):
+        """Construye (c1, c2, ...) > (v1, v2, ...) como OR de prefijos (portátil entre motores)."""
+        operador = 'lt' if descendente else 'gt'
+        condicion = Q()
+        for i, campo in enumerate(self.campos_orden):
+            prefijo = {c: v for c, v in zip(self.campos_orden[:i], valores[:i])}
+            condicion |= Q(**prefijo, **{f'{campo}__{operador}': valores[i]})
+        return condicion
+
+    def _clave(self, objeto):
+        return codificar_cursor(getattr(objeto, campo) for campo in self.campos_orden)
+
+    def pagina(self, despues=None, antes=None) -> PaginaKeyset:
+        """Obtiene la página que sigue al cursor 'despues' o la que precede al cursor 'antes'."""
+        valores_antes = decodificar_cursor(antes, self.campos_modelo)
+        valores_despues = decodificar_cursor(despues, self.campos_modelo)
+
+        if valores_antes is not None:
+            # Página anterior: se recorre el orden inverso y luego se invierte el resultado
+            orden = [f'-{campo}' for campo in self.campos_orden]
+            consulta = self.queryset.filter(self._filtro_posterior(valores_antes, descendente=True))
+            objetos = list(consulta.order_by(*orden)[:self.tamano_pagina + 1])
+            hay_mas = len(objetos) > self.tamano_pagina
+            objetos = objetos[:self.tamano_pagina][::-1]
+            if not objetos:
+                return PaginaKeyset([])
+            return PaginaKeyset(
+                objetos,
+                cursor_anterior=self._clave(objetos[0]) if hay_mas else None,
+                cursor_siguiente=self._clave(objetos[-1]),
+            )
+
+        consulta = self.queryset
+        if valores_despues is not None:
+            consulta = consulta.filter(self._filtro_posterior(valores_despues))
+        objetos = list(consulta.order_by(*self.campos_orden)[:self.tamano_pagina + 1])
+        hay_mas = len(objetos) > self.tamano_pagina
+        objetos = objetos[:self.tamano_pagina]
+        if not objetos:
+            return PaginaKeyset([])
+        return PaginaKeyset(
+            objetos,
+            cursor_anterior=self._clave(objetos[0]) if valores_despues is not None else None,
+            cursor_siguiente=self._clave(objetos[-1]) if hay_mas else None,
+        )
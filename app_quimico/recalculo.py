@@ -0,0 +1,178 @@
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from app_quimico.models import ElementoQuimico, CompuestoQuimico, ElementoCompuesto
+from app_quimico.utils import CalculadoraPM, decimal_a_entero, entero_a_decimal
+from app_quimico.composicion import calcular_mascaras, duenos_compuestos, sincronizar_composicion
+from app_quimico import versiones
+
+
+# ========================================================== #
+# MOTOR DE RECÁLCULO MASIVO DEL PESO MOLECULAR (Vectorizado) #
+# ========================================================== #
+
+# Los pesos se manejan como enteros en diezmilésimas de g/mol (ver utils.decimal_a_entero),
+# así el producto matriz-vector es exacto y no arrastra errores de coma flotante.
+DTYPE_COMPOSICION = [('compuesto', 'i8'), ('elemento', 'i8'), ('cantidad', 'i8')]
+
+# peso_molecular_compuesto es DecimalField(max_digits=10, decimal_places=4): el máximo
+# almacenable es < 10^6 g/mol (mismo límite que aplica la importación).
+PESO_MAXIMO = decimal_a_entero(Decimal('1e6'))
+
+
+def _vector_pesos():
+    """Devuelve (ids de elementos ordenados, pesos enteros alineados)."""
+    filas = ElementoQuimico.objects.order_by('id').values_list('id', 'peso_atomico_elemento')
+    ids = np.fromiter((f[0] for f in filas), dtype='i8')
+    pesos = np.fromiter((decimal_a_entero(f[1]) for f in filas), dtype='i8', count=len(ids))
+    return ids, pesos
+
+
+def _compuestos_afectados(elementos):
+    """Subconsulta de compuestos que contienen alguno de los elementos (None = todos)."""
+    if elementos is None:
+        return None
+    return ElementoCompuesto.objects.filter(id_elemento__in=elementos).values('id_compuesto')
+
+
+def calcular_pesos_vectorizados(elementos=None, chunk_size=20_000):
+    """
+    Construye la matriz dispersa compuesto×elemento (formato CSR: filas ordenadas por
+    compuesto) desde ElementoCompuesto y calcula todos los PM con un único producto
+    matriz-vector contra el vector de pesos atómicos.
+    Devuelve (ids_compuestos, pesos_enteros) como arreglos de NumPy.
+    """
+    ids_elementos, pesos = _vector_pesos()
+
+    composicion = ElementoCompuesto.objects.order_by('id_compuesto', 'id_elemento')
+    subconsulta = _compuestos_afectados(elementos)
+    if subconsulta is not None:
+        composicion = composicion.filter(id_compuesto__in=subconsulta)
+    filas = composicion.values_list('id_compuesto', 'id_elemento', 'cantidad_elem_en_comp')
+
+    matriz = np.fromiter(filas.iterator(chunk_size=chunk_size), dtype=DTYPE_COMPOSICION)
+    if not len(matriz):
+        return np.empty(0, dtype='i8'), np.empty(0, dtype='i8')
+
+    # Índice de columna de cada entrada (los ids de elementos están ordenados)
+    columnas = np.searchsorted(ids_elementos, matriz['elemento'])
+    productos = matriz['cantidad'] * pesos[columnas]
+
+    # Producto matriz-vector: suma de cada fila (compuesto) sobre sus entradas no nulas
+    ids_compuestos, inicios_fila = np.unique(matriz['compuesto'], return_index=True)
+    return ids_compuestos, np.add.reduceat(productos, inicios_fila)
+
+
+def recalcular_pesos_moleculares(elementos=None, simular=False, tamano_lote=1000, chunk_size=20_000):
+    """
+    Recalcula peso_molecular_compuesto de los compuestos que contienen los elementos
+    indicados (o de todo el catálogo) y escribe SOLO las filas que cambiaron, con
+    bulk_update por lotes. Los compuestos cuyo PM nuevo no cabe en la columna conservan
+    el almacenado y se informan aparte.
+    Devuelve {'compuestos': analizados, 'actualizados': cambiados, 'omitidos': fuera de rango}.
+    """
+    ids_compuestos, pesos_nuevos = calcular_pesos_vectorizados(elementos, chunk_size=chunk_size)
+    if not len(ids_compuestos):
+        return {'compuestos': 0, 'actualizados': 0, 'omitidos': 0}
+
+    # Pesos almacenados, alineados por id (misma restricción que la matriz)
+    almacenados = CompuestoQuimico.objects.order_by('id')
+    subconsulta = _compuestos_afectados(elementos)
+    if subconsulta is not None:
+        almacenados = almacenados.filter(id__in=subconsulta)
+
+    filas = almacenados.values_list('id', 'peso_molecular_compuesto').iterator(chunk_size=chunk_size)
+    actuales = np.fromiter(
+        ((id_compuesto, -1 if peso is None else decimal_a_entero(peso)) for id_compuesto, peso in filas),
+        dtype=[('id', 'i8'), ('peso', 'i8')],
+    )
+
+    # Alineación vectorizada: se descartan compuestos sin composición registrada
+    posiciones = np.searchsorted(ids_compuestos, actuales['id']).clip(max=len(ids_compuestos) - 1)
+    con_composicion = ids_compuestos[posiciones] == actuales['id']
+    fuera_de_rango = con_composicion & (pesos_nuevos[posiciones] >= PESO_MAXIMO)
+    distintos = con_composicion & ~fuera_de_rango & (pesos_nuevos[posiciones] != actuales['peso'])
+
+    cambiados = [
+        CompuestoQuimico(id=int(id_compuesto), peso_molecular_compuesto=entero_a_decimal(int(peso)))
+        for id_compuesto, peso in zip(actuales['id'][distintos], pesos_nuevos[posiciones[distintos]])
+    ]
+
+    if cambiados and not simular:
+        with transaction.atomic():
+            CompuestoQuimico.objects.bulk_update(cambiados, ['peso_molecular_compuesto'], batch_size=tamano_lote)
+            # bulk_update no dispara señales: versión global y catálogos de los dueños afectados
+            versiones.invalidar(versiones.VERSION_COMPUESTOS)
+            versiones.invalidar_catalogos(duenos_compuestos([compuesto.id for compuesto in cambiados], tamano_lote))
+
+    return {
+        'compuestos': len(ids_compuestos), 'actualizados': len(cambiados), 'omitidos': int(fuera_de_rango.sum()),
+    }
+
+
+# ======================================================== #
+# RECOMPOSICIÓN DESDE LA FÓRMULA (Composición Incremental) #
+# ======================================================== #
+
+def recomponer_compuestos(simular=False, tamano_lote=1000):
+    """
+    Vuelve a derivar ElementoCompuesto y la máscara de cada compuesto desde su fórmula
+    (p. ej. tras cargar elementos que antes no existían) y escribe solo las diferencias,
+    con el mismo motor que la edición y la importación. Los compuestos modificados
+    recalculan después su PM. Recorre el catálogo por lotes de ids (keyset).
+    Devuelve {'compuestos', 'recompuestos', 'creadas', 'actualizadas', 'borradas', 'errores'}.
+    """
+    calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+    elementos = {
+        simbolo: (id_elemento, numero)
+        for simbolo, id_elemento, numero in ElementoQuimico.objects.values_list(
+            'simbolo_elemento', 'id', 'numero_atomico_elemento'
+        )
+    }
+    resumen = {'compuestos': 0, 'recompuestos': 0, 'creadas': 0, 'actualizadas': 0, 'borradas': 0, 'errores': 0}
+    modificados = []
+
+    ultimo = 0
+    while True:
+        lote = list(
+            CompuestoQuimico.objects.filter(id__gt=ultimo).order_by('id')
+            .values_list('id', 'formula_compuesto', 'mascara_elementos_bajos', 'mascara_elementos_altos')[:tamano_lote]
+        )
+        if not lote:
+            break
+        ultimo = lote[-1][0]
+        resumen['compuestos'] += len(lote)
+
+        # 1. Composición y máscara esperadas (fórmulas repetidas se analizan una vez)
+        analisis = calculadora.analizar_lote(formula for _, formula, _, _ in lote)
+        conteos, mascaras = {}, []
+        for id_compuesto, formula, bajos, altos in lote:
+            resultado = analisis[formula]
+            if not resultado.es_valido:
+                resumen['errores'] += 1
+                continue
+            conteos[id_compuesto] = {elementos[simbolo][0]: cantidad for simbolo, cantidad in resultado.conteo.items()}
+            nuevas = calcular_mascaras(elementos[simbolo][1] for simbolo in resultado.conteo)
+            if (bajos, altos) != (nuevas['mascara_elementos_bajos'], nuevas['mascara_elementos_altos']):
+                mascaras.append(CompuestoQuimico(id=id_compuesto, **nuevas))
+
+        # 2. Escritura mínima del lote en su propia transacción
+        with transaction.atomic():
+            cambios = sincronizar_composicion(conteos, simular=simular, tamano_lote=tamano_lote)
+            if mascaras and not simular:
+                CompuestoQuimico.objects.bulk_update(
+                    mascaras, ['mascara_elementos_bajos', 'mascara_elementos_altos'], batch_size=tamano_lote
+                )
+        for clave in ('creadas', 'actualizadas', 'borradas'):
+            resumen[clave] += cambios[clave]
+        lote_modificados = cambios['compuestos'] | {compuesto.id for compuesto in mascaras}
+        resumen['recompuestos'] += len(lote_modificados)
+        modificados.extend(lote_modificados)
+
+    if modificados and not simular:
+        # Escrituras masivas sin señales: API, catálogos de los dueños y PM de los modificados
+        with transaction.atomic():
+            versiones.invalidar(versiones.VERSION_COMPUESTOS)
+            versiones.invalidar_catalogos(duenos_compuestos(sorted(modificados), tamano_lote))
+        recalcular_pesos_moleculares(tamano_lote=tamano_lote)
+    return resumen
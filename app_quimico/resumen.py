@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from app_quimico.models import CompuestoQuimico, CompuestoAplicacion, ElementoCompuesto
+
+
+# =================================================================== #
+# RESUMEN DENORMALIZADO DEL COMPUESTO (Tarjeta del Catálogo sin JOIN) #
+# =================================================================== #
+
+def _contar(queryset):
+    """Subconsulta correlacionada COUNT(*) por compuesto (0 si no hay filas)."""
+    conteo = queryset.order_by().values('id_compuesto').annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(conteo, output_field=IntegerField()), Value(0))
+
+
+def expresiones_resumen():
+    """
+    Valor correcto de cada columna del resumen como subconsulta sobre el compuesto (OuterRef).
+    La aplicación principal es la relación más antigua (menor id), la que mostraba la tarjeta.
+    """
+    relaciones = CompuestoAplicacion.objects.filter(id_compuesto=OuterRef('pk'))
+    principal = relaciones.order_by('id')
+    return {
+        'total_aplicaciones': _contar(relaciones),
+        'aplicacion_principal': Coalesce(Subquery(principal.values('id_aplicacion__nombre_uso')[:1]), Value('')),
+        'industria_principal': Coalesce(
+            Subquery(principal.values('id_aplicacion__id_industria__nombre_industria')[:1]), Value('')
+        ),
+        'concentracion_principal': Subquery(principal.values('concentracion_minima')[:1]),
+        'tipo_concentracion_principal': Coalesce(Subquery(principal.values('tipo_concentracion')[:1]), Value('')),
+        'total_elementos': _contar(ElementoCompuesto.objects.filter(id_compuesto=OuterRef('pk'))),
+    }
+
+
+def refrescar_resumenes(ids, campos=CompuestoQuimico.CAMPOS_RESUMEN) -> int:
+    """
+    Recalcula en la BD las columnas indicadas de los compuestos 'ids' (lista o subconsulta)
+    con un único UPDATE ... SET columna = (subconsulta), dentro de la transacción del
+    llamador: el resumen nunca queda desfasado de la relación o la composición que lo cambió.
+    """
+    if isinstance(ids, (list, tuple, set, frozenset)) and not ids:
+        return 0
+    expresiones = expresiones_resumen()
+    return CompuestoQuimico.objects.filter(pk__in=ids).update(**{campo: expresiones[campo] for campo in campos})
+
+
+def reparar_resumenes(simular=False, tamano_lote=1000):
+    """
+    Compara el resumen guardado con el calculado, por lotes de ids (keyset, una consulta
+    por lote), y reescribe solo los compuestos que difieren. Para cargas que escriben sin
+    señales o datos anteriores a estas columnas.
+    Devuelve {'compuestos', 'reparados'}.
+    """
+    campos = CompuestoQuimico.CAMPOS_RESUMEN
+    calculados = {f'{campo}_calculado': expresion for campo, expresion in expresiones_resumen().items()}
+    resumen = {'compuestos': 0, 'reparados': 0}
+
+    ultimo = 0
+    while True:
+        lote = list(
+            CompuestoQuimico.objects.filter(id__gt=ultimo).order_by('id')
+            .annotate(**calculados).values('id', *campos, *calculados)[:tamano_lote]
+        )
+        if not lote:
+            break
+        ultimo = lote[-1]['id']
+        resumen['compuestos'] += len(lote)
+        desfasados = [
+            fila['id'] for fila in lote
+            if any(fila[campo] != fila[f'{campo}_calculado'] for campo in campos)
+        ]
+        resumen['reparados'] += len(desfasados)
+        if desfasados and not simular:
+            with transaction.atomic():
+                refrescar_resumenes(desfasados)
+    return resumen
@@ -0,0 +1,164 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import CharField, IntegerField, Value
+from django.utils.functional import SimpleLazyObject
+
+
+# ================================================== #
+# ROLES DEL USUARIO (Grupos y Permisos por Petición) #
+# ================================================== #
+
+# Grupos que ven y gestionan el catálogo completo; el resto (Químicos) solo el propio
+GRUPOS_GESTION_GLOBAL = ('Administradores', 'Colaboradores')
+GRUPO_ADMINISTRADORES = 'Administradores'
+
+
+def _ttl_roles():
+    """Segundos durante los que se reutilizan los roles entre peticiones (0 = solo por petición)."""
+    return getattr(settings, 'GESTOR_QUIMICO_ROLES_TTL', 0)
+
+
+def clave_roles(usuario_id) -> str:
+    return f'roles:{usuario_id}'
+
+
+def olvidar_roles(usuario_ids):
+    """Descarta los roles guardados entre peticiones (cambio de grupos o permisos)."""
+    if not _ttl_roles():
+        return
+    cache.delete_many([clave_roles(usuario_id) for usuario_id in usuario_ids if usuario_id is not None])
+
+
+def _cargar(usuario):
+    """
+    Grupos (en orden de id) y permisos 'app_label.codename' del usuario en UNA consulta:
+    grupos con sus permisos UNION ALL permisos directos del usuario.
+    """
+    por_grupo = (
+        Group.objects.filter(user=usuario)
+        .values_list('id', 'name', 'permissions__content_type__app_label', 'permissions__codename')
+        .order_by()
+    )
+    directos = (
+        Permission.objects.filter(user=usuario)
+        .annotate(grupo_id=Value(None, output_field=IntegerField()), grupo=Value(None, output_field=CharField()))
+        .values_list('grupo_id', 'grupo', 'content_type__app_label', 'codename')
+        .order_by()
+    )
+    grupos, permisos = {}, set()
+    for grupo_id, grupo, app_label, codename in por_grupo.union(directos, all=True):
+        if grupo_id is not None:
+            grupos[grupo_id] = grupo
+        if codename is not None:
+            permisos.add(f'{app_label}.{codename}')
+    return tuple(grupo for _, grupo in sorted(grupos.items())), frozenset(permisos)
+
+
+class RolesUsuario:
+    """
+    Grupos y permisos del usuario, resueltos una sola vez (y, con GESTOR_QUIMICO_ROLES_TTL,
+    reutilizados entre peticiones). Se usa desde las vistas (request.roles) y desde las
+    plantillas ({{ roles.grupo_principal }}, {% if roles.es_administrador %}).
+    """
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self.grupos, self.permisos = (), frozenset()
+        if not usuario.is_authenticated:
+            return
+
+        ttl = _ttl_roles()
+        datos = cache.get(clave_roles(usuario.pk)) if ttl else None
+        if datos is None:
+            datos = _cargar(usuario)
+            if ttl:
+                cache.set(clave_roles(usuario.pk), datos, ttl)
+        self.grupos, self.permisos = datos
+
+        # CRÍTICO: ModelBackend guarda los permisos en _perm_cache; al precargarlo,
+        # has_perm, PermissionRequiredMixin y {{ perms }} no vuelven a consultar la BD.
+        # (Los superusuarios no lo necesitan: User.has_perm responde sin el backend; los
+        # inactivos tampoco: ModelBackend les niega todo permiso sin consultar.)
+        if usuario.is_active and not usuario.is_superuser:
+            usuario._perm_cache = set(self.permisos)
+
+    @property
+    def grupo_principal(self) -> str:
+        """Primer grupo del usuario (el que muestra el navbar), o cadena vacía."""
+        return self.grupos[0] if self.grupos else ''
+
+    def tiene_grupo(self, *nombres) -> bool:
+        return any(grupo in nombres for grupo in self.grupos)
+
+    @property
+    def es_administrador(self) -> bool:
+        return self.tiene_grupo(GRUPO_ADMINISTRADORES)
+
+    @property
+    def es_gestor_global(self) -> bool:
+        return self.tiene_grupo(*GRUPOS_GESTION_GLOBAL)
+
+    def tiene_permiso(self, permiso: str) -> bool:
+        return self.usuario.is_active and (self.usuario.is_superuser or permiso in self.permisos)
+
+
+def roles_de(usuario) -> RolesUsuario:
+    """Roles del usuario, cargados una vez por instancia (request.user vive lo que la petición)."""
+    roles = getattr(usuario, '_roles_usuario', None)
+    if roles is None:
+        roles = RolesUsuario(usuario)
+        usuario._roles_usuario = roles
+    return roles
+
+
+class RolesBackend(ModelBackend):
+    """
+    ModelBackend que toma los permisos de los roles de la petición: el primer has_perm
+    (vista, PermissionRequiredMixin o {{ perms }}) carga grupos y permisos en una consulta,
+    en lugar de las dos consultas propias de ModelBackend más la de grupos.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if user_obj.is_active and not user_obj.is_anonymous and obj is None and not user_obj.is_superuser:
+            roles_de(user_obj)  # Precarga _perm_cache
+        return super().get_all_permissions(user_obj, obj)
+
+    async def aget_all_permissions(self, user_obj, obj=None):
+        # ahas_perm (vistas asíncronas) pasa por aquí: mismos roles, una sola consulta
+        return await sync_to_async(self.get_all_permissions)(user_obj, obj)
+
+
+class RolesMiddleware:
+    """
+    Expone request.roles de forma perezosa: las peticiones que no consultan roles
+    (API pública, /api/pm) no tocan la BD. Debe ir después de AuthenticationMiddleware.
+    Bajo ASGI se ejecuta como corrutina: las vistas asíncronas no cambian de hilo por él.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.roles = SimpleLazyObject(lambda: roles_de(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.roles = SimpleLazyObject(lambda: roles_de(request.user))
+        return await self.get_response(request)
+
+
+def roles(request):
+    """Procesador de contexto: {{ roles }} en todas las plantillas (perezoso, como request.roles)."""
+    if hasattr(request, 'roles'):
+        return {'roles': request.roles}
+    return {'roles': SimpleLazyObject(lambda: roles_de(request.user))}
@@ -0,0 +1,205 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    ElementoQuimico, DetalleElemento, CompuestoQuimico, CompuestoAplicacion, ElementoCompuesto, Aplicacion, Industria,
+    TerminoBusqueda,
+)
+from .utils import invalidar_pesos_atomicos
+from . import busqueda, versiones
+from .resumen import refrescar_resumenes
+from .composicion import recalcular_mascaras
+from .roles import olvidar_roles
+
+
+# ========================================== #
+# INVALIDACIÓN DE LA TABLA DE PESOS ATÓMICOS #
+# ========================================== #
+
+@receiver(post_save, sender=ElementoQuimico)
+@receiver(post_delete, sender=ElementoQuimico)
+def invalidar_tabla_pesos(sender, **kwargs):
+    """Cualquier alta, cambio o baja de un elemento obliga a recargar los pesos."""
+    invalidar_pesos_atomicos()
+
+
+# ============================================= #
+# MÁSCARAS DE COMPOSICIÓN AL BORRAR UN ELEMENTO #
+# ============================================= #
+
+@receiver(pre_delete, sender=ElementoQuimico)
+def recordar_compuestos_del_elemento(sender, instance, **kwargs):
+    # El borrado en cascada elimina sus filas de ElementoCompuesto: se anotan antes los compuestos
+    instance._compuestos_afectados = list(
+        ElementoCompuesto.objects.filter(id_elemento=instance).values_list('id_compuesto', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=ElementoQuimico)
+def limpiar_mascaras_del_elemento(sender, instance, **kwargs):
+    # Sin esto, el bit del elemento borrado seguiría encendido y el prefiltro por máscara lo encontraría
+    if getattr(instance, '_compuestos_afectados', None):
+        recalcular_mascaras(ids_compuestos=instance._compuestos_afectados)
+
+
+# ================================================ #
+# SINCRONIZACIÓN DEL ÍNDICE DE BÚSQUEDA (Términos) #
+# ================================================ #
+
+@receiver(post_save, sender=CompuestoQuimico)
+def indexar_compuesto(sender, instance, created, **kwargs):
+    # Solo el nombre y la fórmula generan términos: editar concentraciones o
+    # aplicaciones no reescribe el índice
+    texto = (instance.nombre_compuesto, instance.formula_compuesto)
+    if not created and getattr(instance, '_texto_indexado', None) == texto:
+        return
+    busqueda.indexar_compuestos([instance])
+    instance._texto_indexado = texto
+
+
+@receiver(post_delete, sender=CompuestoQuimico)
+def desindexar_compuesto(sender, instance, **kwargs):
+    busqueda.desindexar(TerminoBusqueda.TIPO_COMPUESTO, [instance.pk])
+
+
+@receiver(post_save, sender=ElementoQuimico)
+def indexar_elemento(sender, instance, **kwargs):
+    busqueda.indexar_elementos([instance])
+
+
+@receiver(post_delete, sender=ElementoQuimico)
+def desindexar_elemento(sender, instance, **kwargs):
+    busqueda.desindexar(TerminoBusqueda.TIPO_ELEMENTO, [instance.pk])
+
+
+# ========================================================== #
+# VERSIONES DE DATOS (ETags de la API y Fragmentos en Caché) #
+# ========================================================== #
+
+@receiver(post_save, sender=DetalleElemento)
+@receiver(post_delete, sender=DetalleElemento)
+def versionar_detalle(sender, **kwargs):
+    # Los detalles se publican junto al elemento (API y tabla periódica cacheada):
+    # comparten la versión 'elementos'
+    versiones.invalidar(versiones.VERSION_ELEMENTOS)
+
+
+@receiver(post_save, sender=CompuestoQuimico)
+@receiver(post_delete, sender=CompuestoQuimico)
+def versionar_compuesto(sender, instance, **kwargs):
+    # Composición y aplicaciones se guardan siempre junto al compuesto (mismas vistas y transacción)
+    versiones.invalidar(versiones.VERSION_COMPUESTOS)
+    versiones.invalidar_catalogos([instance.usuario_id])
+
+
+@receiver(post_save, sender=CompuestoAplicacion)
+@receiver(post_delete, sender=CompuestoAplicacion)
+def versionar_compuesto_aplicacion(sender, instance, **kwargs):
+    # La tarjeta del catálogo muestra la aplicación: catálogo del dueño y vista global
+    # (el compuesto suele estar ya en memoria; si no, se lee únicamente su usuario)
+    if CompuestoAplicacion.id_compuesto.is_cached(instance):
+        usuario_id = instance.id_compuesto.usuario_id
+    else:
+        usuario_id = (
+            CompuestoQuimico.objects.filter(pk=instance.id_compuesto_id).values_list('usuario_id', flat=True).first()
+        )
+    versiones.invalidar(versiones.VERSION_COMPUESTOS)
+    versiones.invalidar_catalogos([usuario_id])
+
+
+@receiver(post_save, sender=Aplicacion)
+@receiver(post_delete, sender=Aplicacion)
+def versionar_aplicacion(sender, **kwargs):
+    versiones.invalidar(versiones.VERSION_APLICACIONES)
+
+
+@receiver(post_save, sender=Industria)
+@receiver(post_delete, sender=Industria)
+def versionar_industria(sender, **kwargs):
+    versiones.invalidar(versiones.VERSION_INDUSTRIAS)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def versionar_grupos_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    # Altas y bajas de grupos cambian el rol global (en caché) y el alcance del catálogo
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    olvidar_roles([instance.pk] if not reverse else (pk_set or ()))
+    if not reverse:
+        versiones.invalidar_catalogos([instance.pk])
+    elif action == 'post_clear':
+        # group.user_set.clear(): pk_set llega vacío, se invalida la versión de todos los grupos
+        versiones.invalidar(versiones.VERSION_GRUPOS)
+    else:
+        versiones.invalidar_catalogos(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def versionar_grupo(sender, **kwargs):
+    # Renombrar o borrar un grupo puede cambiar el rol global de todos sus miembros
+    versiones.invalidar(versiones.VERSION_GRUPOS)
+
+
+def _usuarios_por_permisos(sender, instance, reverse, pk_set):
+    """Usuarios cuyos permisos cambian con una alta o baja en User.user_permissions o Group.permissions."""
+    directos = sender is User.user_permissions.through
+    if not reverse:
+        if directos:
+            return [instance.pk]
+        return list(instance.user_set.values_list('pk', flat=True))
+    # Desde Permission (permiso.user_set / permiso.group_set): pk_set son usuarios o grupos;
+    # en clear() llega vacío y se toman todos los que tenían el permiso
+    if directos:
+        return list(pk_set) if pk_set is not None else list(instance.user_set.values_list('pk', flat=True))
+    grupos = pk_set if pk_set is not None else instance.group_set.values_list('pk', flat=True)
+    return list(User.objects.filter(groups__in=grupos).values_list('pk', flat=True).distinct())
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def versionar_permisos(sender, instance, action, reverse, pk_set, **kwargs):
+    # Los permisos deciden los botones de la tarjeta y el acceso a las vistas: se descartan los
+    # roles guardados (GESTOR_QUIMICO_ROLES_TTL > 0) y la versión del catálogo de cada afectado.
+    # En clear() los afectados se leen antes de borrar las filas.
+    if action == 'pre_clear':
+        instance._usuarios_por_permisos = _usuarios_por_permisos(sender, instance, reverse, None)
+        return
+    if action == 'post_clear':
+        usuarios = getattr(instance, '_usuarios_por_permisos', ())
+    elif action in ('post_add', 'post_remove'):
+        usuarios = _usuarios_por_permisos(sender, instance, reverse, pk_set)
+    else:
+        return
+    olvidar_roles(usuarios)
+    versiones.invalidar_catalogos(usuarios)
+
+
+# ======================================================= #
+# RESUMEN DENORMALIZADO DEL COMPUESTO (Misma Transacción) #
+# ======================================================= #
+
+@receiver(post_save, sender=CompuestoAplicacion)
+@receiver(post_delete, sender=CompuestoAplicacion)
+def resumir_compuesto_aplicacion(sender, instance, **kwargs):
+    # Total y aplicación principal del compuesto: un UPDATE con subconsultas
+    refrescar_resumenes([instance.id_compuesto_id], campos=CompuestoQuimico.CAMPOS_RESUMEN_APLICACION)
+
+
+@receiver(post_save, sender=Aplicacion)
+def resumir_aplicacion(sender, instance, created, **kwargs):
+    # Renombrar la aplicación o cambiar su industria cambia el resumen de sus compuestos
+    if not created:
+        refrescar_resumenes(
+            CompuestoAplicacion.objects.filter(id_aplicacion=instance).values('id_compuesto'),
+            campos=CompuestoQuimico.CAMPOS_RESUMEN_APLICACION,
+        )
+
+
+@receiver(post_save, sender=Industria)
+def resumir_industria(sender, instance, created, **kwargs):
+    if not created:
+        refrescar_resumenes(
+            CompuestoAplicacion.objects.filter(id_aplicacion__id_industria=instance).values('id_compuesto'),
+            campos=('industria_principal',),
+        )
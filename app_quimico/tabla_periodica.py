@@ -0,0 +1,182 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from app_quimico.models import ElementoQuimico, DetalleElemento
+from app_quimico.utils import invalidar_pesos_atomicos
+from app_quimico.recalculo import recalcular_pesos_moleculares
+from app_quimico import busqueda
+
+
+# ===================================================== #
+# CARGA DE LA TABLA PERIÓDICA (Upsert Masivo en Bloque) #
+# ===================================================== #
+
+ARCHIVO_TABLA_PERIODICA = Path(__file__).resolve().parent / 'data' / 'tabla_periodica.json'
+
+# Clave del archivo -> campo del modelo (el número atómico es la clave natural)
+CAMPOS_ELEMENTO = {
+    'nombre': 'nombre_elemento',
+    'simbolo': 'simbolo_elemento',
+    'peso_atomico': 'peso_atomico_elemento',
+}
+CAMPOS_DETALLE = {
+    'grupo': 'grupo_elemento',
+    'periodo': 'periodo_elemento',
+    'categoria': 'categoria_elemento',
+    'electronegatividad': 'electronegatividad',
+    'afinidad_electronica': 'afinidad_electronica',
+    'energia_de_ionizacion': 'energia_de_ionizacion',
+    'radio_covalente': 'radio_covalente',
+}
+CAMPOS_DECIMALES = frozenset({
+    'peso_atomico', 'electronegatividad', 'afinidad_electronica', 'energia_de_ionizacion', 'radio_covalente',
+})
+
+
+def _valor(clave, valor):
+    if valor is None or clave not in CAMPOS_DECIMALES:
+        return valor
+    return Decimal(str(valor))
+
+
+def leer_tabla(ruta=None):
+    """
+    Lee y valida el archivo JSON (lista de objetos, uno por elemento).
+    Devuelve {numero_atomico: (campos_elemento, campos_detalle)}; ValueError si hay errores.
+    """
+    ruta = ARCHIVO_TABLA_PERIODICA if ruta is None else Path(ruta)
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"No se pudo leer la tabla periódica '{ruta}': {e}")
+    if not isinstance(datos, list):
+        raise ValueError("La tabla periódica debe ser una lista de objetos JSON.")
+
+    tabla, errores = {}, []
+    for posicion, fila in enumerate(datos, start=1):
+        try:
+            numero = int(fila['numero_atomico'])
+            elemento = {campo: _valor(clave, fila[clave]) for clave, campo in CAMPOS_ELEMENTO.items()}
+            detalle = {campo: _valor(clave, fila.get(clave)) for clave, campo in CAMPOS_DETALLE.items()}
+        except (TypeError, KeyError, ValueError, ArithmeticError) as e:
+            errores.append(f"Entrada {posicion}: campo ausente o no válido ({e}).")
+            continue
+        if numero in tabla:
+            errores.append(f"Entrada {posicion}: número atómico {numero} repetido.")
+            continue
+
+        # Mismos validadores que los formularios (sin consultas: unicidad y FK se resuelven en el upsert)
+        try:
+            ElementoQuimico(numero_atomico_elemento=numero, **elemento).full_clean(validate_unique=False)
+            DetalleElemento(**detalle).full_clean(exclude=['id_elemento'], validate_unique=False)
+        except ValidationError as e:
+            errores.append(f"Elemento Z={numero}: {'; '.join(e.messages)}")
+            continue
+        tabla[numero] = (elemento, detalle)
+
+    if errores:
+        raise ValueError("\n".join(errores))
+    return tabla
+
+
+def _opciones_upsert(campos_actualizar, campos_unicos):
+    """
+    Argumentos de bulk_create(update_conflicts=True). MySQL (ON DUPLICATE KEY UPDATE)
+    no admite indicar la restricción en conflicto: unique_fields solo se pasa si el motor lo soporta.
+    """
+    opciones = {'update_conflicts': True, 'update_fields': campos_actualizar}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = campos_unicos
+    return opciones
+
+
+def _conflictos(tabla, existentes):
+    """Nombres o símbolos del archivo ya usados por OTRO número atómico en la BD."""
+    duenos = {}
+    for numero, fila in existentes.items():
+        duenos[('nombre_elemento', fila['nombre_elemento'])] = numero
+        duenos[('simbolo_elemento', fila['simbolo_elemento'])] = numero
+    conflictos = []
+    for numero, (elemento, _) in tabla.items():
+        for campo in ('nombre_elemento', 'simbolo_elemento'):
+            dueno = duenos.get((campo, elemento[campo]))
+            if dueno is not None and dueno != numero:
+                conflictos.append(f"'{elemento[campo]}' (Z={numero}) ya está registrado con Z={dueno}.")
+    return conflictos
+
+
+def cargar_tabla_periodica(ruta=None, simular=False):
+    """
+    Inserta o actualiza ElementoQuimico y DetalleElemento desde el archivo de datos.
+    Se compara primero contra la BD (dos consultas) y solo se escriben las filas que
+    cambian, en una única transacción: una segunda ejecución no escribe nada.
+    Devuelve {'elementos_nuevos', 'elementos_actualizados', 'detalles_escritos', 'compuestos_recalculados'}.
+    """
+    tabla = leer_tabla(ruta)
+
+    # 1. Estado actual (una consulta por tabla)
+    existentes = {
+        fila['numero_atomico_elemento']: fila
+        for fila in ElementoQuimico.objects.values('id', 'numero_atomico_elemento', *CAMPOS_ELEMENTO.values())
+    }
+    detalles = {
+        fila['id_elemento']: fila
+        for fila in DetalleElemento.objects.values('id_elemento', *CAMPOS_DETALLE.values())
+    }
+    conflictos = _conflictos(tabla, existentes)
+    if conflictos:
+        raise ValueError("Conflicto con elementos registrados:\n" + "\n".join(conflictos))
+
+    # 2. Diferencias (Decimal compara por valor: 1.008 == 1.0080)
+    elementos_cambiados, detalles_cambiados, pesos_cambiados = [], [], []
+    for numero, (elemento, detalle) in sorted(tabla.items()):
+        actual = existentes.get(numero)
+        if actual is None or any(actual[campo] != valor for campo, valor in elemento.items()):
+            elementos_cambiados.append(numero)
+            if actual is not None and actual['peso_atomico_elemento'] != elemento['peso_atomico_elemento']:
+                pesos_cambiados.append(actual['id'])
+        detalle_actual = detalles.get(actual['id']) if actual is not None else None
+        if detalle_actual is None or any(detalle_actual[campo] != valor for campo, valor in detalle.items()):
+            detalles_cambiados.append(numero)
+
+    resumen = {
+        'elementos_nuevos': sum(1 for numero in elementos_cambiados if numero not in existentes),
+        'elementos_actualizados': sum(1 for numero in elementos_cambiados if numero in existentes),
+        'detalles_escritos': len(detalles_cambiados),
+        'compuestos_recalculados': 0,
+    }
+    if simular or not (elementos_cambiados or detalles_cambiados):
+        return resumen
+
+    with transaction.atomic():
+        # 3. Upsert de elementos por número atómico
+        if elementos_cambiados:
+            ElementoQuimico.objects.bulk_create(
+                [ElementoQuimico(numero_atomico_elemento=numero, **tabla[numero][0]) for numero in elementos_cambiados],
+                **_opciones_upsert(list(CAMPOS_ELEMENTO.values()), ['numero_atomico_elemento']),
+            )
+
+        # 4. PKs de los elementos afectados (algunos motores no las devuelven tras el upsert)
+        ids = dict(
+            ElementoQuimico.objects.filter(numero_atomico_elemento__in=set(elementos_cambiados) | set(detalles_cambiados))
+            .values_list('numero_atomico_elemento', 'id')
+        )
+        if detalles_cambiados:
+            DetalleElemento.objects.bulk_create(
+                [DetalleElemento(id_elemento_id=ids[numero], **tabla[numero][1]) for numero in detalles_cambiados],
+                **_opciones_upsert(list(CAMPOS_DETALLE.values()), ['id_elemento']),
+            )
+
+        # 5. bulk_create no dispara señales: versión 'elementos' (pesos y API), índice de búsqueda y PM
+        invalidar_pesos_atomicos()
+        if elementos_cambiados:
+            busqueda.indexar_elementos(
+                ElementoQuimico(id=ids[numero], numero_atomico_elemento=numero, **tabla[numero][0])
+                for numero in elementos_cambiados
+            )
+        if pesos_cambiados:
+            resumen['compuestos_recalculados'] = recalcular_pesos_moleculares(elementos=pesos_cambiados)['actualizados']
+    return resumen
@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.contrib import messages
+from django.contrib.auth.models import User, Group, Permission
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import (
+    ElementoQuimico, DetalleElemento, Industria, Aplicacion, CompuestoQuimico, CompuestoAplicacion, ElementoCompuesto,
+    TerminoBusqueda,
+)
+from .utils import (
+    TablaPesosAtomicos, tabla_pesos, CalculadoraPM, descomponer_formula, estadisticas_cache_analisis,
+    limpiar_cache_analisis,
+)
+from .recalculo import calcular_pesos_vectorizados, recalcular_pesos_moleculares
+from .paginacion import codificar_cursor, decodificar_cursor
+from .busqueda import buscar_compuestos
+from .composicion import (
+    buscar_por_composicion, calcular_mascaras, parsear_restricciones, recalcular_mascaras, sincronizar_composicion,
+)
+from .importacion import ImportadorCompuestos
+from .exportacion import COLUMNAS_EXPORTACION
+from .tabla_periodica import cargar_tabla_periodica
+from .fragmentos import fragmento_tabla_periodica
+from .metricas import instrumentar_conexion, registro
+from .benchmarks import comparar_resultados
+from .consultas import compuestos_visibles, filtrar_compuestos, filtrar_elementos
+from .roles import RolesUsuario
+from . import busqueda, versiones
+from .resumen import refrescar_resumenes
 
-# Create your tests here.
+
+# ================================= #
+# DATOS BASE COMPARTIDOS (Fixtures) #
+# ================================= #
+
+# Subconjunto de la tabla periódica con los elementos que usan las fórmulas de las pruebas:
+# (Z, símbolo, nombre, peso atómico, grupo, periodo, categoría)
+ELEMENTOS_DE_PRUEBA = (
+    (1, 'H', 'Hidrógeno', '1.0080', 1, 1, 'Otros No Metales'),
+    (6, 'C', 'Carbono', '12.0110', 14, 2, 'Otros No Metales'),
+    (7, 'N', 'Nitrógeno', '14.0070', 15, 2, 'Otros No Metales'),
+    (8, 'O', 'Oxígeno', '15.9990', 16, 2, 'Otros No Metales'),
+    (11, 'Na', 'Sodio', '22.9900', 1, 3, 'Alcalinos'),
+    (16, 'S', 'Azufre', '32.0600', 16, 3, 'Otros No Metales'),
+    (17, 'Cl', 'Cloro', '35.4500', 17, 3, 'Halógenos'),
+    (19, 'K', 'Potasio', '39.0980', 1, 4, 'Alcalinos'),
+    (26, 'Fe', 'Hierro', '55.8450', 8, 4, 'Metales de Transición'),
+    (27, 'Co', 'Cobalto', '58.9330', 9, 4, 'Metales de Transición'),
+    (29, 'Cu', 'Cobre', '63.5460', 11, 4, 'Metales de Transición'),
+    (79, 'Au', 'Oro', '196.9700', 11, 6, 'Metales de Transición'),
+    (80, 'Hg', 'Mercurio', '200.5900', 12, 6, 'Metales de Transición'),
+    (82, 'Pb', 'Plomo', '207.2000', 14, 6, 'Otros Metales'),
+    (92, 'U', 'Uranio', '238.0300', 3, 7, 'Actínidos'),
+)
+
+
+def crear_elementos():
+    """Registra ELEMENTOS_DE_PRUEBA con su detalle. Devuelve {símbolo: ElementoQuimico}."""
+    ElementoQuimico.objects.bulk_create([
+        ElementoQuimico(
+            numero_atomico_elemento=numero, simbolo_elemento=simbolo,
+            nombre_elemento=nombre, peso_atomico_elemento=Decimal(peso),
+        )
+        for numero, simbolo, nombre, peso, *_ in ELEMENTOS_DE_PRUEBA
+    ])
+    elementos = ElementoQuimico.objects.in_bulk(field_name='simbolo_elemento')
+    DetalleElemento.objects.bulk_create([
+        DetalleElemento(
+            id_elemento=elementos[simbolo], grupo_elemento=grupo, periodo_elemento=periodo, categoria_elemento=categoria,
+        )
+        for _, simbolo, _, _, grupo, periodo, categoria in ELEMENTOS_DE_PRUEBA
+    ])
+    # bulk_create no dispara señales: se descarta la tabla de pesos que el proceso tenga cargada
+    tabla_pesos.invalidar()
+    return elementos
+
+
+class ElementosMixin:
+    """Registra los elementos de prueba una vez por clase (cls.elementos: símbolo -> ElementoQuimico)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.elementos = crear_elementos()
+
+
+class DatosQuimicosMixin(ElementosMixin):
+    """Además de los elementos, crea grupos, un usuario Químico, una industria y una aplicación de prueba."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for nombre in ('Administradores', 'Colaboradores', 'Quimicos'):
+            Group.objects.create(name=nombre)
+        cls.quimico = User.objects.create_user('quimico', password='clave-segura-123')
+        cls.quimico.groups.add(Group.objects.get(name='Quimicos'))
+        cls.industria = Industria.objects.create(nombre_industria='Farmacéutica')
+        cls.aplicacion = Aplicacion.objects.create(id_industria=cls.industria, nombre_uso='Excipiente')
+
+    @classmethod
+    def crear_compuestos(cls, cantidad, usuario):
+        """Crea 'cantidad' compuestos del usuario, cada uno con su CompuestoAplicacion."""
+        compuestos = CompuestoQuimico.objects.bulk_create([
+            CompuestoQuimico(
+                nombre_compuesto=f'Compuesto {i:04d}',
+                formula_compuesto=f'H{i + 1}O',
+                id_industria=cls.industria,
+                usuario=usuario,
+                peso_molecular_compuesto=Decimal('18.0150'),
+            )
+            for i in range(cantidad)
+        ])
+        CompuestoAplicacion.objects.bulk_create([
+            CompuestoAplicacion(
+                id_compuesto=compuesto,
+                id_aplicacion=cls.aplicacion,
+                concentracion_minima=Decimal('1.00'),
+            )
+            for compuesto in compuestos
+        ])
+        # bulk_create no dispara señales: el resumen de la tarjeta se calcula como en la importación
+        refrescar_resumenes([compuesto.pk for compuesto in compuestos])
+        return compuestos
+
+    @classmethod
+    def datos_compuesto(cls, formula, nombre=None):
+        """Datos POST del formulario de alta y edición de compuestos."""
+        return {
+            'nombre_compuesto': nombre or formula,
+            'formula_compuesto': formula,
+            'tipo_industria': cls.industria.pk,
+            'id_aplicacion': cls.aplicacion.pk,
+            'concentracion_minima': '1.00',
+            'tipo_concentracion': '%p/p',
+        }
+
+    @classmethod
+    def registrar_compuesto(cls, usuario, formula, nombre=None):
+        """Da de alta un compuesto con la vista (composición incluida) y devuelve la respuesta."""
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente.post(reverse('compuesto_crear'), cls.datos_compuesto(formula, nombre))
+
+
+# ================================================ #
+# TABLA DE PESOS ATÓMICOS: UNA LECTURA POR VERSIÓN #
+# ================================================ #
+
+@override_settings(GESTOR_QUIMICO_VERSION_TTL=0)
+class TablaPesosAtomicosTests(ElementosMixin, TestCase):
+    """La tabla se lee una vez por versión de 'elementos' y se recarga cuando un peso cambia."""
+
+    def contadores(self, tabla):
+        estadisticas = tabla.estadisticas()
+        return estadisticas['aciertos'], estadisticas['fallos'], estadisticas['recargas']
+
+    def test_aciertos_fallos_y_recarga(self):
+        # Instancia propia: los contadores de la tabla del proceso dependen de las pruebas anteriores
+        tabla = TablaPesosAtomicos()
+        pesos = tabla.obtener()
+        self.assertEqual(pesos['O'], 15.999)
+        self.assertIs(tabla.obtener(), pesos)  # Mismo diccionario compartido, sin releer la BD
+        self.assertEqual(self.contadores(tabla), (1, 1, 0))
+
+        oxigeno = self.elementos['O']
+        oxigeno.peso_atomico_elemento = Decimal('16.0000')
+        with self.captureOnCommitCallbacks(execute=True):
+            oxigeno.save()  # La señal incrementa la versión 'elementos' tras el commit
+        self.assertEqual(tabla.obtener()['O'], 16.0)
+        self.assertEqual(self.contadores(tabla), (1, 2, 1))
+        self.assertEqual(tabla.obtener()['O'], 16.0)
+        self.assertEqual(self.contadores(tabla), (2, 2, 1))
+
+
+# ======================================================== #
+# INVALIDACIÓN DE VERSIONES: UN INCREMENTO POR TRANSACCIÓN #
+# ======================================================== #
+
+class InvalidacionVersionesTests(TestCase):
+    """invalidar() incrementa cada clave una sola vez tras el commit y no pierde claves tras un rollback."""
+
+    CLAVE = 'pruebas'
+
+    @classmethod
+    def setUpTestData(cls):
+        # Callback que nunca se ejecuta (la transacción de la clase se revierte): no debe
+        # impedir que las pruebas vuelvan a programar la misma clave
+        versiones.invalidar(cls.CLAVE)
+
+    def version(self, clave=CLAVE):
+        return versiones.versiones_vigentes([clave])[clave]
+
+    def test_una_vez_por_transaccion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                versiones.invalidar(self.CLAVE)
+            versiones.invalidar_catalogos([7, 7, None])
+        self.assertEqual(self.version(), 1)
+        self.assertEqual(self.version(versiones.version_catalogo(7)), 1)
+
+        # Una transacción posterior vuelve a incrementar
+        with self.captureOnCommitCallbacks(execute=True):
+            versiones.invalidar(self.CLAVE)
+        self.assertEqual(self.version(), 2)
+
+    def test_savepoint_revertido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    versiones.invalidar(self.CLAVE)
+                    raise IntegrityError('revertir')
+            except IntegrityError:
+                pass
+            versiones.invalidar(self.CLAVE)
+        self.assertEqual(self.version(), 1)
+
+
+# ============================================= #
+# CACHÉ DE FÓRMULAS: LRU ACOTADO Y ESTADÍSTICAS #
+# ============================================= #
+
+class CacheAnalisisTests(SimpleTestCase):
+    """La descomposición memoizada respeta su tamaño máximo y se vacía con limpiar_cache_analisis()."""
+
+    def setUp(self):
+        limpiar_cache_analisis()
+        self.addCleanup(limpiar_cache_analisis)
+
+    def estadisticas(self):
+        estadisticas = estadisticas_cache_analisis()
+        return {clave: estadisticas[clave] for clave in ('aciertos', 'fallos', 'tamano_maximo', 'tamano_actual')}
+
+    @override_settings(GESTOR_QUIMICO_CACHE_FORMULAS=2)
+    def test_lru_acotado(self):
+        self.assertEqual(dict(descomponer_formula('Fe2(SO4)3')[1]), {'Fe': 2, 'S': 3, 'O': 12})
+        descomponer_formula('Fe2(SO4)3')
+        descomponer_formula('NaCl')
+        descomponer_formula('H2O')  # Desplaza a la usada hace más tiempo: Fe2(SO4)3
+        descomponer_formula('NaCl')
+        self.assertEqual(self.estadisticas(), {'aciertos': 2, 'fallos': 3, 'tamano_maximo': 2, 'tamano_actual': 2})
+        self.assertEqual(estadisticas_cache_analisis()['tasa_aciertos'], 0.4)
+
+        descomponer_formula('Fe2(SO4)3')
+        self.assertEqual(self.estadisticas()['fallos'], 4)
+
+    def test_errores_no_se_guardan(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                descomponer_formula('Fe2(SO4')
+        self.assertEqual(self.estadisticas()['tamano_actual'], 0)
+
+    def test_limpiar(self):
+        descomponer_formula('H2O')
+        descomponer_formula('H2O')
+        limpiar_cache_analisis()
+        self.assertEqual(self.estadisticas(), {'aciertos': 0, 'fallos': 0, 'tamano_maximo': None, 'tamano_actual': 0})
+
+        # Se vuelve a dimensionar según settings en el siguiente uso
+        with self.settings(GESTOR_QUIMICO_CACHE_FORMULAS=8):
+            descomponer_formula('H2O')
+        self.assertEqual(self.estadisticas(), {'aciertos': 0, 'fallos': 1, 'tamano_maximo': 8, 'tamano_actual': 1})
+
+
+# ======================================= #
+# ANÁLISIS POR LOTES: ERRORES POR FÓRMULA #
+# ======================================= #
+
+class AnalisisLoteTests(ElementosMixin, TestCase):
+    """Una fórmula inválida se informa con su error y el resto del lote se sigue calculando."""
+
+    def test_lote_con_formulas_invalidas(self):
+        resultados = CalculadoraPM().analizar_lote(['H2O', 'H2Xx', 'NaCl', 'Fe2(SO4', 'H2O', '', 'CO2'])
+
+        # Una entrada por fórmula distinta, en el orden de primera aparición
+        self.assertEqual(list(resultados), ['H2O', 'H2Xx', 'NaCl', 'Fe2(SO4', '', 'CO2'])
+        self.assertEqual([r.formula for r in resultados.values() if r.es_valido], ['H2O', 'NaCl', 'CO2'])
+        self.assertEqual(resultados['NaCl'].conteo, {'Na': 1, 'Cl': 1})
+        self.assertAlmostEqual(resultados['CO2'].peso, 44.009)
+        for formula in ('H2Xx', 'Fe2(SO4', ''):
+            with self.subTest(formula=formula):
+                self.assertFalse(resultados[formula].es_valido)
+                self.assertIsNone(resultados[formula].peso)
+                self.assertIsNone(resultados[formula].conteo)
+        self.assertEqual(resultados['H2Xx'].error, "Símbolo no reconocido: 'Xx'.")
+
+
+# ======================================================= #
+# RECÁLCULO VECTORIZADO: MISMO PM QUE EL CÁLCULO POR FILA #
+# ======================================================= #
+
+class RecalculoVectorizadoTests(ElementosMixin, TestCase):
+    """El producto matriz dispersa × pesos coincide con CalculadoraPM compuesto por compuesto."""
+
+    FORMULAS = ('H2O', 'C6H12O6', 'Fe2(SO4)3', 'K4[Fe(CN)6]', 'UO2(NO3)2', 'NaCl', 'CuSO4')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.usuario = usuario = User.objects.create_user('quimico', password='clave-segura-123')
+        industria = Industria.objects.create(nombre_industria='Farmacéutica')
+        calculadora = CalculadoraPM()
+        cls.esperados = {}
+        for formula in cls.FORMULAS:
+            pm, conteo = calculadora.analizar_formula(formula)
+            compuesto = CompuestoQuimico.objects.create(
+                nombre_compuesto=formula, formula_compuesto=formula, id_industria=industria, usuario=usuario,
+            )
+            ElementoCompuesto.objects.bulk_create([
+                ElementoCompuesto(id_compuesto=compuesto, id_elemento=cls.elementos[simbolo], cantidad_elem_en_comp=cantidad)
+                for simbolo, cantidad in conteo.items()
+            ])
+            cls.esperados[compuesto.pk] = Decimal(str(round(pm, 4)))
+
+    def test_igual_al_calculo_por_fila(self):
+        ids, pesos = calcular_pesos_vectorizados()
+        obtenidos = {id_compuesto: Decimal(peso).scaleb(-4) for id_compuesto, peso in zip(ids.tolist(), pesos.tolist())}
+        self.assertEqual(obtenidos, self.esperados)
+
+    def test_solo_escribe_lo_que_cambia(self):
+        self.assertEqual(recalcular_pesos_moleculares(), {'compuestos': 7, 'actualizados': 7, 'omitidos': 0})
+        self.assertEqual(dict(CompuestoQuimico.objects.values_list('pk', 'peso_molecular_compuesto')), self.esperados)
+        self.assertEqual(recalcular_pesos_moleculares(), {'compuestos': 7, 'actualizados': 0, 'omitidos': 0})
+
+        # Un peso corregido: solo se analizan los compuestos que contienen el elemento
+        hierro = self.elementos['Fe']
+        ElementoQuimico.objects.filter(pk=hierro.pk).update(peso_atomico_elemento=Decimal('56.0000'))
+        self.assertEqual(
+            recalcular_pesos_moleculares(elementos=[hierro.pk]), {'compuestos': 2, 'actualizados': 2, 'omitidos': 0}
+        )
+
+    def test_pm_fuera_de_rango_se_omite(self):
+        recalcular_pesos_moleculares()
+        uranio = self.elementos['U']
+        enorme = CompuestoQuimico.objects.create(
+            nombre_compuesto='U4000', formula_compuesto='U4000', peso_molecular_compuesto=Decimal('952115.2000'),
+            id_industria=Industria.objects.get(), usuario=self.usuario,
+        )
+        ElementoCompuesto.objects.create(id_compuesto=enorme, id_elemento=uranio, cantidad_elem_en_comp=4000)
+
+        # 4000 × 260 g/mol no cabe en DecimalField(max_digits=10, decimal_places=4): se conserva el PM anterior
+        ElementoQuimico.objects.filter(pk=uranio.pk).update(peso_atomico_elemento=Decimal('260.0000'))
+        self.assertEqual(
+            recalcular_pesos_moleculares(elementos=[uranio.pk]), {'compuestos': 2, 'actualizados': 1, 'omitidos': 1}
+        )
+        enorme.refresh_from_db()
+        self.assertEqual(enorme.peso_molecular_compuesto, Decimal('952115.2000'))
+
+    def test_mascaras_invalidan_las_mismas_versiones(self):
+        with mock.patch.object(versiones, 'invalidar') as invalidar, \
+                mock.patch.object(versiones, 'invalidar_catalogos') as invalidar_catalogos:
+            self.assertEqual(recalcular_mascaras(), {'compuestos': 7, 'actualizados': 7})
+        invalidar.assert_called_once_with(versiones.VERSION_COMPUESTOS)
+        invalidar_catalogos.assert_called_once_with({self.usuario.pk})
+
+
+# ============================================== #
+# MODOS DE CÁLCULO: PUNTO FIJO EXACTO Y FLOTANTE #
+# ============================================== #
+
+class ModosCalculoTests(ElementosMixin, TestCase):
+    """MODO_EXACTO devuelve el Decimal de 4 decimales que se almacena; MODO_FLOTANTE, el float histórico."""
+
+    def test_exacto_y_flotante(self):
+        exacta = CalculadoraPM(CalculadoraPM.MODO_EXACTO)
+        flotante = CalculadoraPM(CalculadoraPM.MODO_FLOTANTE)
+        for formula, esperado in (('C6H12O6', '180.1560'), ('Fe2(SO4)3', '399.8580'), ('C2H2', '26.0380')):
+            with self.subTest(formula=formula):
+                pm_exacto, conteo = exacta.analizar_formula(formula)
+                pm_flotante, conteo_flotante = flotante.analizar_formula(formula)
+                self.assertEqual(conteo, conteo_flotante)
+                # Siempre 4 decimales, como la columna peso_molecular_compuesto
+                self.assertEqual(str(pm_exacto), esperado)
+                self.assertIsInstance(pm_flotante, float)
+                # El float solo coincide después de redondearlo a la precisión de la BD
+                self.assertEqual(Decimal(str(round(pm_flotante, 4))), pm_exacto)
+
+    def test_suma_flotante_con_error_de_redondeo(self):
+        # 2 × 1.008 + 2 × 12.011 en binario: 26.037999999999997
+        self.assertNotEqual(CalculadoraPM().analizar_formula('C2H2')[0], 26.038)
+        self.assertEqual(CalculadoraPM(CalculadoraPM.MODO_EXACTO).analizar_formula('C2H2')[0], Decimal('26.038'))
+
+    def test_modo_no_soportado(self):
+        with self.assertRaises(ValueError):
+            CalculadoraPM('redondeado')
+
+
+# =================================================== #
+# LISTA DE COMPUESTOS: CONSULTAS CONSTANTES (Sin N+1) #
+# =================================================== #
+
+@override_settings(GESTOR_QUIMICO_COMPUESTOS_POR_PAGINA=500)
+class CompuestoListaConsultasTests(DatosQuimicosMixin, TestCase):
+    # Sesión, usuario, versiones del catálogo, roles (grupos y permisos, una sola
+    # consulta para la vista, perms y el navbar), página de compuestos (la tarjeta lee
+    # el resumen denormalizado, sin prefetch) y opciones de Industria del formulario de filtros.
+    # Es el costo de un fallo de la caché del catálogo (primera visita).
+    CONSULTAS_ESPERADAS = 6
+
+    def setUp(self):
+        # crear_compuestos usa bulk_create (sin señales) y la BD se revierte entre tests:
+        # se vacía la caché para no servir la página renderizada en otro test
+        cache.clear()
+
+    def _consultar_lista(self, cantidad):
+        self.crear_compuestos(cantidad, self.quimico)
+        self.client.force_login(self.quimico)
+        with self.assertNumQueries(self.CONSULTAS_ESPERADAS):
+            respuesta = self.client.get(reverse('compuesto_lista'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['compuestos']), cantidad)
+        self.assertContains(respuesta, 'Excipiente', count=cantidad)
+
+    def test_un_compuesto(self):
+        self._consultar_lista(1)
+
+    def test_doscientos_compuestos(self):
+        self._consultar_lista(200)
+
+    def test_pagina_sin_join(self):
+        # La página de compuestos no debe unir tablas ni agrupar (ni COUNT ... GROUP BY)
+        self.crear_compuestos(3, self.quimico)
+        self.client.force_login(self.quimico)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('compuesto_lista'))
+        tabla = f'FROM {connection.ops.quote_name(CompuestoQuimico._meta.db_table)}'
+        pagina = [c['sql'] for c in consultas if tabla in c['sql']]
+        self.assertEqual(len(pagina), 1)
+        self.assertNotIn('JOIN', pagina[0])
+        self.assertNotIn('GROUP BY', pagina[0])
+
+
+# ========================================= #
+# PAGINACIÓN POR CURSOR: CURSORES ALTERADOS #
+# ========================================= #
+
+@override_settings(GESTOR_QUIMICO_COMPUESTOS_POR_PAGINA=2)
+class CursorAlteradoTests(DatosQuimicosMixin, TestCase):
+    """Un ?despues= / ?antes= manipulado vuelve a la primera página en lugar de un error 500."""
+
+    CURSORES_ALTERADOS = (['a', 'x'], [None, {}], ['Compuesto', True], ['Compuesto', '1.5'], ['Compuesto', 10 ** 30])
+
+    def setUp(self):
+        cache.clear()
+        self.crear_compuestos(3, self.quimico)
+        self.client.force_login(self.quimico)
+
+    def test_tipos_por_campo(self):
+        campos = [CompuestoQuimico._meta.get_field(campo) for campo in ('nombre_compuesto', 'id')]
+        self.assertEqual(decodificar_cursor(codificar_cursor(['Compuesto 0001', 7]), campos), ['Compuesto 0001', 7])
+        for valores in self.CURSORES_ALTERADOS:
+            with self.subTest(valores=valores):
+                self.assertIsNone(decodificar_cursor(codificar_cursor(valores), campos))
+
+    def test_lista_vuelve_a_la_primera_pagina(self):
+        primera = self.client.get(reverse('compuesto_lista'))
+        for parametro in ('despues', 'antes'):
+            for valores in self.CURSORES_ALTERADOS:
+                with self.subTest(parametro=parametro, valores=valores):
+                    respuesta = self.client.get(reverse('compuesto_lista'), {parametro: codificar_cursor(valores)})
+                    self.assertEqual(respuesta.status_code, 200)
+                    self.assertEqual(list(respuesta.context['compuestos']), list(primera.context['compuestos']))
+
+
+# ======================================== #
+# ÍNDICE DE BÚSQUEDA: SINCRONÍA Y PREFIJOS #
+# ======================================== #
+
+class IndiceBusquedaTests(DatosQuimicosMixin, TestCase):
+    """Las señales mantienen los términos al crear, renombrar y borrar; la búsqueda es por prefijo."""
+
+    def crear(self, nombre, formula):
+        return CompuestoQuimico.objects.create(
+            nombre_compuesto=nombre, formula_compuesto=formula, id_industria=self.industria, usuario=self.quimico,
+        )
+
+    def encontrados(self, texto):
+        return set(buscar_compuestos(texto).values_list('nombre_compuesto', flat=True))
+
+    def terminos(self, compuesto):
+        return TerminoBusqueda.objects.filter(tipo_objeto=TerminoBusqueda.TIPO_COMPUESTO, id_objeto=compuesto.pk)
+
+    def test_prefijos(self):
+        self.crear('Sulfato Férrico', 'Fe2(SO4)3')
+        self.crear('Sulfato de Cobre', 'CuSO4')
+        self.crear('Carbonato de Cobalto', 'CoCO3')
+        self.crear('Agua', 'H2O')
+        casos = {
+            'sulf': {'Sulfato Férrico', 'Sulfato de Cobre'},
+            'ferr': {'Sulfato Férrico'},  # Sin tildes
+            'sulfato cob': {'Sulfato de Cobre'},  # Todas las palabras
+            'SO4': {'Sulfato Férrico', 'Sulfato de Cobre'},  # Fragmento dentro de un agrupador
+            'Co': {'Sulfato de Cobre', 'Carbonato de Cobalto'},  # Nombre o fórmula
+            'CO3': {'Carbonato de Cobalto'},  # Carbono + oxígeno, no cobalto
+            'H2O': {'Agua'},
+            'nitrato': set(),
+        }
+        for texto, esperados in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(self.encontrados(texto), esperados)
+
+    def test_alta_cambio_y_baja(self):
+        compuesto = self.crear('Agua', 'H2O')
+        self.assertEqual(self.encontrados('agua'), {'Agua'})
+
+        compuesto.nombre_compuesto, compuesto.formula_compuesto = 'Peróxido de Hidrógeno', 'H2O2'
+        compuesto.save()
+        self.assertEqual(self.encontrados('agua'), set())
+        self.assertEqual(self.encontrados('perox'), {'Peróxido de Hidrógeno'})
+        self.assertEqual(self.encontrados('H2O2'), {'Peróxido de Hidrógeno'})
+        # Sin términos huérfanos del nombre anterior
+        self.assertFalse(self.terminos(compuesto).filter(campo=TerminoBusqueda.CAMPO_NOMBRE, termino='agua').exists())
+
+        pk = compuesto.pk
+        compuesto.delete()
+        compuesto.pk = pk
+        self.assertFalse(self.terminos(compuesto).exists())
+
+    def test_guardar_sin_cambiar_el_texto_no_reindexa(self):
+        compuesto = CompuestoQuimico.objects.get(pk=self.crear('Agua', 'H2O').pk)
+        with mock.patch.object(busqueda, 'indexar_compuestos') as indexar:
+            compuesto.peso_molecular_compuesto = Decimal('18.0150')
+            compuesto.save()
+            indexar.assert_not_called()
+            compuesto.nombre_compuesto = 'Agua Destilada'
+            compuesto.save()
+            indexar.assert_called_once_with([compuesto])
+
+    def test_filtro_por_subcadena_configurable(self):
+        self.crear('Ácido Sulfúrico', 'H2SO4')
+        queryset = CompuestoQuimico.objects.all()
+        self.assertFalse(filtrar_compuestos(queryset, {'busqueda_compuesto': 'fúrico'}).exists())
+        with override_settings(GESTOR_QUIMICO_BUSQUEDA_SUBCADENA=True):
+            encontrados = filtrar_compuestos(queryset, {'busqueda_compuesto': 'fúrico'})
+            self.assertEqual(list(encontrados.values_list('nombre_compuesto', flat=True)), ['Ácido Sulfúrico'])
+
+
+# ========================================================= #
+# FILTRO POR COMPOSICIÓN: MÁSCARA FRENTE A RESULTADO EXACTO #
+# ========================================================= #
+
+class FiltroComposicionTests(DatosQuimicosMixin, TestCase):
+    """El prefiltro por máscara de bits devuelve exactamente lo mismo que las subconsultas."""
+
+    # Incluye elementos de la máscara alta (Z > 63: Au, Hg, Pb, U)
+    FORMULAS = (
+        'Fe2(SO4)3', 'FeCl3', 'FeCl2', 'Fe2O3', 'NaCl', 'CuSO4', 'PbCl2', 'Pb(NO3)2', 'HgCl2',
+        'UO2(NO3)2', 'NH4Cl', 'K4[Fe(CN)6]', 'H2O', 'C6H12O6', 'AuCl3',
+    )
+    CONSULTAS = (
+        'Fe', 'Fe O', 'Cl>=2', 'Cl:2-3', 'Fe !S', 'Pb', 'Pb !N', 'N Cl', 'O>=12', 'Hg Cl=2',
+        '!O', 'U O', 'Au', 'C Fe', 'O<3', 'Fe !Cl !O',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for formula in cls.FORMULAS:
+            cls.registrar_compuesto(cls.quimico, formula)
+        assert CompuestoQuimico.objects.count() == len(cls.FORMULAS)
+
+    def esperados(self, texto):
+        """Resultado exacto calculado en Python desde la fórmula de cada compuesto."""
+        restricciones = parsear_restricciones(texto)
+        resultado = set()
+        for formula in self.FORMULAS:
+            conteo = dict(descomponer_formula(formula)[1])
+            if all(
+                r.minimo <= conteo.get(r.simbolo, 0) and (r.maximo is None or conteo.get(r.simbolo, 0) <= r.maximo)
+                if not r.es_exclusion else r.simbolo not in conteo
+                for r in restricciones
+            ):
+                resultado.add(formula)
+        return resultado
+
+    def test_mascara_activada_y_desactivada(self):
+        for texto in self.CONSULTAS:
+            esperados = self.esperados(texto)
+            for mascara in (True, False):
+                with self.subTest(consulta=texto, mascara=mascara), override_settings(GESTOR_QUIMICO_MASCARA_COMPOSICION=mascara):
+                    obtenidos = set(buscar_por_composicion(texto).values_list('formula_compuesto', flat=True))
+                    self.assertEqual(obtenidos, esperados)
+
+    def test_borrar_un_elemento_limpia_su_bit(self):
+        mercurio = self.elementos['Hg']
+        mercurio.delete()
+        cloruro = CompuestoQuimico.objects.get(formula_compuesto='HgCl2')
+        self.assertEqual(
+            (cloruro.mascara_elementos_bajos, cloruro.mascara_elementos_altos),
+            tuple(calcular_mascaras([self.elementos['Cl'].numero_atomico_elemento]).values()),
+        )
+
+        # Con el elemento dado de alta de nuevo, el compuesto ya no lo contiene: ningún bit obsoleto lo excluye
+        mercurio.pk = None
+        mercurio.save()
+        for mascara in (True, False):
+            with self.subTest(mascara=mascara), override_settings(GESTOR_QUIMICO_MASCARA_COMPOSICION=mascara):
+                self.assertIn('HgCl2', buscar_por_composicion('Cl !Hg').values_list('formula_compuesto', flat=True))
+
+
+# =============================================== #
+# FÓRMULA CANÓNICA (Hill): EQUIVALENTES Y ALCANCE #
+# =============================================== #
+
+class FormulaCanonicaTests(DatosQuimicosMixin, TestCase):
+    """Fórmulas equivalentes del mismo dueño se aceptan con advertencia; las de otros respetan el alcance."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro_quimico = User.objects.create_user('otro_quimico', password='clave-segura-123')
+        cls.otro_quimico.groups.add(Group.objects.get(name='Quimicos'))
+        cls.administrador = User.objects.create_user('admin', password='clave-segura-123')
+        cls.administrador.groups.add(Group.objects.get(name='Administradores'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_equivalente_aceptado_con_advertencia(self):
+        respuesta = self.registrar_compuesto(self.quimico, 'H2O', 'Agua')
+        self.assertRedirects(respuesta, reverse('compuesto_lista'), fetch_redirect_response=False)
+        # La clave de Hill no identifica al compuesto (isómeros): se registra y solo se advierte
+        respuesta = self.registrar_compuesto(self.quimico, 'OH2', 'Agua otra vez')
+        self.assertRedirects(respuesta, reverse('compuesto_lista'), fetch_redirect_response=False)
+        advertencias = [str(m) for m in get_messages(respuesta.wsgi_request) if m.level == messages.WARNING]
+        self.assertTrue(any('H2O' in mensaje and 'canónica' in mensaje for mensaje in advertencias), advertencias)
+        self.assertEqual(CompuestoQuimico.objects.filter(usuario=self.quimico, formula_canonica='H2O').count(), 2)
+
+        # Isómeros (etanol y dimetil éter) comparten clave y conviven en el catálogo
+        self.registrar_compuesto(self.quimico, 'C2H5OH', 'Etanol')
+        self.registrar_compuesto(self.quimico, 'CH3OCH3', 'Dimetil éter')
+        self.assertEqual(CompuestoQuimico.objects.filter(usuario=self.quimico, formula_canonica='C2H6O').count(), 2)
+
+    def test_otros_registros_con_el_alcance_del_usuario(self):
+        self.registrar_compuesto(self.quimico, 'H2O', 'Agua')
+        self.registrar_compuesto(self.otro_quimico, 'OH2', 'Agua')
+        propio = CompuestoQuimico.objects.get(usuario=self.quimico)
+        url = reverse('compuesto_detalle', kwargs={'pk': propio.pk})
+
+        self.client.force_login(self.quimico)
+        respuesta = self.client.get(url)
+        self.assertEqual(list(respuesta.context['otros_registros']), [])
+        self.assertNotContains(respuesta, 'otro_quimico')
+
+        self.client.force_login(self.administrador)
+        respuesta = self.client.get(url)
+        self.assertEqual([c.usuario for c in respuesta.context['otros_registros']], [self.otro_quimico])
+        self.assertContains(respuesta, 'otro_quimico')
+
+
+# ======================================================= #
+# IMPORTACIÓN MASIVA: REPORTE DE ERRORES Y LOTES ATÓMICOS #
+# ======================================================= #
+
+class ImportacionTests(DatosQuimicosMixin, TestCase):
+    """Las filas inválidas se rechazan sin escribir nada; cada lote se escribe completo o no se escribe."""
+
+    # Encabezado en la línea 1: las válidas son la 2, la 6 y la 8
+    CSV_MIXTO = (
+        'nombre,formula,aplicacion,concentracion\n'
+        'Agua,H2O,Excipiente,1.5\n'
+        'Desconocido,H2Xx,Excipiente,1\n'      # 3: símbolo inexistente
+        'Sal sin uso,NaCl,Inexistente,1\n'     # 4: aplicación no registrada
+        'Sal,NaCl,Excipiente,abc\n'            # 5: concentración no numérica
+        'Agua repetida,OH2,Excipiente,1\n'     # 6: equivalente (Hill) de la línea 2: se acepta
+        ',CO2,Excipiente,1\n'                  # 7: sin nombre
+        'Sal,NaCl,Excipiente,2\n'
+        'Agua,H2O,Excipiente,2\n'              # 9: misma fórmula que la línea 2
+    )
+
+    def setUp(self):
+        self.client.force_login(self.quimico)
+
+    @override_settings(GESTOR_QUIMICO_IMPORTACION_MAX_ERRORES=3)
+    def test_filas_mixtas_y_tope_de_errores(self):
+        archivo = SimpleUploadedFile('compuestos.csv', self.CSV_MIXTO.encode('utf-8'), content_type='text/csv')
+        respuesta = self.client.post(reverse('compuesto_importar'), {'archivo': archivo, 'formato': 'csv'})
+        self.assertEqual(respuesta.status_code, 200)
+
+        resumen = respuesta.context['resumen']
+        self.assertEqual(resumen.como_dict(), {'leidas': 8, 'creadas': 3, 'rechazadas': 5, 'equivalentes': 1})
+        # Solo los primeros errores (GESTOR_QUIMICO_IMPORTACION_MAX_ERRORES), con su línea del archivo:
+        # cada lote valida primero los campos y después analiza las fórmulas (líneas 3 y 9)
+        self.assertEqual([error.linea for error in respuesta.context['errores']], [4, 5, 7])
+        self.assertEqual(respuesta.context['errores'][0].formula, 'NaCl')
+        self.assertEqual(respuesta.context['errores_omitidos'], 2)
+
+        # Las filas rechazadas no dejan compuestos, relaciones ni composición
+        compuestos = CompuestoQuimico.objects.filter(usuario=self.quimico)
+        self.assertEqual(set(compuestos.values_list('formula_compuesto', flat=True)), {'H2O', 'OH2', 'NaCl'})
+        self.assertEqual(CompuestoAplicacion.objects.filter(id_compuesto__in=compuestos).count(), 3)
+        self.assertEqual(ElementoCompuesto.objects.count(), 6)
+
+    def test_conflicto_en_la_bd_descarta_el_lote_completo(self):
+        filas = [
+            (linea, {'nombre': formula, 'formula': formula, 'aplicacion': 'Excipiente'}, None)
+            for linea, formula in enumerate(('H2O', 'NaCl', 'CO2', 'KCl'), start=2)
+        ]
+        escribir = ImportadorCompuestos._escribir
+        llamadas = []
+
+        def escribir_y_fallar(importador, aceptadas):
+            # El segundo lote escribe todo y luego choca (p. ej. otro proceso registró un compuesto)
+            escribir(importador, aceptadas)
+            llamadas.append(aceptadas)
+            if len(llamadas) == 2:
+                raise IntegrityError('conflicto simulado')
+
+        errores = []
+        with mock.patch.object(ImportadorCompuestos, '_escribir', escribir_y_fallar):
+            resumen = ImportadorCompuestos(self.quimico, tamano_lote=2).importar(filas, errores.append)
+
+        self.assertEqual(resumen.como_dict(), {'leidas': 4, 'creadas': 2, 'rechazadas': 2, 'equivalentes': 0})
+        self.assertEqual([error.linea for error in errores], [4, 5])
+        self.assertEqual(
+            set(CompuestoQuimico.objects.values_list('formula_compuesto', flat=True)), {'H2O', 'NaCl'}
+        )
+        self.assertEqual(CompuestoAplicacion.objects.count(), 2)
+        self.assertEqual(ElementoCompuesto.objects.count(), 4)
+
+
+# ============================================ #
+# EXPORTACIÓN: ALCANCE DEL USUARIO Y POR LOTES #
+# ============================================ #
+
+@override_settings(GESTOR_QUIMICO_EXPORTACION_LOTE=2)
+class ExportacionTests(DatosQuimicosMixin, TestCase):
+    """Cada formato exporta solo lo visible para el usuario y ningún lote pierde filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        otro_quimico = User.objects.create_user('otro_quimico', password='clave-segura-123')
+        otro_quimico.groups.add(Group.objects.get(name='Quimicos'))
+        # 5 compuestos propios con lotes de 2: el último lote queda incompleto
+        cls.propios = {compuesto.pk for compuesto in cls.crear_compuestos(5, cls.quimico)}
+        cls.crear_compuestos(3, otro_quimico)
+
+    def setUp(self):
+        self.client.force_login(self.quimico)
+
+    def exportar(self, formato):
+        respuesta = self.client.get(reverse('compuesto_exportar', kwargs={'formato': formato}))
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content)
+
+    def test_csv(self):
+        filas = list(csv.DictReader(io.StringIO(self.exportar('csv').decode('utf-8-sig'))))
+        self.assertEqual([int(fila['id']) for fila in filas], sorted(self.propios))
+        self.assertEqual({fila['usuario'] for fila in filas}, {'quimico'})
+
+    def test_jsonl(self):
+        filas = [json.loads(linea) for linea in self.exportar('jsonl').decode('utf-8').splitlines()]
+        self.assertEqual([fila['id'] for fila in filas], sorted(self.propios))
+        self.assertEqual({fila['usuario'] for fila in filas}, {'quimico'})
+
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        hoja = load_workbook(io.BytesIO(self.exportar('xlsx')), read_only=True)['Compuestos']
+        encabezado, *filas = hoja.iter_rows(values_only=True)
+        self.assertEqual(encabezado[0], 'id')
+        self.assertEqual([fila[0] for fila in filas], sorted(self.propios))
+
+    def test_texto_que_parece_formula_se_escapa(self):
+        from openpyxl import load_workbook
+
+        nombre = '=HYPERLINK("http://ejemplo.invalid","clic")'
+        CompuestoQuimico.objects.filter(pk=min(self.propios)).update(nombre_compuesto=nombre)
+        Aplicacion.objects.filter(pk=self.aplicacion.pk).update(nombre_uso='+Excipiente')
+
+        fila_csv = next(csv.DictReader(io.StringIO(self.exportar('csv').decode('utf-8-sig'))))
+        self.assertEqual(fila_csv['nombre'], "'" + nombre)
+        self.assertTrue(fila_csv['aplicaciones'].startswith("'+Excipiente"))
+
+        hoja = load_workbook(io.BytesIO(self.exportar('xlsx')))['Compuestos']
+        celda = hoja.cell(row=2, column=COLUMNAS_EXPORTACION.index('nombre') + 1)
+        self.assertEqual((celda.data_type, celda.value), ('s', "'" + nombre))
+
+        # JSON Lines no es una hoja de cálculo: conserva el texto original
+        fila_json = json.loads(self.exportar('jsonl').decode('utf-8').splitlines()[0])
+        self.assertEqual(fila_json['nombre'], nombre)
+
+    def test_formato_no_soportado(self):
+        respuesta = self.client.get(reverse('compuesto_exportar', kwargs={'formato': 'xml'}))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+# ========================================================== #
+# CARGA DE LA TABLA PERIÓDICA: SOLO SE ESCRIBE LO QUE CAMBIA #
+# ========================================================== #
+
+class CargaTablaPeriodicaTests(TestCase):
+    """Una segunda carga solo lee la BD; un peso corregido actualiza únicamente su elemento."""
+
+    SIN_CAMBIOS = {'elementos_nuevos': 0, 'elementos_actualizados': 0, 'detalles_escritos': 0, 'compuestos_recalculados': 0}
+
+    def test_segunda_carga_sin_escrituras(self):
+        self.assertEqual(cargar_tabla_periodica(), {**self.SIN_CAMBIOS, 'elementos_nuevos': 118, 'detalles_escritos': 118})
+        self.assertEqual(DetalleElemento.objects.count(), 118)
+        # Solo las dos lecturas del estado actual: sin transacción ni escrituras
+        with self.assertNumQueries(2):
+            self.assertEqual(cargar_tabla_periodica(), self.SIN_CAMBIOS)
+
+    def test_peso_corregido(self):
+        cargar_tabla_periodica()
+        ElementoQuimico.objects.filter(simbolo_elemento='O').update(peso_atomico_elemento=Decimal('16.0000'))
+        self.assertEqual(cargar_tabla_periodica(simular=True), {**self.SIN_CAMBIOS, 'elementos_actualizados': 1})
+        self.assertEqual(cargar_tabla_periodica(), {**self.SIN_CAMBIOS, 'elementos_actualizados': 1})
+        self.assertEqual(ElementoQuimico.objects.get(simbolo_elemento='O').peso_atomico_elemento, Decimal('15.9990'))
+        self.assertEqual(cargar_tabla_periodica(), self.SIN_CAMBIOS)
+
+
+# ======================================= #
+# API JSON: ETAG (304), LÍMITES Y ALCANCE #
+# ======================================= #
+
+class ApiCompuestosTests(DatosQuimicosMixin, TestCase):
+    """La API usa el alcance de la lista HTML y revalida con ETag sin consultar la tabla del recurso."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro_quimico = User.objects.create_user('otro_quimico', password='clave-segura-123')
+        cls.otro_quimico.groups.add(Group.objects.get(name='Quimicos'))
+        cls.admin = User.objects.create_user('admin', password='clave-segura-123')
+        cls.admin.groups.add(Group.objects.get(name='Administradores'))
+        cls.propios = {compuesto.pk for compuesto in cls.crear_compuestos(3, cls.quimico)}
+        cls.ajenos = {compuesto.pk for compuesto in cls.crear_compuestos(2, cls.otro_quimico)}
+
+    def setUp(self):
+        self.client.force_login(self.quimico)
+
+    def ids(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200)
+        return {resultado['id'] for resultado in respuesta.json()['resultados']}
+
+    def test_if_none_match_responde_304_sin_consultar_compuestos(self):
+        url = reverse('api_compuesto_lista')
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+
+        tabla = CompuestoQuimico._meta.db_table
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if tabla in c['sql']])
+
+        # Un alta incrementa la versión de compuestos: la ETag anterior deja de valer
+        with self.captureOnCommitCallbacks(execute=True):
+            CompuestoQuimico.objects.create(
+                nombre_compuesto='Nuevo', formula_compuesto='CO2', id_industria=self.industria, usuario=self.quimico,
+            )
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    @override_settings(GESTOR_QUIMICO_API_TAMANO_MAXIMO=500)
+    def test_limite_invalido_responde_400(self):
+        for limite in ('0', '-1', 'abc', '501', '2.5'):
+            with self.subTest(limite=limite):
+                respuesta = self.client.get(reverse('api_compuesto_lista'), {'limite': limite})
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.json())
+        respuesta = self.client.get(reverse('api_compuesto_lista'), {'limite': '2'})
+        self.assertEqual(len(self.ids(respuesta)), 2)
+
+    def test_alcance_del_quimico(self):
+        self.assertEqual(self.ids(self.client.get(reverse('api_compuesto_lista'))), self.propios)
+        ajeno = reverse('api_compuesto_detalle', kwargs={'pk': min(self.ajenos)})
+        self.assertEqual(self.client.get(ajeno).status_code, 404)
+
+        # La ETag depende del alcance: otro usuario no reutiliza la del químico
+        etag = self.client.get(reverse('api_compuesto_lista'))['ETag']
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(reverse('api_compuesto_lista'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(self.ids(respuesta), self.propios | self.ajenos)
+
+    def test_sin_sesion_responde_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_compuesto_lista')).status_code, 401)
+
+
+# ============================================ #
+# API /api/pm: LÍMITES, LOTES MIXTOS Y ERRORES #
+# ============================================ #
+
+@override_settings(GESTOR_QUIMICO_API_PM_LARGO_MAXIMO=20, GESTOR_QUIMICO_API_PM_LOTE_MAXIMO=3)
+class ApiPesoMolecularTests(ElementosMixin, TestCase):
+    """Cálculo sin sesión: cada fórmula inválida se informa en su posición sin afectar a las demás."""
+
+    def lote(self, cuerpo):
+        return self.client.post(reverse('api_pm'), json.dumps(cuerpo), content_type='application/json')
+
+    def test_formula_individual(self):
+        respuesta = self.client.get(reverse('api_pm'), {'formula': 'OH2'})
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['formula_canonica'], 'H2O')
+        self.assertEqual(datos['conteo'], {'H': 2, 'O': 1})
+
+        respuesta = self.client.get(reverse('api_pm'), {'formula': 'H2Xx'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(set(respuesta.json()), {'formula', 'error'})
+
+    def test_largo_maximo(self):
+        for formula, estado in (('C' * 20, 200), ('C' * 21, 400), ('', 400)):
+            with self.subTest(largo=len(formula)):
+                respuesta = self.client.get(reverse('api_pm'), {'formula': formula})
+                self.assertEqual(respuesta.status_code, estado)
+        self.assertEqual(set(self.client.get(reverse('api_pm')).json()), {'error'})
+
+    def test_lote_maximo(self):
+        self.assertEqual(self.lote({'formulas': ['H2O'] * 3}).status_code, 200)
+        for cuerpo in ({'formulas': ['H2O'] * 4}, {'formulas': []}, {'otra': 1}):
+            with self.subTest(cuerpo=cuerpo):
+                respuesta = self.lote(cuerpo)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(set(respuesta.json()), {'error'})
+        respuesta = self.client.post(reverse('api_pm'), 'no es json', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_lote_mixto_conserva_el_orden(self):
+        respuesta = self.lote({'formulas': ['NaCl', 'H2Xx', 'C' * 21]})
+        self.assertEqual(respuesta.status_code, 200)
+        valida, desconocida, larga = respuesta.json()['resultados']
+        self.assertEqual(valida['formula_canonica'], 'ClNa')
+        self.assertNotIn('error', valida)
+        self.assertEqual(set(desconocida), {'formula', 'error'})
+        self.assertEqual(desconocida['formula'], 'H2Xx')
+        self.assertEqual(set(larga), {'formula', 'error'})
+
+        respuesta = self.lote(['H2O', 7])  # También se acepta la lista sin envolver
+        self.assertEqual(respuesta.json()['resultados'][1], {'formula': None, 'error': "Se requiere una fórmula no vacía."})
+
+
+# ========================================================== #
+# FRAGMENTO DE LA TABLA PERIÓDICA: NUEVA VERSIÓN TRAS EDITAR #
+# ========================================================== #
+
+@override_settings(GESTOR_QUIMICO_VERSION_TTL=0)
+class FragmentoTablaPeriodicaTests(TransactionTestCase):
+    """
+    Editar un elemento cambia la clave del fragmento: la tabla se vuelve a renderizar.
+    Con commits reales: la versión del fragmento se incrementa en on_commit, que dentro
+    de la transacción de TestCase no llega a ejecutarse. Sin TTL: cada prueba vacía la BD
+    y una versión leída en otra prueba podría coincidir con la nueva.
+    """
+
+    def setUp(self):
+        crear_elementos()
+        cache.clear()
+
+    def estado(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta['X-Cache-Fragmento'], respuesta.content.decode('utf-8')
+
+    def test_edicion_invalida_el_fragmento(self):
+        for url in (reverse('elemento_lista'), reverse('elemento_lista_async')):
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(self.estado(url)[0], 'fallo')
+                self.assertEqual(self.estado(url)[0], 'acierto')
+
+                variante = ([], False, [])  # Visitante sin filtros ni permisos
+                clave = fragmento_tabla_periodica.clave(variante)
+                hierro = ElementoQuimico.objects.get(simbolo_elemento='Fe')
+                hierro.nombre_elemento = f'Hierro editado {url}'
+                hierro.save()
+                self.assertNotEqual(fragmento_tabla_periodica.clave(variante), clave)
+
+                estado, html = self.estado(url)
+                self.assertEqual(estado, 'fallo')
+                self.assertIn(hierro.nombre_elemento, html)
+                self.assertEqual(self.estado(url)[0], 'acierto')
+
+
+# ============================================ #
+# ROLES POR PETICIÓN: UNA CONSULTA COMO MÁXIMO #
+# ============================================ #
+
+class RolesPorPeticionTests(DatosQuimicosMixin, TestCase):
+    """Grupos y permisos se resuelven una vez por petición (vista, test_func, perms y navbar)."""
+
+    def setUp(self):
+        cache.clear()
+        self.compuesto = self.crear_compuestos(1, self.quimico)[0]
+
+    def _consultas_de_roles(self, usuario, url):
+        self.client.force_login(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return [
+            consulta['sql'] for consulta in consultas
+            if 'auth_group' in consulta['sql'] or 'auth_permission' in consulta['sql']
+        ]
+
+    def test_quimico(self):
+        urls = [
+            reverse('compuesto_lista'),
+            reverse('compuesto_lista'),  # Acierto de la caché del catálogo
+            reverse('compuesto_actualizar', kwargs={'pk': self.compuesto.pk}),
+            reverse('compuesto_eliminar', kwargs={'pk': self.compuesto.pk}),
+            reverse('perfil_personal'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertLessEqual(len(self._consultas_de_roles(self.quimico, url)), 1)
+
+    def test_administrador_sobre_compuesto_ajeno(self):
+        administrador = User.objects.create_user('admin', password='clave-segura-123')
+        administrador.groups.add(Group.objects.get(name='Administradores'))
+        for url in (reverse('compuesto_lista'), reverse('compuesto_actualizar', kwargs={'pk': self.compuesto.pk})):
+            with self.subTest(url=url):
+                self.assertLessEqual(len(self._consultas_de_roles(administrador, url)), 1)
+
+    def test_usuario_inactivo_sin_precarga_de_permisos(self):
+        self.quimico.is_active = False
+        roles = RolesUsuario(self.quimico)
+        self.assertFalse(hasattr(self.quimico, '_perm_cache'))
+        self.assertFalse(roles.tiene_permiso('app_quimico.change_compuestoquimico'))
+
+    def test_cambio_de_permisos_invalida_catalogos(self):
+        permiso = Permission.objects.get(codename='delete_compuestoquimico')
+        otro = User.objects.create_user('otro_quimico', password='clave-segura-123')
+        quimicos = Group.objects.get(name='Quimicos')
+        cambios = (
+            (lambda: quimicos.permissions.add(permiso), {self.quimico.pk}),
+            (lambda: otro.user_permissions.add(permiso), {otro.pk}),
+            (lambda: permiso.user_set.clear(), {otro.pk}),  # Desde Permission: pk_set vacío
+            (lambda: permiso.group_set.remove(quimicos), {self.quimico.pk}),
+            (lambda: quimicos.permissions.clear(), {self.quimico.pk}),
+        )
+        for cambio, afectados in cambios:
+            with self.subTest(afectados=afectados), mock.patch.object(versiones, 'invalidar_catalogos') as invalidar:
+                cambio()
+                self.assertEqual(set(invalidar.call_args.args[0]), afectados)
+
+
+# =============================================================== #
+# MODIFICAR COMPUESTO: CARGA ÚNICA (Consultas Fijas por Petición) #
+# =============================================================== #
+
+class CompuestoModificarConsultasTests(DatosQuimicosMixin, TestCase):
+    # Sesión, usuario, compuesto + relación (una consulta con select_related),
+    # opciones validadas de Aplicación e Industria, FK de la relación (validación del modelo),
+    # savepoint, equivalente canónico, UPDATE del compuesto, UPDATE de la relación,
+    # UPDATE del resumen denormalizado y liberación del savepoint. Con el mismo nombre y
+    # fórmula no se reescribe el índice de búsqueda.
+    CONSULTAS_POST = 12
+
+    def setUp(self):
+        self.compuesto = self.crear_compuestos(1, self.quimico)[0]
+        self.client.force_login(self.quimico)
+
+    def test_post_consultas_fijas(self):
+        datos = {
+            'nombre_compuesto': self.compuesto.nombre_compuesto,
+            'formula_compuesto': self.compuesto.formula_compuesto,
+            'tipo_industria': self.industria.pk,
+            'id_aplicacion': self.aplicacion.pk,
+            'concentracion_minima': '2.50',
+            'tipo_concentracion': 'ppm',
+        }
+        url = reverse('compuesto_actualizar', kwargs={'pk': self.compuesto.pk})
+        with self.assertNumQueries(self.CONSULTAS_POST):
+            respuesta = self.client.post(url, datos)
+        self.assertRedirects(respuesta, reverse('compuesto_lista'), fetch_redirect_response=False)
+
+        # Renombrar sí reescribe el índice (borrado e inserción de términos)
+        datos['nombre_compuesto'] = 'Agua Modificada'
+        with self.assertNumQueries(self.CONSULTAS_POST + 2):
+            self.client.post(url, datos)
+
+        self.compuesto.refresh_from_db()
+        self.assertEqual(self.compuesto.nombre_compuesto, 'Agua Modificada')
+        relacion = CompuestoAplicacion.objects.get(id_compuesto=self.compuesto)
+        self.assertEqual(relacion.concentracion_minima, Decimal('2.50'))
+
+    def test_compuesto_sin_relacion_404(self):
+        CompuestoAplicacion.objects.filter(id_compuesto=self.compuesto).delete()
+        respuesta = self.client.get(reverse('compuesto_actualizar', kwargs={'pk': self.compuesto.pk}))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+# ==================================================== #
+# COMPOSICIÓN AL EDITAR: SOLO SE ESCRIBE LO QUE CAMBIA #
+# ==================================================== #
+
+class DiferenciaComposicionTests(DatosQuimicosMixin, TestCase):
+    """Cambiar un subíndice de un compuesto de varios elementos es un único UPDATE de ElementoCompuesto."""
+
+    def setUp(self):
+        self.client.force_login(self.quimico)
+        self.datos = self.datos_compuesto('C6H12O6', 'Glucosa')
+        self.registrar_compuesto(self.quimico, 'C6H12O6', 'Glucosa')
+        self.compuesto = CompuestoQuimico.objects.get(usuario=self.quimico, formula_compuesto='C6H12O6')
+
+    def filas(self):
+        return {
+            ec.id_elemento.simbolo_elemento: (ec.pk, ec.cantidad_elem_en_comp)
+            for ec in self.compuesto.elementocompuesto_set.select_related('id_elemento')
+        }
+
+    def escrituras_composicion(self, consultas):
+        tabla = ElementoCompuesto._meta.db_table
+        return [
+            c['sql'].split()[0].upper() for c in consultas.captured_queries
+            if tabla in c['sql'] and c['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def test_editar_un_subindice(self):
+        antes = self.filas()
+        url = reverse('compuesto_actualizar', kwargs={'pk': self.compuesto.pk})
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, {**self.datos, 'formula_compuesto': 'C6H12O7'})
+        self.assertRedirects(respuesta, reverse('compuesto_lista'), fetch_redirect_response=False)
+
+        self.assertEqual(self.escrituras_composicion(consultas), ['UPDATE'])
+        despues = self.filas()
+        # Las filas de C y H no se tocan; la de O conserva su id con la cantidad nueva
+        self.assertEqual({s: despues[s] for s in ('C', 'H')}, {s: antes[s] for s in ('C', 'H')})
+        self.assertEqual(despues['O'], (antes['O'][0], 7))
+
+    def test_sincronizar_sin_altas_ni_bajas(self):
+        conteo = {self.elementos['C'].pk: 6, self.elementos['H'].pk: 12, self.elementos['O'].pk: 7}
+        # Lectura de las filas actuales + un UPDATE; sin altas ni bajas no se refresca el resumen
+        with self.assertNumQueries(2):
+            resumen = sincronizar_composicion({self.compuesto.pk: conteo})
+        self.assertEqual(
+            resumen, {'creadas': 0, 'actualizadas': 1, 'borradas': 0, 'compuestos': {self.compuesto.pk}}
+        )
+        # Misma composición: solo la lectura
+        with self.assertNumQueries(1):
+            resumen = sincronizar_composicion({self.compuesto.pk: conteo})
+        self.assertEqual(resumen['actualizadas'], 0)
+
+
+# ================================================= #
+# MÉTRICAS: EXPOSICIÓN, AUTORIZACIÓN Y PRESUPUESTOS #
+# ================================================= #
+
+@override_settings(GESTOR_QUIMICO_METRICAS=True, GESTOR_QUIMICO_METRICAS_TOKEN='token-del-scraper')
+class MetricasTests(TestCase):
+    """El middleware agrega por nombre de URL y /metrics solo se expone al staff o al scraper."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='clave-segura-123', is_staff=True)
+        cls.usuario = User.objects.create_user('usuario', password='clave-segura-123')
+
+    def setUp(self):
+        registro.reiniciar()
+        instrumentar_conexion(connection)  # Conexión de la prueba, abierta antes de activar las métricas
+
+    def metricas(self, **cabeceras):
+        return self.client.get(reverse('metricas'), headers=cabeceras)
+
+    def test_texto_prometheus_por_vista(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('elemento_lista'))
+        self.client.force_login(self.staff)
+        respuesta = self.metricas()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode('utf-8')
+        self.assertIn('# TYPE gestor_quimico_consultas histogram', texto)
+        self.assertIn('gestor_quimico_peticion_segundos_count{vista="elemento_lista"} 1', texto)
+        self.assertIn(f'gestor_quimico_consultas_sum{{vista="elemento_lista"}} {len(consultas)}', texto)
+        self.assertIn('gestor_quimico_consultas_bucket{vista="elemento_lista",le="+Inf"} 1', texto)
+
+    def test_autorizacion(self):
+        self.assertEqual(self.metricas().status_code, 403)
+        self.assertEqual(self.metricas(Authorization='Bearer otro-token').status_code, 403)
+        self.assertEqual(self.metricas(Authorization='Bearer token-del-scraper').status_code, 200)
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.metricas().status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.metricas().status_code, 200)
+        with self.settings(GESTOR_QUIMICO_METRICAS=False):
+            self.assertEqual(self.metricas(Authorization='Bearer token-del-scraper').status_code, 404)
+
+    @override_settings(GESTOR_QUIMICO_METRICAS_PRESUPUESTOS={'elemento_lista': {'consultas': 0}})
+    def test_presupuesto_excedido(self):
+        with self.assertLogs('app_quimico.metricas', 'WARNING') as registros:
+            self.client.get(reverse('elemento_lista'))
+        self.assertIn('Presupuesto excedido en elemento_lista', registros.output[0])
+        # Sin presupuesto para la vista de métricas: no se registra nada más
+        with self.assertNoLogs('app_quimico.metricas', 'WARNING'):
+            texto = self.metricas(Authorization='Bearer token-del-scraper').content.decode('utf-8')
+        self.assertIn('gestor_quimico_presupuesto_excedido_total{vista="elemento_lista",limite="consultas"} 1', texto)
+
+
+@override_settings(GESTOR_QUIMICO_METRICAS=True)
+class MetricasAsincronasTests(TransactionTestCase):
+    """
+    Bajo ASGI el middleware no cambia de hilo y cuenta también las consultas de los hilos
+    de en_paralelo. Con commits reales: los hilos del pool usan su propia conexión.
+    """
+
+    def setUp(self):
+        registro.reiniciar()
+        instrumentar_conexion(connection)
+        hierro = crear_elementos()['Fe']
+        self.usuario = User.objects.create_user('quimico', password='clave-segura-123')
+        self.url = reverse('elemento_detalle_async', kwargs={'pk': hierro.pk})
+
+    def consultas_registradas(self):
+        histogramas, _ = registro.instantanea()
+        _, suma, total = histogramas['gestor_quimico_consultas']['elemento_detalle_async']
+        return suma, total
+
+    async def test_consultas_de_los_hilos_del_pool(self):
+        await self.async_client.aforce_login(self.usuario)
+        sumas = []
+        for paralelas in (False, True):
+            with self.settings(GESTOR_QUIMICO_ASYNC_CONSULTAS_PARALELAS=paralelas):
+                registro.reiniciar()
+                respuesta = await self.async_client.get(self.url)
+                self.assertEqual(respuesta.status_code, 200)
+                suma, total = self.consultas_registradas()
+                self.assertEqual(total, 1)
+                sumas.append(suma)
+        # Las consultas hechas en hilos del pool cuentan igual que las hechas en el hilo de la petición
+        self.assertEqual(sumas[0], sumas[1])
+        self.assertGreater(sumas[1], 2)
+
+
+# =================================================== #
+# BENCHMARKS: REGRESIONES FRENTE A UNA EJECUCIÓN BASE #
+# =================================================== #
+
+class ComparacionBenchmarksTests(SimpleTestCase):
+    """Rendimiento y latencia toleran --umbral; consultas y discrepancias nuevas nunca se toleran."""
+
+    BASE = {
+        'calculadora': {'exacto': {'operaciones_por_segundo': 1000.0}, 'discrepancias': []},
+        'api_pm': {'get': {'latencia_p50_ms': 2.0, 'consultas_bd': 0}},
+    }
+
+    def actual(self, operaciones, latencia, consultas=0, discrepancias=()):
+        return {
+            'calculadora': {'exacto': {'operaciones_por_segundo': operaciones}, 'discrepancias': list(discrepancias)},
+            'api_pm': {'get': {'latencia_p50_ms': latencia, 'consultas_bd': consultas}},
+        }
+
+    def test_umbral(self):
+        # 30 % menos rendimiento y 40 % más latencia: regresiones con el 20 % por defecto, no con el 50 %
+        actual = self.actual(700.0, 2.8)
+        self.assertEqual(comparar_resultados(self.BASE, actual), [
+            'calculadora.exacto.operaciones_por_segundo: 1000.0 -> 700.0 (-30%)',
+            'api_pm.get.latencia_p50_ms: 2.00 -> 2.80 ms (+40%)',
+        ])
+        self.assertEqual(comparar_resultados(self.BASE, actual, umbral=0.5), [])
+        # Las mejoras nunca son regresiones
+        self.assertEqual(comparar_resultados(self.BASE, self.actual(2000.0, 1.0)), [])
+
+    def test_consultas_y_discrepancias_sin_tolerancia(self):
+        actual = self.actual(1000.0, 2.0, consultas=1, discrepancias=['C2H2'])
+        self.assertEqual(comparar_resultados(self.BASE, actual, umbral=10), [
+            'calculadora.discrepancias: 0 -> 1',
+            'api_pm.get.consultas_bd: 0 -> 1 consultas',
+        ])
+
+
+# =================================================== #
+# PLANES DE CONSULTA: USO DE ÍNDICES (EXPLAIN SQLite) #
+# =================================================== #
+
+@skipUnless(connection.vendor == 'sqlite', "Los planes de EXPLAIN se verifican con SQLite.")
+class PlanConsultasTests(DatosQuimicosMixin, TestCase):
+    """
+    Las consultas calientes del catálogo se resuelven con sus índices compuestos.
+    Solo se comprueban los planes de SQLite (EXPLAIN QUERY PLAN); en MySQL y el resto
+    de motores estas pruebas se omiten.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.crear_compuestos(50, cls.quimico)
+
+    def assertUsaIndice(self, queryset, indice, ordena_en_memoria=False):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {indice}\b')
+        if not ordena_en_memoria:
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_lista_del_quimico_por_nombre(self):
+        queryset = compuestos_visibles(self.quimico, es_global=False).order_by('nombre_compuesto', 'id')
+        self.assertUsaIndice(queryset, 'compuesto_usuario_nombre_idx')
+        # Página siguiente del cursor keyset: el rango también sale del índice
+        self.assertUsaIndice(queryset.filter(nombre_compuesto__gt='Compuesto 0010'), 'compuesto_usuario_nombre_idx')
+
+    def test_lista_global_por_nombre(self):
+        queryset = compuestos_visibles(self.quimico, es_global=True).order_by('nombre_compuesto', 'id')
+        self.assertUsaIndice(queryset[:24], 'compuesto_nombre_idx')
+
+    def test_industria_y_peso_minimo(self):
+        queryset = filtrar_compuestos(
+            CompuestoQuimico.objects.all(), {'industria': self.industria, 'min_peso_molecular': Decimal('10')}
+        )
+        # Aplicaciones de la industria -> sus compuestos (índice cubriente) -> compuesto por pk
+        self.assertUsaIndice(queryset, 'compapl_aplicacion_comp_idx')
+
+    def test_industria_actual_de_las_aplicaciones(self):
+        compuesto = CompuestoQuimico.objects.filter(usuario=self.quimico).order_by('pk').first()
+        otra = Industria.objects.create(nombre_industria='Alimentaria')
+        conservante = Aplicacion.objects.create(id_industria=otra, nombre_uso='Conservante')
+
+        def filtrados(industria):
+            return set(filtrar_compuestos(CompuestoQuimico.objects.all(), {'industria': industria}))
+
+        # Una segunda aplicación de otra industria: el compuesto aparece en ambas
+        CompuestoAplicacion.objects.create(
+            id_compuesto=compuesto, id_aplicacion=conservante, concentracion_minima=Decimal('1.00')
+        )
+        self.assertIn(compuesto, filtrados(self.industria))
+        self.assertEqual(filtrados(otra), {compuesto})
+
+        # Mover la aplicación de industria se refleja sin tocar los compuestos
+        self.aplicacion.id_industria = otra
+        self.aplicacion.save()
+        self.assertEqual(len(filtrados(otra)), 50)
+        self.assertFalse(filtrados(self.industria))
+
+    def test_peso_minimo(self):
+        queryset = filtrar_compuestos(CompuestoQuimico.objects.all(), {'min_peso_molecular': Decimal('10')})
+        self.assertUsaIndice(queryset, 'compuesto_pm_idx')
+
+    def test_elementos_por_categoria(self):
+        # La tabla periódica (118 filas) se ordena en memoria tras filtrar por el índice de categoría
+        queryset = filtrar_elementos(
+            ElementoQuimico.objects.select_related('detalleelemento'), {'categoria': 'Alcalinos'}
+        ).order_by('numero_atomico_elemento')
+        self.assertUsaIndice(queryset, 'detalle_categoria_idx', ordena_en_memoria=True)
+
+
+# =============================================== #
+# VISTAS ASÍNCRONAS: CONTEXTO, PERMISOS Y ALCANCE #
+# =============================================== #
+
+class VistasAsincronasTests(TransactionTestCase):
+    """
+    Las vistas ASGI responden como sus CBVs, con las consultas en serie y en paralelo.
+    Con commits reales: en paralelo cada consulta usa la conexión de un hilo del pool.
+    """
+
+    def setUp(self):
+        self.oxigeno = crear_elementos()['O']
+        for nombre in ('Administradores', 'Colaboradores', 'Quimicos'):
+            Group.objects.create(name=nombre)
+        self.quimico = User.objects.create_user('quimico', password='clave-segura-123')
+        self.otro_quimico = User.objects.create_user('otro_quimico', password='clave-segura-123')
+        for usuario in (self.quimico, self.otro_quimico):
+            usuario.groups.add(Group.objects.get(name='Quimicos'))
+        self.admin = User.objects.create_superuser('admin', password='clave-segura-123')
+        self.admin.groups.add(Group.objects.get(name='Administradores'))
+        industria = Industria.objects.create(nombre_industria='Farmacéutica')
+        Aplicacion.objects.create(id_industria=industria, nombre_uso='Excipiente')
+        for usuario, formula in ((self.quimico, 'H2O'), (self.otro_quimico, 'OH2')):
+            ImportadorCompuestos(usuario).importar(
+                [(2, {'nombre': 'Agua', 'formula': formula, 'aplicacion': 'Excipiente'}, None)]
+            )
+        self.agua = CompuestoQuimico.objects.get(usuario=self.quimico)
+        self.agua_ajena = CompuestoQuimico.objects.get(usuario=self.otro_quimico)
+
+    async def en_ambos_modos(self, prueba):
+        for paralelas in (False, True):
+            with self.subTest(paralelas=paralelas), self.settings(GESTOR_QUIMICO_ASYNC_CONSULTAS_PARALELAS=paralelas):
+                await prueba()
+
+    async def get(self, nombre_url, usuario=None, **kwargs):
+        if usuario is None:
+            await self.async_client.alogout()
+        else:
+            await self.async_client.aforce_login(usuario)
+        return await self.async_client.get(reverse(nombre_url, kwargs=kwargs))
+
+    async def test_detalle_elemento(self):
+        async def prueba():
+            # Visitante: datos del elemento, sin compuestos ni acciones
+            respuesta = await self.get('elemento_detalle_async', pk=self.oxigeno.pk)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta.context['elemento'], self.oxigeno)
+            self.assertNotContains(respuesta, 'Compuestos Relacionados')
+            self.assertNotContains(respuesta, 'Modificar')
+
+            # Químico: solo sus compuestos (la lista precargada trae los de todos)
+            respuesta = await self.get('elemento_detalle_async', self.quimico, pk=self.oxigeno.pk)
+            composicion = respuesta.context['elemento'].elementocompuesto_set.all()
+            self.assertEqual({ec.id_compuesto for ec in composicion}, {self.agua, self.agua_ajena})
+            self.assertContains(respuesta, reverse('compuesto_detalle', kwargs={'pk': self.agua.pk}))
+            self.assertNotContains(respuesta, reverse('compuesto_detalle', kwargs={'pk': self.agua_ajena.pk}))
+            self.assertNotContains(respuesta, 'Modificar')
+
+            # Administrador: todos los compuestos y las acciones de sus permisos
+            respuesta = await self.get('elemento_detalle_async', self.admin, pk=self.oxigeno.pk)
+            self.assertContains(respuesta, reverse('compuesto_detalle', kwargs={'pk': self.agua_ajena.pk}))
+            self.assertContains(respuesta, reverse('elemento_actualizar', kwargs={'pk': self.oxigeno.pk}))
+
+            self.assertEqual((await self.get('elemento_detalle_async', pk=0)).status_code, 404)
+
+        await self.en_ambos_modos(prueba)
+
+    async def test_detalle_compuesto(self):
+        async def prueba():
+            url = reverse('compuesto_detalle_async', kwargs={'pk': self.agua.pk})
+            respuesta = await self.get('compuesto_detalle_async', pk=self.agua.pk)
+            self.assertRedirects(respuesta, f"{reverse('login')}?next={url}", fetch_redirect_response=False)
+
+            respuesta = await self.get('compuesto_detalle_async', self.quimico, pk=self.agua.pk)
+            self.assertEqual(respuesta.status_code, 200)
+            compuesto = respuesta.context['compuesto']
+            self.assertEqual(compuesto, self.agua)
+            self.assertEqual(
+                {(ec.id_elemento.simbolo_elemento, ec.cantidad_elem_en_comp) for ec in compuesto.elementocompuesto_set.all()},
+                {('H', 2), ('O', 1)},
+            )
+            self.assertEqual(
+                [ca.id_aplicacion.nombre_uso for ca in compuesto.compuestoaplicacion_set.all()], ['Excipiente']
+            )
+            # El equivalente de otro Químico queda fuera de su alcance; el Administrador lo ve
+            self.assertEqual(respuesta.context['otros_registros'], [])
+            respuesta = await self.get('compuesto_detalle_async', self.admin, pk=self.agua.pk)
+            self.assertEqual(respuesta.context['otros_registros'], [self.agua_ajena])
+
+            self.assertEqual((await self.get('compuesto_detalle_async', self.quimico, pk=0)).status_code, 404)
+
+        await self.en_ambos_modos(prueba)
@@ -2,6 +2,9 @@ from django.urls import path
 from django.contrib.auth import views as auth_views
 from app_quimico.views import CustomLoginView, custom_logout_view, HomeView
 from . import views 
+from . import api
+from . import metricas
+from . import vistas_asincronas
 
 urlpatterns = [
 
@@ -53,9 +56,15 @@ path('elementos/eliminar/<int:pk>/', views.ElementoDeleteView.as_view(), name='e
 # C - CREATE
 path('compuestos/crear/', views.CompuestoCreateView.as_view(), name='compuesto_crear'),
 
+# C - CREATE (Importación masiva CSV / JSON Lines)
+path('compuestos/importar/', views.CompuestoImportarView.as_view(), name='compuesto_importar'),
+
 # R - READ (Lista)
 path('compuestos/', views.CompuestoListView.as_view(), name='compuesto_lista'),
 
+# R - READ (Exportación en streaming: csv, jsonl o xlsx; respeta los filtros de la lista)
+path('compuestos/exportar/<str:formato>/', views.CompuestoExportarView.as_view(), name='compuesto_exportar'),
+
 # R - READ (Detalle)
 path('compuestos/<int:pk>/detalle/', views.CompuestoDetailView.as_view(), name='compuesto_detalle'),
 
@@ -66,7 +75,7 @@ path('compuestos/modificar/<int:pk>/', views.CompuestoUpdateView.as_view(), name
 path('compuestos/eliminar/<int:pk>/', views.CompuestoDeleteView.as_view(), name='compuesto_eliminar'),
 
 # ====================== #
-# CRUD para APLICACIONES # 
+# CRUD para APLICACIONES #
 # ====================== #
 
 # C - CREATE
@@ -81,6 +90,36 @@ path('aplicaciones/modificar/<int:pk>/', views.AplicacionUpdateView.as_view(), n
 # D - DELETE
 path('aplicaciones/eliminar/<int:pk>/', views.AplicacionDeleteView.as_view(), name='aplicacion_eliminar'),
 
+# =============================================== #
+# API JSON (SOLO LECTURA: CAMPOS, CURSOR Y ETAGS) #
+# =============================================== #
+
+path('api/elementos/', api.ElementoApiView.as_view(), name='api_elemento_lista'),
+path('api/elementos/<int:pk>/', api.ElementoApiView.as_view(), name='api_elemento_detalle'),
+path('api/compuestos/', api.CompuestoApiView.as_view(), name='api_compuesto_lista'),
+path('api/compuestos/<int:pk>/', api.CompuestoApiView.as_view(), name='api_compuesto_detalle'),
+path('api/aplicaciones/', api.AplicacionApiView.as_view(), name='api_aplicacion_lista'),
+path('api/aplicaciones/<int:pk>/', api.AplicacionApiView.as_view(), name='api_aplicacion_detalle'),
+path('api/industrias/', api.IndustriaApiView.as_view(), name='api_industria_lista'),
+path('api/industrias/<int:pk>/', api.IndustriaApiView.as_view(), name='api_industria_detalle'),
+
+# Cálculo de PM sin estado (GET una fórmula, POST un lote)
+path('api/pm', api.calcular_pm, name='api_pm'),
+
+# ======================================================= #
+# LECTURA ASÍNCRONA (ASGI; Mismas Plantillas que las CBV) #
+# ======================================================= #
+
+path('async/elementos/', vistas_asincronas.ElementoListaAsincronaView.as_view(), name='elemento_lista_async'),
+path('async/elementos/<int:pk>/detalle/', vistas_asincronas.ElementoDetalleAsincronoView.as_view(), name='elemento_detalle_async'),
+path('async/compuestos/<int:pk>/detalle/', vistas_asincronas.CompuestoDetalleAsincronoView.as_view(), name='compuesto_detalle_async'),
+
+# =========================================== #
+# MÉTRICAS (Prometheus; Staff o Token Bearer) #
+# =========================================== #
+
+path('metrics', metricas.exponer_metricas, name='metricas'),
+
 # ===================== #
 # URLs de AUTENTICACIÓN #
 # ===================== #
@@ -1,103 +1,323 @@
 import re
+import threading
 from decimal import Decimal
+from functools import lru_cache
+from typing import NamedTuple, Optional, Union
+from django.conf import settings
 from app_quimico.models import ElementoQuimico 
-from django.db.models import F # No es estrictamente necesario aquí, pero se mantiene si se usa F-expressions.
+from app_quimico import versiones
+
+
+# ======================================== #
+# ARITMÉTICA DE PUNTO FIJO (Diezmilésimas) #
+# ======================================== #
+
+# Los pesos de la BD tienen 4 decimales: como enteros escalados por 10.000 la suma
+# de un PM es aritmética entera pura (exacta y sin la ida y vuelta por float).
+ESCALA_PESOS = 10_000
+
+
+def decimal_a_entero(valor: Decimal) -> int:
+    """Convierte un peso de la BD (4 decimales) a diezmilésimas de g/mol."""
+    return int(valor * ESCALA_PESOS)
+
+
+def entero_a_decimal(valor: int) -> Decimal:
+    """Convierte diezmilésimas de g/mol a un Decimal con exactamente 4 decimales."""
+    return Decimal(valor).scaleb(-4)
+
+
+# ================================================ #
+# TABLA DE PESOS ATÓMICOS (Compartida por Proceso) #
+# ================================================ #
+
+class TablaPesosAtomicos:
+    """
+    Tabla de pesos atómicos única por proceso y segura entre hilos.
+    Se carga una sola vez y se recarga solo cuando cambia la versión 'elementos'
+    (incrementada por las señales de ElementoQuimico), de modo que todos los
+    workers se mantienen consistentes.
+    """
+    CLAVE_VERSION = versiones.VERSION_ELEMENTOS
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pesos = None
+        self._pesos_enteros = None
+        self._version = None
+        self._estadisticas = {'aciertos': 0, 'fallos': 0, 'recargas': 0}
+
+    def _leer_bd(self):
+        """Lee la tabla ElementoQuimico completa (única consulta costosa)."""
+        elementos = ElementoQuimico.objects.all().values_list('simbolo_elemento', 'peso_atomico_elemento')
+        pesos, pesos_enteros = {}, {}
+        for simbolo, peso in elementos:
+            pesos[simbolo] = float(peso)
+            pesos_enteros[simbolo] = decimal_a_entero(peso)
+        return pesos, pesos_enteros
+
+    def obtener(self, exacto: bool = False) -> dict:
+        """
+        Devuelve el mapa {símbolo: peso} en float o, si exacto=True, en enteros de
+        diezmilésimas de g/mol. El diccionario es compartido: NO modificarlo.
+        """
+        version = versiones.version_actual(self.CLAVE_VERSION)
+        with self._lock:
+            if self._pesos is not None and self._version == version:
+                self._estadisticas['aciertos'] += 1
+            else:
+                self._estadisticas['fallos'] += 1
+                if self._pesos is not None:
+                    self._estadisticas['recargas'] += 1
+                self._pesos, self._pesos_enteros = self._leer_bd()
+                self._version = version
+            return self._pesos_enteros if exacto else self._pesos
+
+    def invalidar(self):
+        """Descarta la tabla local; la próxima lectura se hará desde la BD."""
+        with self._lock:
+            self._version = None
+
+    def estadisticas(self) -> dict:
+        """Contadores de aciertos, fallos (lecturas a BD) y recargas por invalidación."""
+        with self._lock:
+            return dict(self._estadisticas, version=self._version)
+
+
+# Instancia única del proceso
+tabla_pesos = TablaPesosAtomicos()
+
+
+def invalidar_pesos_atomicos():
+    """Marca la tabla de pesos como obsoleta en todos los procesos (tras el commit)."""
+    versiones.invalidar(TablaPesosAtomicos.CLAVE_VERSION)
+
+
+# ========================================= #
+# MOTOR DE ANÁLISIS DE FÓRMULAS (Memoizado) #
+# ========================================= #
+
+# Patrón para tokenizar (letra(s), número, agrupador). Se compila una sola vez.
+PATRON_TOKENS = re.compile(r'([A-Z][a-z]?|\d+|[()\[\]\{\}])')
+AGRUPADORES_CIERRE = frozenset(')]}')
+AGRUPADORES_APERTURA = frozenset('([{')
+
+_descomponer_cacheado = None
+_lock_cache_analisis = threading.Lock()
+
+
+def _descomponer_sin_cache(formula_original: str):
+    """
+    Implementa la lógica Stack sobre los tokens (recorridos de derecha a izquierda).
+    Devuelve (simbolos_en_orden, pares_conteo) como tuplas inmutables, o lanza ValueError
+    ante errores de sintaxis. No valida los símbolos contra la BD.
+    """
+    conteo = {}
+    simbolos = {}
+    multiplicadores_stack = [1] 
+    factor_actual = 1 
+    ultimo_subindice = 1 
+
+    for token in reversed(PATRON_TOKENS.findall(formula_original)):
+        if token.isdigit():
+            ultimo_subindice = int(token)
+        elif token in AGRUPADORES_CIERRE:
+            factor_actual *= ultimo_subindice
+            multiplicadores_stack.append(factor_actual)
+            ultimo_subindice = 1 
+        elif token in AGRUPADORES_APERTURA:
+            if len(multiplicadores_stack) > 1:
+                multiplicadores_stack.pop()
+                factor_actual = multiplicadores_stack[-1]
+                ultimo_subindice = 1
+            else:
+                raise ValueError(f"Agrupador de apertura ('{token}') encontrado sin su cierre correspondiente.")
+
+        # Símbolo Químico (Elemento)
+        else:
+            simbolos[token] = None
+
+            cantidad_total = ultimo_subindice * factor_actual
+            if cantidad_total == 0: continue 
+
+            conteo[token] = conteo.get(token, 0) + cantidad_total
+            ultimo_subindice = 1 
+
+    if len(multiplicadores_stack) > 1:
+        raise ValueError("Fórmula incompleta: Falta cerrar uno o más agrupadores.")
+
+    return tuple(simbolos), tuple(conteo.items())
+
+
+def descomponer_formula(formula_original: str):
+    """
+    Versión memoizada (LRU acotado) de la descomposición. Como solo guarda la
+    composición, una recarga de la tabla de pesos NO invalida esta caché.
+    Tamaño configurable con GESTOR_QUIMICO_CACHE_FORMULAS.
+    """
+    global _descomponer_cacheado
+    if _descomponer_cacheado is None:
+        with _lock_cache_analisis:
+            if _descomponer_cacheado is None:
+                tamano = getattr(settings, 'GESTOR_QUIMICO_CACHE_FORMULAS', 4096)
+                _descomponer_cacheado = lru_cache(maxsize=tamano)(_descomponer_sin_cache)
+    return _descomponer_cacheado(formula_original)
+
+
+def estadisticas_cache_analisis() -> dict:
+    """Aciertos, fallos, ocupación y tasa de aciertos de la caché de fórmulas."""
+    if _descomponer_cacheado is None:
+        return {'aciertos': 0, 'fallos': 0, 'tamano_maximo': None, 'tamano_actual': 0, 'tasa_aciertos': 0.0}
+    info = _descomponer_cacheado.cache_info()
+    consultas = info.hits + info.misses
+    return {
+        'aciertos': info.hits,
+        'fallos': info.misses,
+        'tamano_maximo': info.maxsize,
+        'tamano_actual': info.currsize,
+        'tasa_aciertos': info.hits / consultas if consultas else 0.0,
+    }
+
+
+def limpiar_cache_analisis():
+    """Vacía la caché de fórmulas (se vuelve a dimensionar según settings en el próximo uso)."""
+    global _descomponer_cacheado
+    with _lock_cache_analisis:
+        _descomponer_cacheado = None
+
+
+# ================================ #
+# FÓRMULA CANÓNICA (Orden de Hill) #
+# ================================ #
+
+def formula_hill(conteo: dict) -> str:
+    """
+    Fórmula en orden de Hill a partir del mapa {símbolo: cantidad}: C primero, luego H y
+    el resto en orden alfabético (si no hay C, todo alfabético). Ca(OH)2 y CaO2H2 -> 'CaH2O2'.
+    """
+    if 'C' in conteo:
+        orden = ['C'] + (['H'] if 'H' in conteo else []) + sorted(s for s in conteo if s not in ('C', 'H'))
+    else:
+        orden = sorted(conteo)
+    return ''.join(simbolo if conteo[simbolo] == 1 else f'{simbolo}{conteo[simbolo]}' for simbolo in orden)
+
+
+# Igual al max_length de CompuestoQuimico.formula_canonica
+LARGO_MAXIMO_CANONICA = 255
+
+
+def formula_canonica(formula: str) -> Optional[str]:
+    """Clave canónica (Hill) de una fórmula, o None si no puede analizarse o no cabe en la columna."""
+    try:
+        _, pares_conteo = descomponer_formula(formula)
+    except ValueError:
+        return None
+    if not pares_conteo:
+        return None
+    canonica = formula_hill(dict(pares_conteo))
+    return canonica if len(canonica) <= LARGO_MAXIMO_CANONICA else None
+
+
+# =============================== #
+# RESULTADO INDIVIDUAL DE UN LOTE #
+# =============================== #
+
+class ResultadoFormula(NamedTuple):
+    """Resultado por fórmula de CalculadoraPM.analizar_lote (peso/conteo o error)."""
+    formula: str
+    peso: Optional[Union[float, Decimal]]
+    conteo: Optional[dict]
+    error: Optional[str]
+
+    @property
+    def es_valido(self) -> bool:
+        return self.error is None
+
+
+# ================================== #
+# CALCULADORA DE PESO MOLECULAR (PM) #
+# ================================== #
 
 class CalculadoraPM:
     """
     Servicio que implementa el Algoritmo Stack (Pila) para calcular el Peso Molecular 
     y descomponer la fórmula, usando la base de datos ElementoQuimico.
+
+    Modos de cálculo:
+    - MODO_FLOTANTE: suma en float (comportamiento histórico). Devuelve un float.
+    - MODO_EXACTO: suma en enteros de diezmilésimas. Devuelve un Decimal con 4 decimales,
+      idéntico al valor que se almacena en la BD.
     """
+    MODO_FLOTANTE = 'flotante'
+    MODO_EXACTO = 'exacto'
     
-    def __init__(self):
-        # Cache para almacenar los pesos atómicos en memoria
-        self.peso_atomico_cache = {} 
-        self._cargar_pesos_atomicos()
-
-    def _cargar_pesos_atomicos(self):
-        """Carga todos los pesos atómicos de la BD a la caché al iniciar."""
-        # Se requiere .values('simbolo_elemento', 'peso_atomico_elemento') basado en tu modelo
-        elementos = ElementoQuimico.objects.all().values('simbolo_elemento', 'peso_atomico_elemento')
-        
-        # Almacenamos usando el símbolo como clave y convertimos el Decimal a float (o Decimal si se prefiere mayor precisión)
-        # Usamos float para mantener la lógica original, pero lo convertiremos a Decimal al final.
-        self.peso_atomico_cache = {
-            e['simbolo_elemento']: float(e['peso_atomico_elemento']) 
-            for e in elementos
-        }
+    def __init__(self, modo: str = MODO_FLOTANTE):
+        if modo not in (self.MODO_FLOTANTE, self.MODO_EXACTO):
+            raise ValueError(f"Modo de cálculo no soportado: '{modo}'.")
+        self.modo = modo
+        # Referencia a la tabla de pesos compartida (no se consulta la BD en cada instancia)
+        self.peso_atomico_cache = tabla_pesos.obtener(exacto=self.modo == self.MODO_EXACTO)
 
     def _es_simbolo_valido(self, simbolo: str) -> bool:
         """Verifica si el símbolo existe en el caché de la BD."""
         return simbolo in self.peso_atomico_cache
 
-    def _obtener_peso_atomico(self, simbolo: str) -> float:
-        """Obtiene el peso atómico del caché."""
-        return self.peso_atomico_cache.get(simbolo, 0.0)
+    def _obtener_peso_atomico(self, simbolo: str):
+        """Obtiene el peso atómico del caché (float, o entero en modo exacto)."""
+        return self.peso_atomico_cache.get(simbolo, 0)
+
+    def _validar_simbolos(self, simbolos):
+        """Valida los símbolos contra la tabla de pesos (en el orden en que se analizaron)."""
+        for simbolo in simbolos:
+            # VALIDACIÓN DE AMBIGÜEDAD (CU vs Cu)
+            if len(simbolo) == 2 and simbolo.isupper():
+                simbolo_capitalizado = simbolo.capitalize()
+                if self._es_simbolo_valido(simbolo_capitalizado):
+                    raise ValueError(f"Símbolo ambiguo: '{simbolo}'. Nomenclatura IUPAC incorrecta. Use '{simbolo_capitalizado}'.")
+            
+            if not self._es_simbolo_valido(simbolo):
+                raise ValueError(f"Símbolo no reconocido: '{simbolo}'.")
 
     def analizar_formula(self, formula_original: str):
         """
         Método central que implementa la lógica Stack para obtener el PM y el conteo.
-        Devuelve (pm_final_float, elementos_conteo) o lanza ValueError.
+        Devuelve (pm_final, elementos_conteo) o lanza ValueError. pm_final es float en
+        MODO_FLOTANTE y Decimal (4 decimales) en MODO_EXACTO.
         """
-        conteo = {}
-        multiplicadores_stack = [1] 
-        factor_actual = 1 
+        # 1. ANÁLISIS DE LA FÓRMULA (Memoizado: solo composición, nunca pesos)
+        simbolos, pares_conteo = descomponer_formula(formula_original)
+        self._validar_simbolos(simbolos)
         
-        # Patrón para tokenizar (letra(s), número, agrupador)
-        tokens = re.findall(r'([A-Z][a-z]?|\d+|[()\[\]\{\}])', formula_original)
-        tokens.reverse() 
-        
-        ultimo_subindice = 1 
-
-        # 1. ANÁLISIS DE LA FÓRMULA (ALGORITMO STACK)
-        for token in tokens:
-            if token.isdigit():
-                ultimo_subindice = int(token)
-            elif token in [')', ']', '}']: # Agregué '}' para completar las llaves
-                factor_actual *= ultimo_subindice
-                multiplicadores_stack.append(factor_actual)
-                ultimo_subindice = 1 
-            elif token in ['(', '[', '{']: # Agregué '{'
-                if len(multiplicadores_stack) > 1:
-                    multiplicadores_stack.pop()
-                    factor_actual = multiplicadores_stack[-1]
-                    ultimo_subindice = 1
-                else:
-                    raise ValueError(f"Agrupador de apertura ('{token}') encontrado sin su cierre correspondiente.")
-
-            # Caso 4: Símbolo Químico (Elemento)
-            elif token.isalpha():
-                simbolo = token
-                
-                # VALIDACIÓN DE AMBIGÜEDAD (CU vs Cu)
-                if len(simbolo) == 2 and simbolo.isupper():
-                    simbolo_capitalizado = simbolo.capitalize()
-                    if self._es_simbolo_valido(simbolo_capitalizado):
-                        raise ValueError(f"Símbolo ambiguo: '{simbolo}'. Nomenclatura IUPAC incorrecta. Use '{simbolo_capitalizado}'.")
-                
-                if not self._es_simbolo_valido(simbolo):
-                    raise ValueError(f"Símbolo no reconocido: '{simbolo}'.")
-
-                cantidad_total = ultimo_subindice * factor_actual
-                if cantidad_total == 0: continue 
-
-                conteo[simbolo] = conteo.get(simbolo, 0) + cantidad_total
-                ultimo_subindice = 1 
-            else:
-                raise ValueError(f"Sintaxis inválida: Carácter o token no reconocido: '{token}'.")
-
-        if len(multiplicadores_stack) > 1:
-            raise ValueError("Fórmula incompleta: Falta cerrar uno o más agrupadores.")
+        conteo = dict(pares_conteo)
         if not conteo:
             raise ValueError("Fórmula vacía o la sintaxis es completamente inválida.")
             
         # 2. CÁLCULO DEL PESO MOLECULAR
-        pm_total = 0.0
+        pm_total = 0
         for simbolo, cantidad in conteo.items():
             peso_atomico = self._obtener_peso_atomico(simbolo)
-            if peso_atomico == 0.0:
+            if peso_atomico == 0:
                 raise Exception(f"Error interno: Peso atómico de '{simbolo}' no encontrado en la caché.")
             pm_total += peso_atomico * cantidad
         
         # Devolvemos el PM y el conteo
-        return pm_total, conteo
\ No newline at end of file
+        if self.modo == self.MODO_EXACTO:
+            return entero_a_decimal(pm_total), conteo
+        return float(pm_total), conteo
+
+    def analizar_lote(self, formulas):
+        """
+        Analiza un iterable de fórmulas. Las repetidas se calculan una sola vez y
+        los ValueError se registran por fórmula sin detener el lote.
+        Devuelve {formula: ResultadoFormula} en el orden de primera aparición.
+        """
+        resultados = {}
+        for formula in formulas:
+            if formula in resultados:
+                continue
+            try:
+                pm, conteo = self.analizar_formula(formula)
+                resultados[formula] = ResultadoFormula(formula, pm, conteo, None)
+            except ValueError as e:
+                resultados[formula] = ResultadoFormula(formula, None, None, str(e))
+        return resultados
@@ -0,0 +1,126 @@
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from app_quimico.models import VersionDatos
+
+
+# =================================================== #
+# CONTADORES DE VERSIÓN (Invalidación entre Procesos) #
+# =================================================== #
+
+# Conjuntos de datos versionados. 'elementos' es además la versión de la tabla de pesos
+# atómicos; la API JSON combina estas claves para calcular sus ETags.
+VERSION_ELEMENTOS = 'elementos'
+VERSION_COMPUESTOS = 'compuestos'
+VERSION_APLICACIONES = 'aplicaciones'
+VERSION_INDUSTRIAS = 'industrias'
+VERSION_GRUPOS = 'grupos'
+
+# Caché local del proceso: clave -> (version, instante de lectura)
+_versiones_locales = {}
+_lock = threading.Lock()
+
+
+def _ttl_version():
+    """Segundos durante los que una versión leída de la BD se considera vigente."""
+    return getattr(settings, 'GESTOR_QUIMICO_VERSION_TTL', 2.0)
+
+
+def version_actual(clave: str) -> int:
+    """
+    Devuelve la versión vigente de un conjunto de datos.
+    La lectura a la BD se hace como máximo una vez por TTL y por proceso,
+    de modo que todos los workers convergen a la misma versión.
+    """
+    ahora = time.monotonic()
+    registro = _versiones_locales.get(clave)
+    if registro is not None and ahora - registro[1] < _ttl_version():
+        return registro[0]
+
+    version = VersionDatos.objects.filter(clave=clave).values_list('version', flat=True).first() or 0
+    with _lock:
+        _versiones_locales[clave] = (version, ahora)
+    return version
+
+
+def incrementar_version(clave: str) -> int:
+    """Incrementa atómicamente la versión en la BD y la publica en el proceso actual."""
+    actualizadas = VersionDatos.objects.filter(clave=clave).update(version=F('version') + 1)
+    if not actualizadas:
+        VersionDatos.objects.get_or_create(clave=clave, defaults={'version': 1})
+
+    version = VersionDatos.objects.filter(clave=clave).values_list('version', flat=True).first() or 0
+    with _lock:
+        _versiones_locales[clave] = (version, time.monotonic())
+    return version
+
+
+class _Lote:
+    """Claves ya incrementadas por los callbacks de un mismo commit."""
+
+    def __init__(self):
+        self.incrementadas = set()
+        self.ejecutado = False
+
+
+# Atributo propio en la conexión (una por hilo) con el lote de la transacción en curso
+ATRIBUTO_LOTE = '_gestor_quimico_lote_versiones'
+
+
+class _Incremento:
+    """Callback de on_commit para una clave; solo el primero de cada clave y lote incrementa."""
+
+    def __init__(self, clave: str, lote: _Lote):
+        self.clave = clave
+        self.lote = lote
+
+    def __call__(self):
+        self.lote.ejecutado = True
+        if self.clave in self.lote.incrementadas:
+            return
+        self.lote.incrementadas.add(self.clave)
+        incrementar_version(self.clave)
+
+
+def invalidar(clave: str):
+    """
+    Programa el incremento de versión para DESPUÉS del commit.
+    CRÍTICO: Si se incrementara dentro de la transacción, otro hilo podría recargar
+    los datos antiguos (aún no confirmados) y marcarlos con la versión nueva.
+    Una transacción que escribe varias filas del mismo conjunto (compuesto y su relación)
+    incrementa la versión una sola vez: sus callbacks comparten un lote y se descartan al
+    ejecutarse si la clave ya se incrementó. Un lote que nunca se ejecutó (rollback) se
+    reutiliza sin riesgo, porque no registra nada hasta el commit.
+    """
+    conexion = transaction.get_connection()
+    lote = getattr(conexion, ATRIBUTO_LOTE, None)
+    if lote is None or lote.ejecutado:
+        lote = _Lote()
+        setattr(conexion, ATRIBUTO_LOTE, lote)
+    transaction.on_commit(_Incremento(clave, lote))
+
+
+# ======================================================= #
+# VERSIONES POR USUARIO (Catálogo de Compuestos en Caché) #
+# ======================================================= #
+
+def version_catalogo(usuario_id) -> str:
+    """Clave de versión del catálogo propio de un usuario (sus compuestos, aplicaciones y grupos)."""
+    return f'catalogo_usuario:{usuario_id}'
+
+
+def versiones_vigentes(claves) -> dict:
+    """
+    Lee varias versiones en una sola consulta y SIN la caché local por TTL: las usa el
+    catálogo por usuario, donde el propio usuario debe ver su escritura en cualquier worker.
+    """
+    encontradas = dict(VersionDatos.objects.filter(clave__in=claves).values_list('clave', 'version'))
+    return {clave: encontradas.get(clave, 0) for clave in claves}
+
+
+def invalidar_catalogos(usuario_ids):
+    """Programa (tras el commit) el incremento de la versión del catálogo de cada usuario."""
+    for usuario_id in sorted({usuario_id for usuario_id in usuario_ids if usuario_id is not None}):
+        invalidar(version_catalogo(usuario_id))
@@ -2,18 +2,31 @@ from django.urls import reverse_lazy
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib import messages
 from django.db import transaction 
-from decimal import Decimal 
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth import logout
-from django.db.models import Prefetch, Q, Count
+from django.db.models import Prefetch, Q
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin, PermissionRequiredMixin
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import User
-from .utils import CalculadoraPM # Clase de utilidad para el cálculo
+from .utils import CalculadoraPM, formula_canonica # Cálculo del PM y clave canónica (Hill)
+from .recalculo import recalcular_pesos_moleculares # Recálculo masivo del PM al corregir un peso atómico
+from .paginacion import PaginadorKeyset # Paginación por cursor para catálogos grandes
+from .composicion import calcular_mascaras, recalcular_mascaras, sincronizar_composicion # Máscara y composición incremental
+from .consultas import compuestos_visibles, filtrar_compuestos, filtrar_elementos # Alcance y filtros del catálogo
+from .importacion import ImportadorCompuestos, leer_filas # Importación masiva por lotes
+from .fragmentos import fragmento_tabla_periodica # Caché de fragmentos por versión de datos
+from .catalogo import estado_catalogo, variante_pagina, fragmento_catalogo # Caché del catálogo por usuario
+from .exportacion import FORMATOS_EXPORTACION, TIPOS_CONTENIDO, generar_csv, generar_jsonl, xlsx_temporal # Exportación en streaming
+import csv
+import io
+from django.conf import settings
 
 from django.views.generic import (
-    ListView, CreateView, UpdateView, DeleteView, TemplateView, DetailView
+    ListView, CreateView, UpdateView, DeleteView, TemplateView, DetailView, FormView, View
 )
+from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.template.loader import render_to_string
+from django.utils import timezone
 
 from .models import (
     Industria, ElementoQuimico, DetalleElemento, 
@@ -23,7 +36,7 @@ from .models import (
 from .forms import (
     IndustriaForm, ElementoQuimicoForm, DetalleElementoForm, 
     CompuestoQuimicoForm, AplicacionForm, CompuestoAplicacionForm,
-    ElementoFilterForm, CompuestoFilterForm, RegistroForm
+    ElementoFilterForm, CompuestoFilterForm, RegistroForm, ImportacionCompuestosForm
 )
 
 
@@ -199,35 +212,51 @@ class ElementoCreateView(LoginRequiredMixin, PermissionRequiredMixin, TemplateVi
         return self.render_to_response(context)
         
 # R - READ (Lista Elementos)
-class ElementoListView(ListView):
+class ElementoListView(TemplateView):
     # Abierto a todos (visitantes no requieren LoginRequiredMixin)
-    """Muestra una lista de todos los elementos químicos registrados en formato de tarjeta."""
-    model = ElementoQuimico
+    """
+    Muestra una lista de todos los elementos químicos registrados en formato de tarjeta.
+    Filtros y tarjetas se sirven desde la caché de fragmentos (clave: versión 'elementos',
+    filtros y permisos de la tarjeta): un acierto no consulta la BD ni renderiza las 118 tarjetas.
+    """
     template_name = 'app_quimico/elemento_quimico/elemento_lista.html' 
+    template_fragmento = 'app_quimico/elemento_quimico/elemento_tabla.html'
     context_object_name = 'elementos'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['filter_form'] = ElementoFilterForm(self.request.GET)
-        return context
+    # Permisos que cambian el HTML de cada tarjeta (botones Mod/Elim)
+    permisos_tarjeta = ('app_quimico.change_elementoquimico', 'app_quimico.delete_elementoquimico')
+
+    def get(self, request, *args, **kwargs):
+        form = ElementoFilterForm(request.GET)
+
+        def generar():
+            contexto = {'filter_form': form, self.context_object_name: self.get_queryset()}
+            return render_to_string(self.template_fragmento, contexto, request)
+
+        if not form.is_valid():
+            # Filtros inválidos: se muestran los errores sin pasar por la caché
+            return self.render_to_response({'tabla_elementos': generar()})
+
+        permisos = [permiso for permiso in self.permisos_tarjeta if request.user.has_perm(permiso)]
+        html, acierto = fragmento_tabla_periodica.obtener_o_generar(self.variante(form, permisos), generar)
+        respuesta = self.render_to_response({'tabla_elementos': html})
+        respuesta['X-Cache-Fragmento'] = 'acierto' if acierto else 'fallo'
+        return respuesta
+
+    def variante(self, form, permisos):
+        # Variante: filtros normalizados, si hubo parámetros GET (mensaje de "sin resultados") y permisos
+        return (
+            sorted((campo, str(valor)) for campo, valor in form.cleaned_data.items() if valor not in (None, '')),
+            bool(self.request.GET),
+            permisos,
+        )
 
     def get_queryset(self):
         queryset = ElementoQuimico.objects.select_related('detalleelemento').all()
         form = ElementoFilterForm(self.request.GET)
         
         if form.is_valid():
-            data = form.cleaned_data
-            
-            # Lógica de ORM para filtros:
-            if data['busqueda_nombre']:
-                queryset = queryset.filter(
-                    Q(nombre_elemento__icontains=data['busqueda_nombre']) | 
-                    Q(simbolo_elemento__icontains=data['busqueda_nombre'])
-                )
-            if data['categoria']:
-                queryset = queryset.filter(detalleelemento__categoria_elemento__exact=data['categoria'])
-            if data['min_peso_atomico']:
-                queryset = queryset.filter(peso_atomico_elemento__gte=data['min_peso_atomico'])
+            # Lógica de ORM para filtros (compartida con la API JSON)
+            queryset = filtrar_elementos(queryset, form.cleaned_data)
                 
         return queryset.order_by('numero_atomico_elemento')
 
@@ -239,10 +268,15 @@ class ElementoDetailView(DetailView):
     
     def get_queryset(self):
         return ElementoQuimico.objects.select_related('detalleelemento').prefetch_related(
-            'elementocompuesto_set__id_compuesto',
+            Prefetch('elementocompuesto_set', queryset=self.composicion(ElementoCompuesto.objects)),
             'elementoaplicacion_set__id_aplicacion__id_industria'
         )
 
+    @staticmethod
+    def composicion(relacion):
+        # Compuestos que contienen el elemento, con su autor (la plantilla lo compara con el usuario)
+        return relacion.select_related('id_compuesto__usuario')
+
 # U - UPDATE (Actualizar Elemento)
 class ElementoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
     permission_required = 'app_quimico.change_elementoquimico'
@@ -269,6 +303,8 @@ class ElementoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, TemplateVi
 
     def post(self, request, *args, **kwargs):
         elemento = self.get_object()
+        peso_anterior = elemento.peso_atomico_elemento
+        numero_anterior = elemento.numero_atomico_elemento
         
         elemento_form = ElementoQuimicoForm(request.POST, instance=elemento)
         detalle_form = DetalleElementoForm(request.POST, instance=elemento.detalleelemento)
@@ -281,7 +317,19 @@ class ElementoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, TemplateVi
                     elemento_form.save()
                     detalle_form.save()
 
+                    # Si se corrigió el peso atómico, los PM de sus compuestos quedan obsoletos
+                    recalculo = None
+                    if elemento.peso_atomico_elemento != peso_anterior:
+                        recalculo = recalcular_pesos_moleculares(elementos=[elemento.pk])
+                    # Si cambió el número atómico, cambia su bit en la máscara de composición
+                    if elemento.numero_atomico_elemento != numero_anterior:
+                        recalcular_mascaras(elementos=[elemento.pk])
+
                 messages.success(request, f"Elemento '{elemento.simbolo_elemento}' y sus detalles han sido actualizados exitosamente.")
+                if recalculo and recalculo['actualizados']:
+                    messages.info(request, f"Se recalculó el Peso Molecular de {recalculo['actualizados']} compuesto(s) que contienen '{elemento.simbolo_elemento}'.")
+                if recalculo and recalculo['omitidos']:
+                    messages.warning(request, f"{recalculo['omitidos']} compuesto(s) conservan su Peso Molecular anterior: el nuevo excede el máximo almacenable.")
                 return redirect(self.success_url)
 
             except Exception as e:
@@ -344,11 +392,21 @@ class CompuestoCreateView(LoginRequiredMixin, TemplateView):
                     # ASIGNACIÓN DE DUEÑO
                     compuesto_obj.usuario = self.request.user 
                     
-                    # Recalculo y asignación del PM
-                    calculadora = CalculadoraPM()
-                    pm_float, elementos_conteo = calculadora.analizar_formula(formula)
-                    peso_calculado = Decimal(str(pm_float)).quantize(Decimal('0.0001'))
+                    # Recalculo y asignación del PM (aritmética exacta, ya con 4 decimales)
+                    calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+                    peso_calculado, elementos_conteo = calculadora.analizar_formula(formula)
                     compuesto_obj.peso_molecular_compuesto = peso_calculado
+
+                    # Elementos de la fórmula (también definen la máscara de composición)
+                    simbolos = elementos_conteo.keys()
+                    elementos_bd = ElementoQuimico.objects.filter(simbolo_elemento__in=simbolos)
+                    elementos_map = {e.simbolo_elemento: e for e in elementos_bd}
+                    for campo, mascara in calcular_mascaras(e.numero_atomico_elemento for e in elementos_bd).items():
+                        setattr(compuesto_obj, campo, mascara)
+
+                    # Clave canónica (Hill): Ca(OH)2 y CaO2H2 la comparten (también los isómeros)
+                    compuesto_obj.formula_canonica = formula_canonica(formula)
+                    equivalente = buscar_equivalente(compuesto_obj)
                     
                     # Asignar Industria obligatoria
                     aplicacion_seleccionada = relacion_form.cleaned_data['id_aplicacion']
@@ -361,23 +419,15 @@ class CompuestoCreateView(LoginRequiredMixin, TemplateView):
                     relacion_obj.id_compuesto = compuesto_obj
                     relacion_obj.save()
 
-                    # Guardado de ElementoCompuesto
-                    simbolos = elementos_conteo.keys()
-                    elementos_bd = ElementoQuimico.objects.filter(simbolo_elemento__in=simbolos)
-                    elementos_map = {e.simbolo_elemento: e for e in elementos_bd}
-                    
-                    elementos_a_crear = [
-                        ElementoCompuesto(
-                            id_compuesto=compuesto_obj,
-                            id_elemento=elementos_map.get(simbolo),
-                            cantidad_elem_en_comp=cantidad
-                        )
+                    # Guardado de ElementoCompuesto (compuesto nuevo: solo inserciones)
+                    sincronizar_composicion({compuesto_obj.pk: {
+                        elementos_map[simbolo].pk: cantidad
                         for simbolo, cantidad in elementos_conteo.items()
-                        if elementos_map.get(simbolo) is not None
-                    ]
-                    ElementoCompuesto.objects.bulk_create(elementos_a_crear)
+                        if simbolo in elementos_map
+                    }}, nuevos=True)
 
                 messages.success(request, f"Compuesto '{formula}' registrado con éxito y aplicación asignada.")
+                avisar_equivalente(request, compuesto_obj, equivalente)
                 return redirect(self.success_url)
 
             except ValueError as e:
@@ -394,63 +444,172 @@ class CompuestoCreateView(LoginRequiredMixin, TemplateView):
         return self.render_to_response(context)
 
 
+def buscar_equivalente(compuesto):
+    """
+    Otro compuesto del mismo dueño con la misma fórmula canónica, o None. Solo se informa:
+    la fórmula de Hill no identifica al compuesto (los isómeros la comparten).
+    """
+    if not compuesto.formula_canonica or compuesto.usuario_id is None:
+        return None
+    return (
+        CompuestoQuimico.objects
+        .filter(usuario_id=compuesto.usuario_id, formula_canonica=compuesto.formula_canonica)
+        .exclude(pk=compuesto.pk)
+        .only('formula_compuesto', 'nombre_compuesto')
+        .first()
+    )
+
+
+def avisar_equivalente(request, compuesto, equivalente):
+    """Mensaje de advertencia (no bloqueante) cuando buscar_equivalente encontró otro registro."""
+    if equivalente is not None:
+        messages.warning(
+            request,
+            f"Ya tiene registrado un compuesto con la misma fórmula canónica ({compuesto.formula_canonica}): "
+            f"'{equivalente.formula_compuesto}' ({equivalente.nombre_compuesto}). Verifique que no se trate de un duplicado."
+        )
+
+
+# C - CREATE (Importación Masiva de Compuestos)
+class CompuestoImportarView(LoginRequiredMixin, FormView):
+    """
+    Importa un archivo CSV / JSON Lines de compuestos del usuario actual (dueño).
+    El archivo se procesa en streaming por lotes; se muestra un reporte de las filas rechazadas.
+    """
+    template_name = 'app_quimico/compuesto_quimico/compuesto_importar.html'
+    form_class = ImportacionCompuestosForm
+
+    def form_valid(self, form):
+        errores = []
+        maximo_errores = getattr(settings, 'GESTOR_QUIMICO_IMPORTACION_MAX_ERRORES', 200)
+
+        def reportar(error):
+            # Solo se conservan los primeros errores para la página (memoria acotada)
+            if len(errores) < maximo_errores:
+                errores.append(error)
+
+        archivo = io.TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig', newline='')
+        try:
+            importador = ImportadorCompuestos(self.request.user)
+            resumen = importador.importar(leer_filas(archivo, form.cleaned_data['formato']), reportar_error=reportar)
+        except (UnicodeDecodeError, csv.Error) as e:
+            messages.error(self.request, f"No se pudo leer el archivo: {e}")
+            return self.form_invalid(form)
+        finally:
+            archivo.detach()
+
+        if resumen.creadas:
+            messages.success(self.request, f"Se importaron {resumen.creadas} compuesto(s).")
+        if resumen.rechazadas:
+            messages.warning(self.request, f"{resumen.rechazadas} fila(s) fueron rechazadas. Revise el reporte de errores.")
+        if resumen.equivalentes:
+            messages.info(self.request, f"{resumen.equivalentes} compuesto(s) importados comparten fórmula canónica con otro de su catálogo (posibles isómeros o duplicados).")
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(), resumen=resumen, errores=errores,
+            errores_omitidos=resumen.rechazadas - len(errores),
+        ))
+
+
 # R - READ (Lista Compuestos)
-class CompuestoListView(LoginRequiredMixin, ListView):
-    model = CompuestoQuimico
+class CompuestoListView(LoginRequiredMixin, TemplateView):
+    """
+    Catálogo de compuestos con filtros y paginación por cursor. La página renderizada se
+    sirve desde la caché por usuario y filtro (o compartida entre gestores globales): un
+    acierto no vuelve a resolver el rol, el conteo ni la consulta de la página.
+    """
     template_name = 'app_quimico/compuesto_quimico/compuesto_lista.html' 
+    template_fragmento = 'app_quimico/compuesto_quimico/compuesto_tabla.html'
     context_object_name = 'compuestos'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Aseguramos que el formulario esté en el contexto
-        context['filter_form'] = CompuestoFilterForm(self.request.GET)
-        return context
-    
-    def get_queryset(self):
-        # 1. Base de la consulta y anotación (funciona)
-        queryset = CompuestoQuimico.objects.prefetch_related(
-            'compuestoaplicacion_set' 
-        ).annotate(
-            total_aplicaciones=Count('compuestoaplicacion')
+    # Orden único requerido por la paginación por cursor (keyset)
+    campos_orden = ('nombre_compuesto', 'id')
+    parametros_cursor = ('despues', 'antes', 'csrfmiddlewaretoken')
+    # Permisos que cambian el HTML de cada tarjeta (botones Modificar/Eliminar)
+    permisos_tarjeta = ('app_quimico.change_compuestoquimico', 'app_quimico.delete_compuestoquimico')
+
+    def get(self, request, *args, **kwargs):
+        # 1. Versiones vigentes y rol global (en caché, invalidado al cambiar los grupos del usuario)
+        estado = estado_catalogo(request.user)
+        self.es_global = estado.es_global
+
+        # 2. Página renderizada por alcance, filtros, cursor y permisos
+        def generar():
+            return render_to_string(self.template_fragmento, self.get_fragmento_data(), request)
+
+        variante = variante_pagina(estado, request, self.permisos_tarjeta)
+        html, acierto = fragmento_catalogo.obtener_o_generar(variante, generar)
+        respuesta = self.render_to_response({'tabla_compuestos': html})
+        respuesta['X-Cache-Fragmento'] = 'acierto' if acierto else 'fallo'
+        return respuesta
+
+    def get_fragmento_data(self):
+        # Paginación keyset: cada página cuesta O(tamaño de página), sin OFFSET
+        paginador = PaginadorKeyset(
+            self.get_queryset(), 
+            self.campos_orden, 
+            getattr(settings, 'GESTOR_QUIMICO_COMPUESTOS_POR_PAGINA', 24)
+        )
+        pagina = paginador.pagina(
+            despues=self.request.GET.get('despues'), 
+            antes=self.request.GET.get('antes')
         )
         
-        # FIX: Lógica de permisos corregida para incluir a Colaboradores en la vista global.
-        is_global_manager = self.request.user.groups.filter(
-            name__in=['Administradores', 'Colaboradores']
-        ).exists()
+        # Filtros activos (sin cursores) para conservarlos en los enlaces de navegación
+        parametros = self.request.GET.copy()
+        for parametro in self.parametros_cursor:
+            parametros.pop(parametro, None)
+        return {
+            self.context_object_name: pagina.objetos,
+            'pagina': pagina,
+            'filter_form': CompuestoFilterForm(self.request.GET),
+            'parametros_filtro': parametros.urlencode(),
+        }
+    
+    def get_queryset(self):
+        # 1. Base de la consulta: la tarjeta lee el resumen denormalizado del compuesto
+        # (aplicación, industria, concentración y totales), sin JOIN, prefetch ni COUNT ... GROUP BY.
+        queryset = CompuestoQuimico.objects.all()
         
-        # 2. Filtro por Dueño (Solo aplicamos el filtro personal si NO es un gestor global)
-        if self.request.user.is_authenticated and not is_global_manager:
-            # Resultado: Químicos (usuario estándar) son los únicos que llegan aquí.
-            queryset = queryset.filter(usuario=self.request.user)
+        # 2. Filtro por Dueño: Químicos solo ven sus compuestos; Administradores y
+        # Colaboradores, el catálogo completo (alcance compartido con exportación y API)
+        queryset = compuestos_visibles(self.request.user, queryset, es_global=self.es_global)
             
-        # 3. Aplicación de Filtros GET (Búsqueda y Rango)
+        # 3. Aplicación de Filtros GET (Búsqueda, Composición, Rango e Industria)
         form = CompuestoFilterForm(self.request.GET)
-        
         if form.is_valid():
-            data = form.cleaned_data
-            
-            # A. Búsqueda por Nombre/Fórmula (usando Q objects)
-            if data['busqueda_compuesto']:
-                queryset = queryset.filter(
-                    Q(nombre_compuesto__icontains=data['busqueda_compuesto']) | 
-                    Q(formula_compuesto__icontains=data['busqueda_compuesto'])
-                )
-
-            # B. Peso Molecular Mínimo (usando __gte)
-            if data['min_peso_molecular']:
-                queryset = queryset.filter(peso_molecular_compuesto__gte=data['min_peso_molecular'])
-                
-            # C. Filtro por Industria (Clave foránea indirecta)
-            if data['industria']:
-                # CRÍTICO: Usamos .pk para obtener el ID del objeto Industria seleccionado
-                industria_id = data['industria'].pk 
-                queryset = queryset.filter(
-                    compuestoaplicacion__id_aplicacion__id_industria=industria_id
-                ).distinct()
+            queryset = filtrar_compuestos(queryset, form.cleaned_data)
                 
-        # Ordenamos por nombre del compuesto
-        return queryset.order_by('nombre_compuesto')
+        # Ordenamos por nombre del compuesto (id como desempate para el cursor)
+        return queryset.order_by(*self.campos_orden)
+
+# R - READ (Exportación del Catálogo en Streaming)
+class CompuestoExportarView(LoginRequiredMixin, View):
+    """
+    Exporta el catálogo visible para el usuario (mismo alcance y filtros GET que la lista)
+    en CSV, JSON Lines o XLSX, sin cargar el queryset completo en memoria.
+    """
+
+    def get(self, request, formato):
+        if formato not in FORMATOS_EXPORTACION:
+            raise Http404("Formato de exportación no soportado.")
+
+        queryset = compuestos_visibles(request.user)
+        form = CompuestoFilterForm(request.GET)
+        if form.is_valid():
+            queryset = filtrar_compuestos(queryset, form.cleaned_data)
+
+        tamano_lote = getattr(settings, 'GESTOR_QUIMICO_EXPORTACION_LOTE', 2000)
+        nombre_archivo = f"compuestos_{timezone.now():%Y%m%d_%H%M}.{formato}"
+        if formato == 'xlsx':
+            respuesta = FileResponse(
+                xlsx_temporal(queryset, tamano_lote), as_attachment=True,
+                filename=nombre_archivo, content_type=TIPOS_CONTENIDO['xlsx'],
+            )
+        else:
+            generador = generar_csv if formato == 'csv' else generar_jsonl
+            respuesta = StreamingHttpResponse(generador(queryset, tamano_lote), content_type=TIPOS_CONTENIDO[formato])
+            respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+        return respuesta
+
 
 # R - READ (Detalle Compuesto)
 class CompuestoDetailView(LoginRequiredMixin, DetailView):
@@ -460,40 +619,86 @@ class CompuestoDetailView(LoginRequiredMixin, DetailView):
 
     def get_queryset(self):
         return CompuestoQuimico.objects.prefetch_related(
-            Prefetch('elementocompuesto_set', 
-                    queryset=ElementoCompuesto.objects.select_related('id_elemento').order_by('id_elemento__numero_atomico_elemento')),
-            Prefetch('compuestoaplicacion_set', 
-                    queryset=CompuestoAplicacion.objects.select_related('id_aplicacion__id_industria'))
+            Prefetch('elementocompuesto_set', queryset=self.composicion(ElementoCompuesto.objects)),
+            Prefetch('compuestoaplicacion_set', queryset=self.aplicaciones(CompuestoAplicacion.objects))
         )
 
-# U - UPDATE (Actualizar Compuesto)
-class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['otros_registros'] = self.otros_registros(self.object, self.request.user)
+        return context
+
+    # Conjuntos de datos de la página (compartidos con la versión asíncrona)
+    @staticmethod
+    def composicion(relacion):
+        return relacion.select_related('id_elemento').order_by('id_elemento__numero_atomico_elemento')
+
+    @staticmethod
+    def aplicaciones(relacion):
+        return relacion.select_related('id_aplicacion__id_industria')
+
+    @staticmethod
+    def otros_registros(compuesto, usuario):
+        # Otros registros del mismo compuesto (búsqueda por índice sobre formula_canonica),
+        # con el alcance del catálogo: los Químicos no ven compuestos ni autores ajenos
+        if not compuesto.formula_canonica:
+            return CompuestoQuimico.objects.none()
+        return (
+            compuestos_visibles(usuario, CompuestoQuimico.objects.filter(formula_canonica=compuesto.formula_canonica))
+            .exclude(pk=compuesto.pk)
+            .select_related('usuario')
+            .order_by('fecha_registro_compuesto')[:20]
+        )
+
+# Carga única del compuesto (compartida por Modificar y Eliminar)
+class CompuestoCargaMixin(UserPassesTestMixin):
     """
-    Permite actualizar un Compuesto Químico y su única CompuestoAplicacion relacionada.
+    La primera llamada a get_object() (desde test_func) consulta la BD y memoriza el
+    compuesto en la vista; get_context_data() y post() reutilizan la misma instancia.
+    Con cargar_relacion=True también se carga su única CompuestoAplicacion en la MISMA
+    consulta (select_related desde la relación hacia el compuesto, la aplicación y la industria).
     """
-    template_name = 'app_quimico/compuesto_quimico/compuesto_form.html' 
-    success_url = reverse_lazy('compuesto_lista')
+    cargar_relacion = False
 
     def get_object(self, queryset=None):
-        pk = self.kwargs.get('pk') 
-        return get_object_or_404(CompuestoQuimico, pk=pk)
-    
+        if not hasattr(self, '_compuesto'):
+            pk = self.kwargs.get('pk')
+            if self.cargar_relacion:
+                self._relacion = (
+                    CompuestoAplicacion.objects
+                    .select_related('id_compuesto', 'id_aplicacion__id_industria')
+                    .filter(id_compuesto_id=pk)
+                    .order_by('pk')
+                    .first()
+                )
+                if self._relacion is None:
+                    raise Http404("No existe el compuesto o no tiene aplicación registrada.")
+                self._compuesto = self._relacion.id_compuesto
+            else:
+                self._compuesto = get_object_or_404(CompuestoQuimico, pk=pk)
+        return self._compuesto
+
+    def get_relacion(self):
+        self.get_object()
+        return getattr(self, '_relacion', None)
+
     def test_func(self):
         compuesto = self.get_object()
-        # CRÍTICO: Permitir si es dueño O si pertenece al grupo Administradores
-        return compuesto.usuario == self.request.user or self.request.user.groups.filter(name='Administradores').exists()
+        # CRÍTICO: Permitir si es dueño O si pertenece al grupo Administradores (roles de la petición)
+        return compuesto.usuario_id == self.request.user.pk or self.request.roles.es_administrador
+
+# U - UPDATE (Actualizar Compuesto)
+class CompuestoUpdateView(LoginRequiredMixin, CompuestoCargaMixin, TemplateView):
+    """
+    Permite actualizar un Compuesto Químico y su única CompuestoAplicacion relacionada.
+    """
+    template_name = 'app_quimico/compuesto_quimico/compuesto_form.html' 
+    success_url = reverse_lazy('compuesto_lista')
+    cargar_relacion = True
 
     def get_compuesto_data(self):
-        """Obtiene el compuesto principal y sus relaciones asociadas."""
-        pk = self.kwargs.get('pk') 
-        compuesto = get_object_or_404(CompuestoQuimico, pk=pk)
-        
-        try:
-            relacion = get_object_or_404(CompuestoAplicacion.objects.select_related('id_aplicacion__id_industria'), id_compuesto=compuesto)
-        except CompuestoAplicacion.DoesNotExist:
-            relacion = None
-        
-        return compuesto, relacion
+        """Obtiene el compuesto principal y su relación (ya memorizados por get_object)."""
+        return self.get_object(), self.get_relacion()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -503,6 +708,9 @@ class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
         if relacion and relacion.id_aplicacion and relacion.id_aplicacion.id_industria:
             initial_relacion['tipo_industria'] = relacion.id_aplicacion.id_industria
         
+        if 'compuesto_form' in kwargs:
+            # POST: post() ya construyó y validó los formularios (llegan en kwargs)
+            return context
         if self.request.method == 'POST':
             context['compuesto_form'] = CompuestoQuimicoForm(self.request.POST, instance=compuesto)
             context['relacion_form'] = CompuestoAplicacionForm(self.request.POST, instance=relacion)
@@ -516,11 +724,13 @@ class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
         compuesto, relacion = self.get_compuesto_data()
         
         formula_post_data = request.POST.get('formula_compuesto', 'FIELD_NOT_FOUND') 
+        # Antes de validar: is_valid() copia los datos del POST sobre la misma instancia
+        formula_original = compuesto.formula_compuesto
         
         compuesto_form = CompuestoQuimicoForm(request.POST, instance=compuesto)
         relacion_form = CompuestoAplicacionForm(request.POST, instance=relacion)
         
-        context = self.get_context_data() 
+        context = self.get_context_data(compuesto_form=compuesto_form, relacion_form=relacion_form) 
 
         if compuesto_form.is_valid() and relacion_form.is_valid():
             try:
@@ -528,8 +738,6 @@ class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
                     
                     compuesto_obj = compuesto_form.save(commit=False) 
                     
-                    formula_original = compuesto.formula_compuesto
-                    
                     debe_recalcular = (
                         formula_post_data != formula_original or
                         compuesto_obj.peso_molecular_compuesto is None or
@@ -539,37 +747,36 @@ class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
                     if debe_recalcular:
                         compuesto_obj.formula_compuesto = formula_post_data 
                         
-                        calculadora = CalculadoraPM()
-                        pm_float, elementos_conteo = calculadora.analizar_formula(formula_post_data)
-                        peso_calculado = Decimal(str(pm_float)).quantize(Decimal('0.0001'))
+                        calculadora = CalculadoraPM(modo=CalculadoraPM.MODO_EXACTO)
+                        peso_calculado, elementos_conteo = calculadora.analizar_formula(formula_post_data)
                         
                         compuesto_obj.peso_molecular_compuesto = peso_calculado
                         
-                        ElementoCompuesto.objects.filter(id_compuesto=compuesto_obj).delete()
-                        
                         simbolos = elementos_conteo.keys()
                         elementos_bd = ElementoQuimico.objects.filter(simbolo_elemento__in=simbolos)
                         elementos_map = {e.simbolo_elemento: e for e in elementos_bd}
+                        for campo, mascara in calcular_mascaras(e.numero_atomico_elemento for e in elementos_bd).items():
+                            setattr(compuesto_obj, campo, mascara)
                         
-                        elementos_a_crear = [
-                            ElementoCompuesto(
-                                id_compuesto=compuesto_obj,
-                                id_elemento=elementos_map.get(simbolo),
-                                cantidad_elem_en_comp=cantidad
-                            )
+                        # Composición incremental: solo se insertan, actualizan o borran las filas que cambian
+                        sincronizar_composicion({compuesto_obj.pk: {
+                            elementos_map[simbolo].pk: cantidad
                             for simbolo, cantidad in elementos_conteo.items()
-                            if elementos_map.get(simbolo) is not None
-                        ]
-                        ElementoCompuesto.objects.bulk_create(elementos_a_crear)
+                            if simbolo in elementos_map
+                        }})
+
+                    compuesto_obj.formula_canonica = formula_canonica(compuesto_obj.formula_compuesto)
+                    equivalente = buscar_equivalente(compuesto_obj)
 
                     aplicacion_seleccionada = relacion_form.cleaned_data['id_aplicacion']
-                    compuesto_obj.id_industria = aplicacion_seleccionada.id_industria
+                    compuesto_obj.id_industria_id = aplicacion_seleccionada.id_industria_id  # Sin cargar la industria
 
                     compuesto_obj.save() 
 
                     relacion_form.save() 
 
                 messages.success(request, f"Compuesto '{compuesto_obj.formula_compuesto}' y su aplicación han sido actualizados exitosamente. PM final: {compuesto_obj.peso_molecular_compuesto}.")
+                avisar_equivalente(request, compuesto_obj, equivalente)
                 return redirect(self.success_url)
 
             except ValueError as e:
@@ -582,20 +789,11 @@ class CompuestoUpdateView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
         return self.render_to_response(context)
 
 # D - DELETE (Borrar Compuesto)
-class CompuestoDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CompuestoDeleteView(LoginRequiredMixin, CompuestoCargaMixin, DeleteView):
     model = CompuestoQuimico
     template_name = 'app_quimico/compuesto_quimico/compuesto_eliminar.html' 
     success_url = reverse_lazy('compuesto_lista')
 
-    def get_object(self, queryset=None):
-        pk = self.kwargs.get('pk') 
-        return get_object_or_404(CompuestoQuimico, pk=pk)
-
-    def test_func(self):
-        compuesto = self.get_object()
-        # CRÍTICO: Permitir si es dueño O si pertenece al grupo Administradores
-        return compuesto.usuario == self.request.user or self.request.user.groups.filter(name='Administradores').exists()
-
     def post(self, request, *args, **kwargs):
         obj = self.get_object()
         obj_name = f"{obj.nombre_compuesto} ({obj.formula_compuesto})"
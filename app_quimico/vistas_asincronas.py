@@ -0,0 +1,160 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.views.generic import View
+from django.views.generic.base import TemplateResponseMixin
+from .models import ElementoQuimico, CompuestoQuimico
+from .forms import ElementoFilterForm
+from .fragmentos import fragmento_tabla_periodica
+from .roles import roles_de
+from .views import ElementoListView, ElementoDetailView, CompuestoDetailView
+
+
+# =============================================== #
+# CONSULTAS DESDE VISTAS ASÍNCRONAS (ORM y Hilos) #
+# =============================================== #
+
+def consultas_paralelas() -> bool:
+    return getattr(settings, 'GESTOR_QUIMICO_ASYNC_CONSULTAS_PARALELAS', False)
+
+
+def _en_hilo_propio(funcion, *args):
+    try:
+        return funcion(*args)
+    finally:
+        # Hilo del pool con conexión propia: se recicla como al terminar una petición (CONN_MAX_AGE)
+        close_old_connections()
+
+
+async def en_paralelo(funcion, *args):
+    """
+    Ejecuta funcion(*args) (código síncrono que usa el ORM) sin bloquear el bucle.
+    El ORM asíncrono de Django atiende todas las consultas de una petición en un mismo hilo,
+    de una en una. Con GESTOR_QUIMICO_ASYNC_CONSULTAS_PARALELAS cada llamada va a un hilo
+    del pool con su propia conexión, así que las lanzadas con asyncio.gather consultan a la vez.
+    Por eso está desactivado por defecto: cada petición puede ocupar varias conexiones y cada
+    lectura ve su propia instantánea de la BD (no una común a toda la página).
+    """
+    if consultas_paralelas():
+        return await sync_to_async(_en_hilo_propio, thread_sensitive=False)(funcion, *args)
+    return await sync_to_async(funcion)(*args)
+
+
+async def listar(queryset) -> list:
+    """Resultados del queryset: en paralelo (hilo propio) o con 'async for' en el hilo de la petición."""
+    if consultas_paralelas():
+        return await en_paralelo(list, queryset)
+    return [objeto async for objeto in queryset]
+
+
+def precargar(instancia, relacion, objetos):
+    """Deja 'objetos' como resultado de instancia.<relacion>.all(), igual que prefetch_related."""
+    queryset = getattr(instancia, relacion).all()
+    queryset._result_cache = objetos
+    queryset._prefetch_done = True
+    if not hasattr(instancia, '_prefetched_objects_cache'):
+        instancia._prefetched_objects_cache = {}
+    instancia._prefetched_objects_cache[relacion] = queryset
+
+
+def _otros_registros(compuesto, usuario):
+    # El alcance del usuario (roles) y la consulta, en el mismo hilo
+    return list(CompuestoDetailView.otros_registros(compuesto, usuario))
+
+
+async def usuario_de(request):
+    """
+    Usuario de la sesión resuelto sin bloquear el bucle. request.user pasa a ser el mismo
+    objeto: la plantilla, {{ perms }} y request.roles no vuelven a cargarlo.
+    """
+    usuario = await request.auser()
+    request.user = usuario
+    return usuario
+
+
+# ================================================ #
+# VISTAS DE LECTURA ASÍNCRONAS (Mismas Plantillas) #
+# ================================================ #
+
+# R - READ (Lista Elementos, ASGI)
+class ElementoListaAsincronaView(ElementoListView):
+    """
+    Tabla periódica con la misma caché de fragmentos y la misma variante que ElementoListView.
+    En un acierto la petición no ocupa ningún hilo salvo para leer la versión y la caché.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        form = ElementoFilterForm(request.GET)
+        usuario = await usuario_de(request)
+
+        async def generar():
+            elementos = [elemento async for elemento in self.get_queryset()]
+            contexto = {'filter_form': form, self.context_object_name: elementos}
+            return await sync_to_async(render_to_string)(self.template_fragmento, contexto, request)
+
+        if not form.is_valid():
+            # Filtros inválidos: se muestran los errores sin pasar por la caché
+            return self.render_to_response({'tabla_elementos': await generar()})
+
+        permisos = [permiso for permiso in self.permisos_tarjeta if await usuario.ahas_perm(permiso)]
+        html, acierto = await fragmento_tabla_periodica.aobtener_o_generar(self.variante(form, permisos), generar)
+        respuesta = self.render_to_response({'tabla_elementos': html})
+        respuesta['X-Cache-Fragmento'] = 'acierto' if acierto else 'fallo'
+        return respuesta
+
+
+# R - READ (Detalle Elemento, ASGI)
+class ElementoDetalleAsincronoView(TemplateResponseMixin, View):
+    """
+    Detalle del elemento. La lista de compuestos y los roles (grupo del usuario) son
+    independientes y se cargan a la vez; los visitantes no ven la lista y no se consulta.
+    """
+    template_name = ElementoDetailView.template_name
+
+    async def get(self, request, pk):
+        usuario = await usuario_de(request)
+        try:
+            elemento = await ElementoQuimico.objects.select_related('detalleelemento').aget(pk=pk)
+        except ElementoQuimico.DoesNotExist:
+            raise Http404("No existe el elemento.")
+
+        if usuario.is_authenticated:
+            composicion, _ = await asyncio.gather(
+                listar(ElementoDetailView.composicion(elemento.elementocompuesto_set)),
+                en_paralelo(roles_de, usuario),  # Precarga request.roles y los permisos de {{ perms }}
+            )
+            precargar(elemento, 'elementocompuesto_set', composicion)
+        return self.render_to_response({'elemento': elemento, 'object': elemento})
+
+
+# R - READ (Detalle Compuesto, ASGI)
+class CompuestoDetalleAsincronoView(TemplateResponseMixin, View):
+    """
+    Detalle del compuesto (requiere sesión, como CompuestoDetailView). Composición,
+    aplicaciones y otros registros de la misma fórmula canónica se consultan a la vez.
+    """
+    template_name = CompuestoDetailView.template_name
+
+    async def get(self, request, pk):
+        usuario = await usuario_de(request)
+        if not usuario.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        try:
+            compuesto = await CompuestoQuimico.objects.select_related('usuario').aget(pk=pk)
+        except CompuestoQuimico.DoesNotExist:
+            raise Http404("No existe el compuesto.")
+
+        composicion, aplicaciones, otros_registros = await asyncio.gather(
+            listar(CompuestoDetailView.composicion(compuesto.elementocompuesto_set)),
+            listar(CompuestoDetailView.aplicaciones(compuesto.compuestoaplicacion_set)),
+            en_paralelo(_otros_registros, compuesto, usuario),
+        )
+        precargar(compuesto, 'elementocompuesto_set', composicion)
+        precargar(compuesto, 'compuestoaplicacion_set', aplicaciones)
+        return self.render_to_response({
+            'compuesto': compuesto, 'object': compuesto, 'otros_registros': otros_registros,
+        })
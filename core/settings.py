@@ -48,17 +48,23 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    'app_quimico.metricas.MetricasMiddleware', # Consultas y tiempos por vista (primero: mide a todos los demás)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app_quimico.roles.RolesMiddleware', # request.roles: grupos y permisos una vez por petición
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
 
+AUTHENTICATION_BACKENDS = [
+    'app_quimico.roles.RolesBackend', # ModelBackend con permisos tomados de request.roles (una consulta)
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -69,6 +75,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app_quimico.roles.roles', # {{ roles }} (grupo principal, gestor global, permisos)
             ],
         },
     },
@@ -144,3 +151,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login' # Nombre de la URL para redirigir si se requiere login
 LOGIN_REDIRECT_URL = 'perfil_personal' # URL a la que ir tras un login exitoso (ej. perfil)
 LOGOUT_REDIRECT_URL = 'home' # URL a la que ir tras un logout exitoso (ej. home)
+
+# Caché (fragmentos HTML como la tabla periódica). Memoria local por proceso; para
+# compartirla entre workers sin servicios externos, usar la caché en archivos:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gestor-quimico',
+    }
+}
+
+# Configuración propia del Gestor Químico
+GESTOR_QUIMICO_VERSION_TTL = 2.0 # Segundos que un proceso confía en su versión local de datos antes de releerla de la BD
+GESTOR_QUIMICO_CACHE_FORMULAS = 4096 # Máximo de fórmulas distintas memoizadas (LRU) por el motor de análisis
+GESTOR_QUIMICO_COMPUESTOS_POR_PAGINA = 24 # Tamaño de página por defecto del catálogo de compuestos (paginación por cursor)
+GESTOR_QUIMICO_MASCARA_COMPOSICION = True  # Prefiltra búsquedas por composición con la máscara de bits
+GESTOR_QUIMICO_BUSQUEDA_SUBCADENA = False  # True = las búsquedas de texto del HTML usan icontains (subcadena) en vez del índice por prefijo
+GESTOR_QUIMICO_IMPORTACION_MAX_ERRORES = 200  # Errores por fila mostrados en la página de importación
+GESTOR_QUIMICO_EXPORTACION_LOTE = 2000  # Compuestos leídos por consulta al exportar el catálogo (CSV, JSONL, XLSX)
+GESTOR_QUIMICO_API_TAMANO_PAGINA = 50  # Objetos por página de la API JSON (?limite= lo ajusta)
+GESTOR_QUIMICO_API_TAMANO_MAXIMO = 500  # Máximo aceptado para ?limite= en la API JSON
+GESTOR_QUIMICO_API_PM_LARGO_MAXIMO = 255  # Caracteres máximos por fórmula en /api/pm
+GESTOR_QUIMICO_API_PM_LOTE_MAXIMO = 1000  # Fórmulas máximas por POST a /api/pm
+GESTOR_QUIMICO_CACHE_FRAGMENTOS = 'default'  # Alias de CACHES para fragmentos HTML (tabla periódica)
+GESTOR_QUIMICO_CACHE_FRAGMENTOS_TTL = 86400  # Segundos que vive un fragmento (las versiones antiguas expiran solas)
+GESTOR_QUIMICO_ROLES_TTL = 0  # Segundos que se reutilizan grupos y permisos entre peticiones (0 = una carga por petición)
+GESTOR_QUIMICO_METRICAS = False  # Mide consultas y tiempos por vista y los expone en /metrics (False = middleware descartado)
+GESTOR_QUIMICO_METRICAS_TOKEN = ''  # Token 'Authorization: Bearer' del scraper de Prometheus (el staff accede con su sesión)
+GESTOR_QUIMICO_METRICAS_PRESUPUESTOS = {  # Límites por nombre de URL; las peticiones que los superan se registran en el log
+    'compuesto_lista': {'consultas': 8, 'ms': 300},
+    'compuesto_detalle': {'consultas': 8, 'ms': 200},
+    'compuesto_actualizar': {'consultas': 25, 'ms': 500},
+    'elemento_lista': {'consultas': 4, 'ms': 200},
+    'elemento_detalle': {'consultas': 4, 'ms': 150},
+    'api_pm': {'consultas': 2, 'ms': 100},
+}
+GESTOR_QUIMICO_ASYNC_CONSULTAS_PARALELAS = False  # Vistas asíncronas: True = datos independientes en hilos con conexión propia (varias conexiones por petición, sin instantánea común)
+GESTOR_QUIMICO_BENCHMARK_UMBRAL = 0.2  # Caída de rendimiento o subida de latencia tolerada por 'benchmark --comparar' (0.2 = 20 %)